@@ -2,10 +2,11 @@ import { connectivity } from '@/contexts/connectivitySingleton.js';
 
 export async function checkBackend() {
   try {
-    const res = await fetch('/api/ping', { method: 'GET' });
+    // Answered from the server's cached database probe, so polling it costs no database round trip
+    const res = await fetch('/api/health/ready', { method: 'GET', cache: 'no-store' });
 
     if (!res.ok) {
-      // Server returned 500 or something
+      // Server returned 500, or 503 because the database is unreachable
       connectivity.goOffline();
       return false;
     }
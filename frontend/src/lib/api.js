@@ -22,7 +22,9 @@ export async function request(path, { method = 'GET', body, headers } = {}) {
 
   if (!res.ok) {
     const msg = data?.message || `HTTP ${res.status}`;
-    throw new Error(msg);
+    const err = new Error(msg);
+    err.status = res.status;
+    throw err;
   }
   return data;
 }
@@ -90,62 +92,51 @@ export function loginUser({ username, password }) {
 }
 
 
-// For any authed call
-export async function authenticatedRequest(path, opts = {}) {
-  let token = getToken();
-  let refreshToken = getRefreshToken();
+// Trade the refresh token for a new access token. Returns null once the refresh token is expired or revoked
+export async function refreshAccessToken() {
+  const refreshToken = getRefreshToken();
+  if (!refreshToken) return null;
 
-  try {
-    let response = await request(path, {
-      ...opts,
-      headers: {
-        Authorization: token ? `Bearer ${token}` : undefined,
-        ...(opts.headers || {}),
-      },
-    });
+  const refreshResponse = await fetch('/refresh', {
+    method: 'POST',
+    headers: { Authorization: `Bearer ${refreshToken}` },
+  });
+  if (!refreshResponse.ok) return null;
 
-    // Server online
-    connectivity.goOnline();
+  const data = await refreshResponse.json();
+  saveToken(data.JWT);
+  return data.JWT;
+}
 
-    // Handle 401/400: try refresh
-    if ((response.status === 401 || response.status === 400) && refreshToken) {
-      const refreshResponse = await fetch('/refresh', {
-        method: 'POST',
-        headers: { Authorization: `Bearer ${refreshToken}` },
-      });
+// For any authed call
+export async function authenticatedRequest(path, opts = {}) {
+  const send = (token) => request(path, {
+    ...opts,
+    headers: {
+      Authorization: token ? `Bearer ${token}` : undefined,
+      ...(opts.headers || {}),
+    },
+  });
 
-      if (!refreshResponse.ok) {
+  try {
+    let response;
+    try {
+      response = await send(getToken());
+    } catch (err) {
+      // Expired or revoked access token: refresh once and retry
+      if (err.status !== 401) throw err;
+
+      const token = await refreshAccessToken();
+      if (!token) {
         window.location.href = '/';
         return { redirected: true };
       }
 
-      const data = await refreshResponse.json();
-      token = data.JWT;
-      setToken(token);
-
-      response = await request(path, {
-        ...opts,
-        headers: { Authorization: `Bearer ${token}`, ...(opts.headers || {}) },
-      });
-
-      connectivity.goOnline();
-    }
-
-    // Detect offline / proxy failure from Vite
-    if (!response.ok) {
-      // Vite proxy returns 502 with JSON error
-      if (response.status === 502) {
-        connectivity.goOffline();
-        return { offline: true, error: 'Backend unreachable' };
-      }
-
-      // Other server errors
-      if (response.status >= 500) {
-        connectivity.goOffline();
-        return { offline: true };
-      }
+      response = await send(token);
     }
 
+    // Server online
+    connectivity.goOnline();
     return response;
 
   } catch (err) {
@@ -155,11 +146,31 @@ export async function authenticatedRequest(path, opts = {}) {
       return { offline: true };
     }
 
+    // Vite proxy returns 502 when the backend is unreachable
+    if (err.status === 502 || err.status >= 500) {
+      connectivity.goOffline();
+      return { offline: true, error: 'Backend unreachable' };
+    }
+
     // rethrow
     throw err;
   }
 }
 
+// Revoke this session's tokens on the server and forget them here
+export async function logoutUser() {
+  try {
+    await authenticatedRequest('/api/auth/logout', {
+      method: 'POST',
+      body: { refresh_JWT: getRefreshToken() },
+    });
+  } finally {
+    try {
+      sessionStorage.removeItem('JWT');
+      sessionStorage.removeItem('refreshJWT');
+    } catch {}
+  }
+}
 
 //export async function authenticatedRequest(path, opts = {}) {
 //  let token = getToken(); // access token
@@ -196,6 +207,82 @@ export async function authenticatedRequest(path, opts = {}) {
 
 
 
+// Follow a Server-Sent Events endpoint. fetch is used instead of EventSource so the auth header can be sent.
+// Reconnects after the server's retry delay, resuming from the last event id. Returns a function that stops it.
+// An expired access token is refreshed once before reconnecting; if that fails the user is sent to login.
+export function followEvents(path, onEvent) {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retryMs = 3000;
+  let refreshed = false;
+
+  function handleBlock(block) {
+    let data = '';
+
+    block.split('\n').forEach((line) => {
+      if (line.startsWith('id: ')) lastEventId = line.slice(4);
+      else if (line.startsWith('data: ')) data += line.slice(6);
+      else if (line.startsWith('retry: ')) retryMs = Number(line.slice(7)) || retryMs;
+      // lines starting with ':' are heartbeats
+    });
+
+    if (data) onEvent(JSON.parse(data));
+  }
+
+  async function follow() {
+    while (!controller.signal.aborted) {
+      try {
+        const token = getToken();
+        const res = await fetch(path, {
+          headers: {
+            Authorization: token ? `Bearer ${token}` : undefined,
+            ...(lastEventId ? { 'Last-Event-ID': lastEventId } : {}),
+          },
+          signal: controller.signal,
+        });
+
+        if (res.status === 401) {
+          // A refreshed token that is still rejected is not retried again, the session is over
+          if (refreshed || !(await refreshAccessToken())) {
+            window.location.href = '/';
+            return;
+          }
+
+          refreshed = true;
+          continue;
+        }
+
+        if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+        refreshed = false;
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+
+          buffer += value;
+          let boundary;
+          while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            handleBlock(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+          }
+        }
+      } catch (err) {
+        if (controller.signal.aborted) return;
+        console.error('Event stream interrupted:', err);
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, retryMs));
+    }
+  }
+
+  follow();
+  return () => controller.abort();
+}
+
+
 export function getHomePage() {
   return authenticatedRequest('/api/home', {
     method: 'GET',
@@ -1,7 +1,7 @@
 // src/pages/CreateBusiness.jsx
 import { useMemo, useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { authenticatedRequest, saveToken } from '@/lib/api';
+import { authenticatedRequest, saveToken, saveRefreshToken } from '@/lib/api';
 
 const DAYS = ["Sunday","Monday","Tuesday","Wednesday","Thursday","Friday","Saturday"];
 
@@ -101,6 +101,7 @@ export default function CreateBusiness() {
       const res = await authenticatedRequest("/api/business", { method:"POST", body: payloadForCreate() });
       if (res?.JWT){
         saveToken(res.JWT)
+        if (res.refresh_JWT) saveRefreshToken(res.refresh_JWT)
         }
       navigate("/manager-home");
     } catch (err) {
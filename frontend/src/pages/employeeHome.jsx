@@ -10,7 +10,7 @@ import parse from 'date-fns/parse';
 import startOfWeek from 'date-fns/startOfWeek';
 import getDay from 'date-fns/getDay';
 import enUS from 'date-fns/locale/en-US';
-import { getHomePage, getBusinessCode, getEmployeeID, authenticatedRequest, saveToken } from '@/lib/api';
+import { getHomePage, getBusinessCode, getEmployeeID, authenticatedRequest, saveToken, saveRefreshToken } from '@/lib/api';
     import { useNavigate } from 'react-router-dom';
 
 
@@ -59,6 +59,7 @@ export default function EmployeeHome() {
       });
       if (data?.JWT) {
           saveToken(data.JWT)
+          if (data.refresh_JWT) saveRefreshToken(data.refresh_JWT)
           }
       setBusinessCode(businessCodeInput.trim());
       localStorage.setItem("businessCode", businessCode.trim());
@@ -3,7 +3,7 @@ import 'bootstrap/dist/css/bootstrap.min.css'
 import '/css/style.css'
 import { Link } from 'react-router-dom'
 import { jwtDecode } from 'jwt-decode'
-import { loginUser, saveToken } from '@/lib/api'
+import { loginUser, saveToken, saveRefreshToken } from '@/lib/api'
 
 
 
@@ -32,6 +32,7 @@ export default function Login() {
 
     if (res?.JWT) {
       saveToken(res.JWT)
+      if (res.refresh_JWT) saveRefreshToken(res.refresh_JWT)
 
       // decode token for role-based routing
       const decoded = jwtDecode(res.JWT)
@@ -1,10 +1,10 @@
 // src/pages/monitoring.jsx
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import 'bootstrap/dist/css/bootstrap.min.css';
 import '@/styles/homePage.css';
 import '@/styles/auth.css';
 
-import { getHomePage, getBusinessCode, authenticatedRequest } from '@/lib/api';
+import { getHomePage, getBusinessCode, authenticatedRequest, followEvents } from '@/lib/api';
 import { useNavigate } from 'react-router-dom';
 
 function groupActivities(raw = []) {
@@ -104,7 +104,8 @@ export default function Monitoring() {
 
   const [loading, setLoading] = useState(true);
   const [activityError, setActivityError] = useState(null);
-  const [shifts, setShifts] = useState([]);
+  const [activities, setActivities] = useState([]);
+  const shifts = useMemo(() => groupActivities(activities), [activities]);
 
   // Fetch business name (like ManagerHome)
   useEffect(() => {
@@ -135,9 +136,11 @@ export default function Monitoring() {
       setActivityError(null);
       try {
         const data = await authenticatedRequest('/api/manager/activity');
-        const grouped = groupActivities(data.activities || []);
         if (!mounted) return;
-        setShifts(grouped);
+        const loaded = data.activities || [];
+        const loadedIds = new Set(loaded.map((a) => a._id));
+        // Keep events the live stream delivered while the page was loading
+        setActivities((live) => [...loaded, ...live.filter((a) => !loadedIds.has(a._id))]);
       } catch (err) {
         console.error('Failed to load manager activity:', err);
         if (mounted) setActivityError('Unable to load activity right now.');
@@ -152,6 +155,17 @@ export default function Monitoring() {
     };
   }, []);
 
+  // Follow new clock ins and outs as they happen instead of polling
+  useEffect(() => {
+    const stop = followEvents('/api/manager/activity/stream', (activity) => {
+      setActivities((current) => (
+        current.some((a) => a._id === activity._id) ? current : [...current, activity]
+      ));
+    });
+
+    return stop;
+  }, []);
+
   // Allow scrolling on this page (lots of cards)
   useEffect(() => {
     const prevOverflow = document.body.style.overflow;
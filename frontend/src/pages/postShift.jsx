@@ -164,29 +164,25 @@ export default function PostShift() {
 
   const clearSelected = useCallback(() => setSelected([]), []);
 
-  // --- POST EACH SELECTED SHIFT TO /api/employee/post_shift ---
+  // --- POST ALL SELECTED SHIFTS IN ONE REQUEST TO /api/employee/post_shifts ---
   const postSelected = useCallback(async () => {
     if (selected.length === 0) return;
     try {
-      const results = await Promise.allSettled(
-        selected.map((s) =>
-          authenticatedRequest("/api/employee/post_shift", {
-            method: "POST",
-            body: { shift_id: s.id },
-          })
-        )
-      );
-
-      if (results.offline) return;
-      const ok = results.filter(r => r.status === "fulfilled").length;
-      const fail = results.length - ok;
+      const data = await authenticatedRequest("/api/employee/post_shifts", {
+        method: "POST",
+        body: { shift_ids: selected.map((s) => s.id) },
+      });
+
+      if (data.offline) return;
+      const postedIds = new Set((data.results || []).filter(r => r.success).map(r => r.shift_id));
+      const ok = postedIds.size;
+      const fail = selected.length - ok;
 
       if (ok > 0) {
         alert(`Posted ${ok} shift${ok === 1 ? "" : "s"}${fail ? ` (${fail} failed)` : ""}.`);
 
         // Remove posted shifts from calendar
-        const postedIds = selected.map(s => s.id);
-        setEvents(prev => prev.filter(evt => !postedIds.includes(evt.id)));
+        setEvents(prev => prev.filter(evt => !postedIds.has(evt.id)));
 
         setSelected([]);
       } else {
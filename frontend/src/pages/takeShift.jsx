@@ -146,17 +146,18 @@ export default function TakeShift() {
   const takeSelected = useCallback(async () => {
     if (!selected.length) return;
     try {
-      const results = await Promise.allSettled(selected.map(s =>
-        authenticatedRequest("/api/employee/take_shift", { method: "POST", body: { shift_id: s.id } })
-      ));
+      const data = await authenticatedRequest("/api/employee/take_shifts", {
+        method: "POST",
+        body: { shift_ids: selected.map(s => s.id) },
+      });
 
-      if (results.offline) return;
-      const ok = results.filter(r => r.status === "fulfilled").length;
-      const fail = results.length - ok;
+      if (data.offline) return;
+      const takenIds = new Set((data.results || []).filter(r => r.success).map(r => r.shift_id));
+      const ok = takenIds.size;
+      const fail = selected.length - ok;
 
       if (ok) {
         alert(`Took ${ok} shift${ok === 1 ? "" : "s"}${fail ? ` (${fail} failed)` : ""}.`);
-        const takenIds = new Set(selected.map(s => s.id));
         setEvents(evts => evts.filter(e => !takenIds.has(e.id) || e.type === 'own'));
         setSelected([]);
       } else {
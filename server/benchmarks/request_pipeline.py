@@ -0,0 +1,118 @@
+"""
+Benchmark the per-request overhead of @endpoint against the hand-written checks it replaced.
+
+Both views accept the body of /api/manager/schedules/add_shifts and return without doing any work, so only the
+JWT, role and body checks are timed. Each iteration runs in a fresh request context, as Flask would serve it.
+Three cases are timed: a valid request, a malformed body and a caller with the wrong role.
+Every request of a case sends the same token, as a browser session does between refreshes.
+
+No database needed - run from the server directory:
+    python -m benchmarks.request_pipeline
+"""
+import argparse
+import statistics
+import time
+
+from flask import Flask, request, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request, get_jwt
+
+from handlers.enums.roles import Role
+from handlers.validation_handler import is_authorized
+from routes.pipeline import endpoint
+from routes.schedule_management import MAX_BULK_SHIFTS
+
+SHIFT = {"employee_id": "e1", "start": "2099-01-01T09:00:00.000Z", "end": "2099-01-01T17:00:00.000Z"}
+
+SCHEMA = {
+    "type": "object",
+    "required": ["schedule_id", "shifts"],
+    "properties": {
+        "schedule_id": {"type": "string"},
+        "shifts": {"type": "array", "minItems": 1, "maxItems": MAX_BULK_SHIFTS, "items": {"type": "object"}}
+    }
+}
+
+
+def legacy_view():
+    """ The checks add_shifts_endpoint made by hand before @endpoint """
+    data = request.get_json(silent=True)
+
+    verify_jwt_in_request()
+    claims = get_jwt()
+
+    auth_check = is_authorized(claims, [Role.MANAGER])
+    if auth_check:
+        return auth_check
+
+    if not data or 'schedule_id' not in data or not isinstance(data.get('shifts'), list):
+        return jsonify({"message": "Schedule ID and a list of shifts are required"}), 400
+
+    if not all(isinstance(shift, dict) for shift in data['shifts']):
+        return jsonify({"message": "Every shift must be an object"}), 400
+
+    if not 1 <= len(data['shifts']) <= MAX_BULK_SHIFTS:
+        return jsonify({"message": f"Between 1 and {MAX_BULK_SHIFTS} shifts can be added at once"}), 400
+
+    return claims['code']
+
+
+@endpoint(roles=[Role.MANAGER], schema=SCHEMA)
+def pipeline_view(claims, data):
+    return claims['code']
+
+
+def time_view(app: Flask, view, body, headers: dict, iterations: int) -> list[float]:
+    """ Time the view over fresh request contexts, returning microseconds per request """
+    durations = []
+
+    for _ in range(iterations):
+        with app.test_request_context('/bench', method='POST', json=body, headers=headers):
+            started = time.perf_counter()
+            view()
+            durations.append((time.perf_counter() - started) * 1_000_000)
+
+    return durations
+
+
+def run(iterations: int, shifts: int):
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'benchmark-secret-key-that-is-long-enough'
+    JWTManager(app)
+
+    with app.app_context():
+        claims = {"code": "BENCH1", "user_id": "u1"}
+        manager = {"Authorization": "Bearer " + create_access_token("bench", additional_claims={**claims,
+                                                                                               "role": "MANAGER"})}
+        employee = {"Authorization": "Bearer " + create_access_token("bench", additional_claims={**claims,
+                                                                                                "role": "EMPLOYEE"})}
+
+    valid = {"schedule_id": "s1", "shifts": [SHIFT] * shifts}
+    cases = [
+        ("valid body", valid, manager),
+        ("malformed body", {"schedule_id": "s1", "shifts": [SHIFT] * (shifts - 1) + ["not a shift"]}, manager),
+        ("wrong role", valid, employee)
+    ]
+
+    print(f"{shifts} shifts per body, {iterations} requests per case, microseconds per request")
+    print(f"{'case':>16} {'legacy median':>14} {'pipeline median':>16} {'legacy p95':>11} {'pipeline p95':>13}")
+
+    for name, body, headers in cases:
+        # Warm up both paths so neither pays for first-call imports
+        time_view(app, legacy_view, body, headers, 50)
+        time_view(app, pipeline_view, body, headers, 50)
+
+        legacy = sorted(time_view(app, legacy_view, body, headers, iterations))
+        pipeline = sorted(time_view(app, pipeline_view, body, headers, iterations))
+        p95 = int(iterations * 0.95) - 1
+
+        print(f"{name:>16} {statistics.median(legacy):>14.1f} {statistics.median(pipeline):>16.1f} "
+              f"{legacy[p95]:>11.1f} {pipeline[p95]:>13.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the request checks of @endpoint.")
+    parser.add_argument('--iterations', type=int, default=5000, help="Requests timed per case")
+    parser.add_argument('--shifts', type=int, default=50, help="Shifts in each request body")
+    args = parser.parse_args()
+
+    run(args.iterations, args.shifts)
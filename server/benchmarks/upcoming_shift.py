@@ -0,0 +1,127 @@
+"""
+Benchmark ActivityHandler.get_upcoming_shift as schedules grow.
+
+Fills a scratch database with schedules of increasing size and times the next-shift lookup for one employee.
+Latency and the documents/keys examined should stay flat as shifts per schedule grow.
+
+Needs a real MongoDB - run from the server directory:
+    python -m benchmarks.upcoming_shift --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from handlers.activity_handler import ActivityHandler
+from handlers.index_registry import reconcile_indexes
+
+BENCH_DATABASE = "Capstone-T3-bench"
+BUSINESS_CODE = "BENCH1"
+MONTHS = 12
+EMPLOYEES = 50
+
+
+def plan_stages(plan) -> set[str]:
+    """ Collect the stage names of an explain plan, whichever engine produced it """
+    if isinstance(plan, list):
+        return set().union(*(plan_stages(item) for item in plan))
+
+    if not isinstance(plan, dict):
+        return set()
+
+    stages = {plan["stage"]} if "stage" in plan else set()
+    return stages.union(*(plan_stages(value) for value in plan.values()))
+
+
+class BenchDatabaseHandler:
+    def __init__(self, client: MongoClient):
+        self.client = client
+        self.database = client[BENCH_DATABASE]
+
+
+def fill_shifts(db, shifts_per_schedule: int, employee_ids: list[str]):
+    """ Replace the scratch shifts with MONTHS schedules of the given size, spread over the employees """
+    db["Shifts"].delete_many({})
+    now = datetime.now(timezone.utc)
+    batch = []
+
+    for month in range(MONTHS):
+        schedule_id = str(ObjectId())
+        month_start = now + timedelta(days=30 * (month - MONTHS // 2))
+
+        for i in range(shifts_per_schedule):
+            start = month_start + timedelta(minutes=(30 * 24 * 60) * i // shifts_per_schedule)
+            batch.append({
+                "_id": str(ObjectId()),
+                "schedule_id": schedule_id,
+                "business_code": BUSINESS_CODE,
+                "employee_id": employee_ids[i % len(employee_ids)],
+                "employee_name": "Bench Employee",
+                "start": start.isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+                "end": (start + timedelta(hours=8)).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+                "posted": False,
+                "clocked_in": False,
+                "completed": start < now
+            })
+
+            if len(batch) >= 10000:
+                db["Shifts"].insert_many(batch, ordered=False)
+                batch = []
+
+    if batch:
+        db["Shifts"].insert_many(batch, ordered=False)
+
+
+def run(mongo_uri: str, sizes: list[int], iterations: int):
+    client = MongoClient(mongo_uri)
+    client.drop_database(BENCH_DATABASE)
+
+    db_handler = BenchDatabaseHandler(client)
+    reconcile_indexes(db_handler.database, ["Shifts"])
+    handler = ActivityHandler(db_handler)
+
+    employee_ids = [str(ObjectId()) for _ in range(EMPLOYEES)]
+    target = employee_ids[0]
+
+    print(f"{'shifts/schedule':>16} {'total shifts':>13} {'median ms':>10} {'p95 ms':>8} {'docs examined':>14} "
+          f"{'keys examined':>14}")
+
+    try:
+        for size in sizes:
+            fill_shifts(db_handler.database, size, employee_ids)
+
+            durations = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                handler.get_upcoming_shift(user_id=target, business_code=BUSINESS_CODE)
+                durations.append((time.perf_counter() - started) * 1000)
+
+            explain = (handler.shifts.find(handler._upcoming_shift_query(target, BUSINESS_CODE))
+                       .sort([("start", 1)]).limit(1).explain())
+            stats = explain.get("executionStats", {})
+
+            # The index has to return shifts in order, a blocking SORT would read every future shift
+            assert "SORT" not in plan_stages(explain["queryPlanner"]["winningPlan"]), "lookup sorts in memory"
+
+            durations.sort()
+            print(f"{size:>16} {size * MONTHS:>13} {statistics.median(durations):>10.2f} "
+                  f"{durations[int(len(durations) * 0.95) - 1]:>8.2f} {stats.get('totalDocsExamined', '?'):>14} "
+                  f"{stats.get('totalKeysExamined', '?'):>14}")
+
+    finally:
+        client.drop_database(BENCH_DATABASE)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the next shift lookup as schedules grow.")
+    parser.add_argument('--mongo-uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000],
+                        help="Shifts per schedule to test")
+    parser.add_argument('--iterations', type=int, default=200, help="Lookups timed per size")
+    args = parser.parse_args()
+
+    run(args.mongo_uri, args.sizes, args.iterations)
@@ -0,0 +1,19 @@
+import argparse
+
+from handlers.password_handler import PasswordHandler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pick the bcrypt cost for a target verify time on this machine.")
+    parser.add_argument('--target-ms', type=float, default=250.0, help="Verification time budget in milliseconds")
+    parser.add_argument('--min-rounds', type=int, default=10, help="Lowest cost to consider")
+    parser.add_argument('--max-rounds', type=int, default=16, help="Highest cost to consider")
+    args = parser.parse_args()
+
+    result = PasswordHandler.calibrate_rounds(target_ms=args.target_ms, min_rounds=args.min_rounds,
+                                              max_rounds=args.max_rounds)
+
+    for rounds, median_ms in result["timings_ms"].items():
+        print(f"rounds={rounds}: {median_ms} ms")
+
+    print(f"\nRecommended setting for config.yaml:\nPASSWORD_ROUNDS: {result['rounds']}")
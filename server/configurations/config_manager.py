@@ -8,6 +8,17 @@ class ConfigurationManager:
         self.SERVER_HOST = None
         self.JWT_SECRET_KEY = None
         self.MONGO_URI = None
+        self.PASSWORD_ROUNDS = None
+        self.PASSWORD_WORKERS = None
+        self.PASSWORD_QUEUE_SIZE = None
+        self.BUSINESS_CACHE_SIZE = None
+        self.BUSINESS_CACHE_TTL = None
+        self.USER_CACHE_SIZE = None
+        self.USER_CACHE_TTL = None
+        self.AUTOSCHEDULE_WORKERS = None
+        self.AUTOSCHEDULE_TIME_LIMIT = None
+        self.HEALTH_PROBE_INTERVAL = None
+        self.REVOCATION_SYNC_INTERVAL = None
 
         with open(config_path, 'r') as config_file:
             self.configuration = yaml.safe_load(config_file)
@@ -19,3 +30,16 @@ class ConfigurationManager:
         self.JWT_SECRET_KEY = self.configuration['JWT_SECRET_KEY']
         self.SERVER_HOST = self.configuration['SERVER_HOST']
         self.SERVER_PORT = self.configuration['SERVER_PORT']
+
+        # Optional settings
+        self.PASSWORD_ROUNDS = self.configuration.get('PASSWORD_ROUNDS', 12)
+        self.PASSWORD_WORKERS = self.configuration.get('PASSWORD_WORKERS', 4)
+        self.PASSWORD_QUEUE_SIZE = self.configuration.get('PASSWORD_QUEUE_SIZE', 32)
+        self.BUSINESS_CACHE_SIZE = self.configuration.get('BUSINESS_CACHE_SIZE', 1024)
+        self.BUSINESS_CACHE_TTL = self.configuration.get('BUSINESS_CACHE_TTL', 300)
+        self.USER_CACHE_SIZE = self.configuration.get('USER_CACHE_SIZE', 4096)
+        self.USER_CACHE_TTL = self.configuration.get('USER_CACHE_TTL', 300)
+        self.AUTOSCHEDULE_WORKERS = self.configuration.get('AUTOSCHEDULE_WORKERS', 1)
+        self.AUTOSCHEDULE_TIME_LIMIT = self.configuration.get('AUTOSCHEDULE_TIME_LIMIT', 10)
+        self.HEALTH_PROBE_INTERVAL = self.configuration.get('HEALTH_PROBE_INTERVAL', 5)
+        self.REVOCATION_SYNC_INTERVAL = self.configuration.get('REVOCATION_SYNC_INTERVAL', 5)
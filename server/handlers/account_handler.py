@@ -11,7 +11,7 @@ from handlers.enums.roles import Role
 from handlers.db_handler import DatabaseHandler
 from handlers.password_handler import PasswordHandler
 from handlers.validation_handler import ValidationHandler
-from handlers.exceptions.exceptions import UserAlreadyExistsError, PasswordFormatError
+from handlers.exceptions.exceptions import UserAlreadyExistsError, PasswordFormatError, PasswordHandlerBusyError
 
 
 class AccountHandler:
@@ -21,25 +21,9 @@ class AccountHandler:
         self.pw_handler = pw_handler
         db = db_handler.database
 
-        # Initialize database for account management -
-        # Create 'Users' Collection if it does not already exist
-        if "Users" not in db.list_collection_names():
-            db.create_collection("Users")
-
+        # Collections and indexes are created by SchemaHandler.bootstrap
         self.users_collection = db["Users"]
 
-        # Ensure unique field 'username' exists
-        self.users_collection.create_index([("username", 1)], unique=True)
-
-        # Ensure field 'password' exists
-        self.users_collection.create_index([("password", 1)], unique=False)
-
-        # Ensure field 'role' exists
-        self.users_collection.create_index([("role", 1)], unique=False)
-
-        # Ensure field 'business_code' exists
-        self.users_collection.create_index([("business_code", 1)], unique=False)
-
     def _insert_user(self, name: str, input_username: str, hashed_password: str, role: str, code: str | None):
         """ Helper method to insert user into the database """
 
@@ -121,10 +105,30 @@ class AccountHandler:
                 stored_pass = user["password"]
 
                 if self.pw_handler.verify_password_match(password=input_password, hashed_password=stored_pass):
+
+                    # Upgrade hashes stored at an outdated cost while we have the plain password
+                    if self.pw_handler.needs_rehash(stored_pass):
+                        self._rehash_password(user, input_password)
+
                     return True
 
         return False
 
+    def _rehash_password(self, user: dict, input_password: str):
+        """ Helper method to replace a user's stored hash with one at the current cost """
+        try:
+            new_hash = self.pw_handler.hash_password(input_password)
+
+        except PasswordHandlerBusyError:
+            # Not worth failing the login over - try again on the next one
+            return
+
+        # Only swap the hash if it has not been changed since we read it
+        self.users_collection.update_one(
+            {"username": user["username"], "password": user["password"]},
+            {"$set": {"password": new_hash}}
+        )
+
     # def delete_user(self, input_username: str, input_password: str) -> bool:
     #     """ Delete a user's account after validating their login credentials. """
     #     if self.validate_login(input_username, input_password):
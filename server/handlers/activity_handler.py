@@ -1,25 +1,62 @@
+import queue
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 
 from bson import ObjectId
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, errors
+from handlers.activity_stream_handler import ActivityStreamHandler
 from handlers.db_handler import DatabaseHandler
-from handlers.schedule_handler import ScheduleHandler
-from tools import parse_utc
+from tools import to_utc_iso, utc_now_iso, encode_cursor, decode_cursor
 
 
 class ActivityHandler:
 
-    def __init__(self, db_handler: DatabaseHandler):
-        """ Initializes the ActivityHandler with the database handler """
+    # How far from the scheduled start/end a clock in/out is accepted
+    PUNCH_WINDOW = timedelta(minutes=30)
+
+    # Shift fields needed to record a clock in/out activity
+    PUNCH_PROJECTION = {"start": 1, "end": 1, "employee_id": 1, "employee_name": 1, "business_code": 1,
+                        "schedule_id": 1}
+
+    # Activities are bucketed by business and employee, which every activity query filters on
+    ACTIVITY_COLLECTION = "Activity"
+    LEGACY_ACTIVITY_COLLECTION = "Activity_legacy"
+    TIME_SERIES_OPTIONS = {"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"}
+
+    # Secondary indexes on measurement fields, which the registry's (timestamp, _id) indexes need, came in 6.0.
+    # Older servers get a plain collection
+    TIME_SERIES_MIN_VERSION = (6, 0)
+
+    # Holds a partial copy of the activity log while it is moved aside without a rename
+    STAGING_ACTIVITY_COLLECTION = "Activity_staging"
+
+    # Activities copied per insert during the storage migration
+    MIGRATION_BATCH_SIZE = 1000
+
+    # Seconds between heartbeats on a live activity stream
+    STREAM_HEARTBEAT = 15
+
+    # Activity ids remembered per live stream, so one seen both live and on catch-up is sent once
+    STREAM_SEEN_SIZE = 1000
+
+    # Catch-up reads start this far before the previous one, for activities stored just before it ran
+    STREAM_CATCH_UP_SLACK = timedelta(seconds=5)
+
+    def __init__(self, db_handler: DatabaseHandler, stream: ActivityStreamHandler = None):
+        """
+        Initializes the ActivityHandler with the database handler
+        :param stream: Fans new activities out to live streams. Defaults to one publishing in process only.
+        """
         db = db_handler.database
+        self.db = db
+        self.shifts = db["Shifts"]
         self.schedules = db["Schedules"]
 
-        # Initialize database for activity management -
-        # Create 'Activity' Collection if it does not already exist
-        if "Activity" not in db.list_collection_names():
-            db.create_collection("Activity")
+        # Collections and indexes are created by SchemaHandler.bootstrap
+        self.activity = db[self.ACTIVITY_COLLECTION]
 
-        self.activity = db["Activity"]
+        self.stream = stream or ActivityStreamHandler(db_handler)
 
 
     def _insert_activity(self, shift: dict, employee_id: str, employee_name: str, clock_in: bool, business_code: str):
@@ -29,149 +66,379 @@ class ActivityHandler:
             "shift_id": shift["_id"],
             "shift_start": shift["start"],
             "shift_end": shift["end"],
-            "business_code": business_code,
-            "employee_id": employee_id,
+            "meta": {"business_code": business_code, "employee_id": employee_id},
             "employee_name": employee_name,
             "clock_in": clock_in,
-            "timestamp": datetime.now().isoformat() + 'Z'
+            "timestamp": datetime.now(timezone.utc)
         }
 
         self.activity.insert_one(activity)
-
-
-    def _clock_in(self, schedule: dict, shift_id: str):
-
-        now = datetime.now(timezone.utc)
-
-        shift = next(
-            (s for s in schedule["shifts"] if str(s["_id"]) == shift_id),
-            None
+        self.stream.publish(activity)
+
+
+    def _punch(self, shift_filter: dict, update: dict, clock_in: bool) -> bool:
+        """
+        Helper method to apply a clock in/out in one conditional update and record the activity.
+        The filter carries the state and time window checks, so a repeated or late punch matches nothing.
+        """
+        shift = self.shifts.find_one_and_update(
+            shift_filter,
+            {"$set": update},
+            projection=self.PUNCH_PROJECTION,
+            return_document=ReturnDocument.AFTER
         )
 
-        if not shift:
+        if shift is None:
             return False
 
-        if shift["clocked_in"]:
-            return False
+        # The shift's clock state is part of the schedule payload, so mark the schedule as changed
+        self.schedules.update_one({"_id": ObjectId(shift["schedule_id"])}, {"$inc": {"revision": 1}})
 
-        start = parse_utc(shift["start"])
+        self._insert_activity(shift=shift, employee_id=shift["employee_id"],
+                              employee_name=shift["employee_name"], clock_in=clock_in,
+                              business_code=shift["business_code"])
 
-        if not (start - timedelta(minutes=30) <= now <= start + timedelta(minutes=30)):
-            return False
+        return True
 
-        result = self.schedules.find_one_and_update(
-            {"shifts._id": shift["_id"]},
-            {
-                "$set": {
-                    "shifts.$[s].clocked_in": True,
-                    "shifts.$[s].clocked_in_at": now
-                }
-            },
-            array_filters=[{"s._id": shift["_id"]}],
-            return_document=True
-        )
+    def _clock_in(self, shift_id: str, now: datetime) -> bool:
+        # Clocking in is allowed from 30 minutes before to 30 minutes after the shift start
+        shift_filter = {
+            "_id": shift_id,
+            "clocked_in": False,
+            "completed": False,
+            "start": {"$gte": to_utc_iso(now - self.PUNCH_WINDOW), "$lte": to_utc_iso(now + self.PUNCH_WINDOW)}
+        }
 
-        if result is not None:
-            self._insert_activity(shift=shift, employee_id=shift["employee_id"],
-                                  employee_name=shift["employee_name"], clock_in=True, business_code=schedule["business_code"])
+        return self._punch(shift_filter, {"clocked_in": True, "clocked_in_at": now}, clock_in=True)
 
-            return True
+    def _clock_out(self, shift_id: str, now: datetime) -> bool:
+        # Clocking out is allowed from 30 minutes before to 30 minutes after the shift end
+        shift_filter = {
+            "_id": shift_id,
+            "clocked_in": True,
+            "completed": False,
+            "end": {"$gte": to_utc_iso(now - self.PUNCH_WINDOW), "$lte": to_utc_iso(now + self.PUNCH_WINDOW)}
+        }
 
+        return self._punch(shift_filter, {"completed": True, "clocked_in": False, "clocked_out_at": now},
+                           clock_in=False)
 
-    def _clock_out(self, schedule: dict, shift_id: str):
-        now = datetime.now(timezone.utc)
+    @staticmethod
+    def _upcoming_shift_query(user_id: str, business_code: str) -> dict:
+        """ Helper method to build the filter for an employee's open shifts that have not started yet """
+        return {
+            "employee_id": user_id,
+            "start": {"$gte": utc_now_iso()},
+            "business_code": business_code,
+            "clocked_in": False,
+            "completed": False
+        }
 
-        shift = next(
-            (s for s in schedule["shifts"] if str(s["_id"]) == shift_id),
-            None
-        )
+    def get_upcoming_shift(self, user_id: str, business_code: str):
+        """
+        Get the employee's soonest upcoming shift across every schedule.
+        The (employee_id, start) index hands back shifts in start order, so this reads a single index entry
+        and document however many shifts the employee has. Sorting on anything past start, even _id,
+        would need an in-memory sort of all their future shifts; an employee's shifts do not share a start.
+        """
+        shift = self.shifts.find_one(self._upcoming_shift_query(user_id, business_code),
+                                     sort=[("start", ASCENDING)])
 
         if not shift:
             return False
 
-        if not shift["clocked_in"] or shift["completed"]:
-            return False
+        return shift
 
-        end = parse_utc(shift["end"])
 
-        if not (end - timedelta(minutes=30) <= now <= end + timedelta(minutes=30)):
-            return False
+    def log_activity(self, shift_id: str, clock_in: bool) -> bool:
+        now = datetime.now(timezone.utc)
 
-        result = self.schedules.find_one_and_update(
-            {"shifts._id": shift["_id"]},
-            {
-                "$set": {
-                    "shifts.$[s].completed": True,
-                    "shifts.$[s].clocked_in": False,
-                    "shifts.$[s].clocked_out_at": now
-                }
-            },
-            array_filters=[{"s._id": shift["_id"]}],
-            return_document=True
+        if clock_in:
+            return self._clock_in(shift_id, now)
+        else:
+            return self._clock_out(shift_id, now)
+
+
+    @staticmethod
+    def _to_response(activity: dict) -> dict:
+        """ Helper method to flatten a stored activity into the shape the API has always returned """
+        activity = dict(activity)
+        activity.update(activity.pop("meta", {}))
+
+        # Stored datetimes come back naive in UTC
+        timestamp = activity.get("timestamp")
+        if isinstance(timestamp, datetime):
+            activity["timestamp"] = to_utc_iso(timestamp.replace(tzinfo=timezone.utc))
+
+        return activity
+
+    @staticmethod
+    def _activities_query(business_code: str, employee_id: str = None, shift_id: str = None, start=None,
+                          end=None, clock_in: bool = None) -> dict:
+        """ Helper method to build the filter for a business's activities """
+        query = {"meta.business_code": business_code}
+
+        if employee_id is not None:
+            query["meta.employee_id"] = employee_id
+
+        if shift_id is not None:
+            query["shift_id"] = shift_id
+
+        if clock_in is not None:
+            query["clock_in"] = clock_in
+
+        if start is not None or end is not None:
+            query["timestamp"] = {}
+            if start is not None:
+                query["timestamp"]["$gte"] = start
+            if end is not None:
+                query["timestamp"]["$lt"] = end
+
+        return query
+
+    def get_employee_activities(self, business_code: str, limit: int = 100, cursor: str = None,
+                                employee_id: str = None, shift_id: str = None, start=None, end=None,
+                                clock_in: bool = None):
+        """
+        Get one page of a business's activities, newest first.
+        :param limit: Maximum number of activities in the page.
+        :param cursor: The next_cursor of the previous page, or None for the first page.
+        :param employee_id: Only activities of this employee.
+        :param shift_id: Only activities of this shift.
+        :param start: Only activities at or after this datetime.
+        :param end: Only activities before this datetime.
+        :param clock_in: Only clock ins (True) or clock outs (False).
+        :return: The activities and the cursor for the next page, None when this is the last page.
+        """
+        query = self._activities_query(business_code, employee_id, shift_id, start, end, clock_in)
+
+        # Continue strictly after the last (timestamp, _id) of the previous page
+        if cursor is not None:
+            last_timestamp, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$lt": last_timestamp}},
+                {"timestamp": last_timestamp, "_id": {"$lt": last_id}}
+            ]
+
+        # Ask for one extra activity to know whether another page exists
+        activities = list(
+            self.activity.find(query).sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1)
         )
 
-        if result is not None:
-            self._insert_activity(shift=shift, employee_id=shift["employee_id"],
-                                  employee_name=shift["employee_name"], clock_in=False, business_code=schedule["business_code"])
+        next_cursor = None
+        if len(activities) > limit:
+            activities = activities[:limit]
+            next_cursor = encode_cursor([activities[-1]["timestamp"], activities[-1]["_id"]])
 
-            return True
-
-    def get_upcoming_shift(self, user_id: str, business_code: str):
-        now_iso = datetime.now().isoformat() + "Z"
+        return [self._to_response(activity) for activity in activities], next_cursor
 
-        query = {
-            "business_code": business_code,
-            "shifts": {
-                "$elemMatch": {
-                    "employee_id": user_id,
-                    "clocked_in": False,
-                    "completed": False,
-                    "start": {"$gte": now_iso}
-                }
-            }
-        }
+    def iter_employee_activities(self, business_code: str, employee_id: str = None, shift_id: str = None,
+                                 start=None, end=None, clock_in: bool = None):
+        """ Get a cursor over every matching activity of a business, newest first, for streaming """
+        query = self._activities_query(business_code, employee_id, shift_id, start, end, clock_in)
+        cursor = self.activity.find(query).sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
 
-        projection = {
-            "shifts": 1,
-            "_id": 0
-        }
+        return (self._to_response(activity) for activity in cursor)
 
-        doc = self.schedules.find_one(query, projection)
+    def _activities_after(self, business_code: str, timestamp, activity_id=None):
+        """
+        Helper method to get a cursor over a business's activities after a point, oldest first.
+        :param activity_id: With it, only activities strictly after (timestamp, activity_id). Without it, every
+            activity at or after the timestamp.
+        """
+        query = {"meta.business_code": business_code}
 
-        if not doc or "shifts" not in doc:
+        if activity_id is None:
+            query["timestamp"] = {"$gte": timestamp}
+        else:
+            query["$or"] = [
+                {"timestamp": {"$gt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$gt": activity_id}}
+            ]
+
+        return self.activity.find(query).sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+
+    def stream_activities(self, business_code: str, last_event_id: str = None, heartbeat: float = None):
+        """
+        Follow the new activities of a business.
+        Event ids are (timestamp, _id) cursors like next_cursor, so a client reconnecting with its last event id
+        gets what it missed from the database, whichever worker it reconnects to.
+        :param last_event_id: Id of the last event the client received. Activities after it are sent first.
+        :param heartbeat: Seconds between heartbeats. Defaults to STREAM_HEARTBEAT.
+        :return: A generator of (event id, activity) pairs, with None for a heartbeat.
+        """
+        # Decoded up front so a malformed id is reported before the stream starts
+        after = decode_cursor(last_event_id) if last_event_id else None
+        if after is not None and len(after) != 2:
+            raise ValueError("Invalid cursor.")
+
+        return self._follow_activities(business_code, after, heartbeat or self.STREAM_HEARTBEAT)
+
+    def _follow_activities(self, business_code: str, after: list | None, heartbeat: float):
+        """ Helper method to generate the events of a live activity stream """
+        subscription = self.stream.subscribe(business_code)
+        seen = OrderedDict()
+
+        def events(activities):
+            """ Turn the activities not sent before into events """
+            for activity in activities:
+                if activity["_id"] in seen:
+                    continue
+
+                seen[activity["_id"]] = True
+                if len(seen) > self.STREAM_SEEN_SIZE:
+                    seen.popitem(last=False)
+
+                yield encode_cursor([activity["timestamp"], activity["_id"]]), self._to_response(activity)
+
+        try:
+            caught_up_at = datetime.now(timezone.utc)
+
+            if after is not None:
+                yield from events(self._activities_after(business_code, *after))
+
+            next_heartbeat = time.monotonic() + heartbeat
+
+            while True:
+                try:
+                    activity = subscription.get(timeout=max(next_heartbeat - time.monotonic(), 0))
+
+                    if activity is self.stream.OVERFLOW:
+                        return
+
+                    yield from events([activity])
+
+                except queue.Empty:
+                    pass
+
+                if time.monotonic() < next_heartbeat:
+                    continue
+
+                # Without a change stream only this process's activities arrive live, so pick up the ones
+                # other workers recorded since the last heartbeat
+                if not self.stream.change_streams:
+                    since, caught_up_at = caught_up_at - self.STREAM_CATCH_UP_SLACK, datetime.now(timezone.utc)
+
+                    # Never reach back past the event the client resumed from
+                    if after is not None and since <= after[0].replace(tzinfo=timezone.utc):
+                        yield from events(self._activities_after(business_code, *after))
+                    else:
+                        yield from events(self._activities_after(business_code, since))
+
+                next_heartbeat = time.monotonic() + heartbeat
+                yield None
+
+        finally:
+            self.stream.unsubscribe(business_code, subscription)
+
+    def _create_activity_collection(self) -> bool:
+        """
+        Helper method to create the activity collection as a time-series collection.
+        Falls back to a plain collection with the same document shape where time-series is unavailable,
+        or cannot carry the registry's indexes (before MongoDB 6.0).
+        :return: True if a time-series collection was created.
+        """
+        version = tuple(self.db.client.server_info().get("versionArray", [0, 0])[:2])
+        if version < self.TIME_SERIES_MIN_VERSION:
+            self.db.create_collection(self.ACTIVITY_COLLECTION)
             return False
 
-        # Filter again to isolate only valid upcoming shifts
-        upcoming_shifts = [
-            s for s in doc["shifts"]
-            if s.get("employee_id") == user_id
-               and not s.get("clocked_in", False)
-               and not s.get("completed", False)
-               and s.get("start") >= now_iso
-        ]
+        try:
+            self.db.create_collection(self.ACTIVITY_COLLECTION, timeseries=self.TIME_SERIES_OPTIONS)
+            return True
 
-        if not upcoming_shifts:
+        # In-memory test doubles do not implement it
+        except (errors.OperationFailure, NotImplementedError):
+            self.db.create_collection(self.ACTIVITY_COLLECTION)
             return False
 
-        # Sort by soonest upcoming
-        upcoming_shifts.sort(key=lambda s: s["start"])
-
-        return upcoming_shifts[0]
-
-
-    def log_activity(self, shift_id: str, clock_in: bool) -> bool:
-        schedule = self.schedules.find_one({"shifts._id": shift_id})
-
-        if not schedule:
-            return False
+    @staticmethod
+    def _parse_legacy_timestamp(timestamp: str) -> datetime:
+        """
+        Helper method to parse a timestamp stored as a string by earlier versions.
+        Those were naive server local times with a 'Z' appended, so they are read as local time.
+        """
+        parsed = datetime.fromisoformat(timestamp.removesuffix('Z'))
+
+        if parsed.tzinfo is None:
+            parsed = parsed.astimezone()
+
+        return parsed.astimezone(timezone.utc)
+
+    def _convert_legacy_activity(self, activity: dict) -> dict:
+        """ Helper method to convert an activity from the flat, string timestamp layout """
+        converted = {k: v for k, v in activity.items() if k not in ("business_code", "employee_id")}
+        converted.setdefault("meta", {"business_code": activity.get("business_code"),
+                                      "employee_id": activity.get("employee_id")})
+
+        timestamp = activity.get("timestamp")
+        if isinstance(timestamp, str):
+            converted["timestamp"] = self._parse_legacy_timestamp(timestamp)
+        elif timestamp is None:
+            converted["timestamp"] = activity["_id"].generation_time
+
+        return converted
+
+    def migrate_activity_storage(self) -> int:
+        """
+        Move the activity log into time-bucketed storage with BSON datetime timestamps.
+        Time-series collections cannot be converted in place, so the old collection is renamed,
+        copied across in batches and then dropped. Safe to rerun after an interrupted copy.
+        :return: The number of activities copied.
+        """
+        existing = self.db.list_collection_names()
+
+        if self.LEGACY_ACTIVITY_COLLECTION in existing:
+            # An earlier run was interrupted mid-copy, so start the copy over
+            self.db.drop_collection(self.ACTIVITY_COLLECTION)
+
+        elif self.ACTIVITY_COLLECTION in existing:
+            self._move_to_legacy()
 
-        if clock_in:
-            return self._clock_in(schedule, shift_id)
         else:
-            return self._clock_out(schedule, shift_id)
-
-
-    def get_employee_activities(self, business_code: str):
-        activities = self.activity.find({"business_code": business_code})
-
-        return list(activities)
\ No newline at end of file
+            self._create_activity_collection()
+            return 0
+
+        self._create_activity_collection()
+        copied = self._copy(self.db[self.LEGACY_ACTIVITY_COLLECTION], self.activity, self._convert_legacy_activity)
+        self.db.drop_collection(self.LEGACY_ACTIVITY_COLLECTION)
+
+        return copied
+
+    def _copy(self, source, target, convert=None) -> int:
+        """ Helper method to copy every document of a collection into another in batches """
+        copied = 0
+        batch = []
+        for document in source.find():
+            batch.append(convert(document) if convert else document)
+
+            if len(batch) >= self.MIGRATION_BATCH_SIZE:
+                target.insert_many(batch, ordered=False)
+                copied += len(batch)
+                batch = []
+
+        if batch:
+            target.insert_many(batch, ordered=False)
+            copied += len(batch)
+
+        return copied
+
+    def _move_to_legacy(self):
+        """
+        Helper method to move the activity collection aside as the legacy collection.
+        Time-series collections cannot be renamed, e.g. one created on MongoDB 5.x by an earlier build, so those
+        are copied into a staging collection first. Only the complete copy is renamed to legacy, so an interrupted
+        copy leaves the activity collection untouched and is started over.
+        """
+        try:
+            self.activity.rename(self.LEGACY_ACTIVITY_COLLECTION)
+            return
+        except errors.OperationFailure:
+            pass
+
+        self.db.drop_collection(self.STAGING_ACTIVITY_COLLECTION)
+        staging = self.db[self.STAGING_ACTIVITY_COLLECTION]
+
+        self._copy(self.activity, staging)
+        staging.rename(self.LEGACY_ACTIVITY_COLLECTION)
+        self.db.drop_collection(self.ACTIVITY_COLLECTION)
@@ -0,0 +1,122 @@
+import queue
+import threading
+from collections import defaultdict
+
+from pymongo import errors
+
+from handlers.db_handler import DatabaseHandler
+
+
+class ActivityStreamHandler:
+
+    # Activities buffered per subscriber. A subscriber that falls further behind is dropped
+    # and replays what it missed from the database when it reconnects
+    SUBSCRIBER_QUEUE_SIZE = 1000
+
+    # Put on a dropped subscriber's queue so its stream ends
+    OVERFLOW = object()
+
+    def __init__(self, db_handler: DatabaseHandler):
+        """
+        Initializes the ActivityStreamHandler, which fans new activities out to the live streams of their business.
+        Activities arrive through a change stream on the activity collection when start() can open one,
+        otherwise ActivityHandler publishes the activities this process records.
+        """
+        self.activity = db_handler.database["Activity"]
+
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+        self._change_stream = None
+        self.change_streams = False
+
+    def start(self) -> bool:
+        """
+        Follow activity inserts through a change stream, so activities recorded by other workers are delivered too.
+        Change streams need a replica set and are not supported on time-series collections.
+        :return: True if a change stream was opened, False if only activities published in process are delivered.
+        """
+        try:
+            self._change_stream = self.activity.watch([{"$match": {"operationType": "insert"}}])
+
+        # In-memory test doubles do not implement watch at all
+        except (errors.PyMongoError, NotImplementedError, TypeError):
+            return False
+
+        self.change_streams = True
+        threading.Thread(target=self._follow, name="activity-stream", daemon=True).start()
+        return True
+
+    def _follow(self):
+        """ Helper method to dispatch the activities of the change stream. Runs on its own thread """
+        try:
+            for change in self._change_stream:
+                self._dispatch(change["fullDocument"])
+
+        # pymongo already resumes after transient errors, so this is a lost stream or a stop()
+        except errors.PyMongoError as e:
+            if self.change_streams:
+                print(f"Activity change stream stopped, delivering in-process activities only: {e}")
+
+        finally:
+            self.change_streams = False
+
+    def stop(self):
+        """ Close the change stream, if one is open """
+        if self._change_stream is not None:
+            self.change_streams = False
+            self._change_stream.close()
+
+    def publish(self, activity: dict):
+        """ Deliver an activity recorded by this process, unless the change stream delivers it already """
+        if not self.change_streams:
+            self._dispatch(activity)
+
+    def _dispatch(self, activity: dict):
+        """ Helper method to hand an activity to every subscriber of its business """
+        business_code = activity["meta"]["business_code"]
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(business_code, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(activity)
+
+            except queue.Full:
+                self.unsubscribe(business_code, subscription)
+
+                # Make room for the marker that ends the stream
+                while True:
+                    try:
+                        subscription.get_nowait()
+                    except queue.Empty:
+                        break
+                subscription.put_nowait(self.OVERFLOW)
+
+    def subscribe(self, business_code: str) -> queue.Queue:
+        """ Get a queue receiving the new activities of a business """
+        subscription = queue.Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+
+        with self._lock:
+            self._subscribers[business_code].add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, business_code: str, subscription: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(business_code)
+
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[business_code]
+
+    def get_stats(self) -> dict:
+        """ Return the number of open streams and how activities reach them """
+        with self._lock:
+            return {
+                "change_streams": self.change_streams,
+                "businesses": len(self._subscribers),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values())
+            }
@@ -0,0 +1,291 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from bson import ObjectId
+from pymongo import errors
+
+from handlers.db_handler import DatabaseHandler
+from handlers.schedule_handler import ScheduleHandler, expand_weekly_slots, validate_weekly_slot
+from handlers.schedule_solver import ScheduleSolver
+from tools import parse_utc, to_utc_iso
+
+
+class AutoScheduleHandler:
+
+    # Job states. Queued and running jobs block another job for the same schedule
+    QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+    DEFAULT_MAX_HOURS_PER_WEEK = 40
+
+    # Seconds a running job may take beyond the solver's time limit, for reading employees and saving the draft.
+    # A job running longer was orphaned, e.g. by a restart, and is failed so it stops blocking its schedule
+    LEASE_MARGIN = 60
+
+    # Seconds a job may wait for a worker. A job queued longer was lost with the worker pool of a stopped process
+    QUEUE_LEASE = 900
+
+    def __init__(self, db_handler: DatabaseHandler, max_workers: int = 1, time_limit: float = 10.0):
+        """
+        Initializes the AutoScheduleHandler with the database handler
+        :param max_workers: Number of worker threads generating schedules. 0 runs jobs inline on the caller.
+        :param time_limit: Seconds the solver's local search may run per job.
+        """
+        db = db_handler.database
+
+        # Collections and indexes are created by SchemaHandler.bootstrap
+        self.users_collection = db["Users"]
+        self.schedules_collection = db["Schedules"]
+        self.shifts_collection = db["Shifts"]
+
+        # Job state lives in the database so any worker can answer a status request
+        self.jobs_collection = db["ScheduleJobs"]
+
+        self.time_limit = time_limit
+        self.lease = timedelta(seconds=time_limit + self.LEASE_MARGIN)
+        self._executor = None
+
+        # The solver is pure Python, so one worker per process keeps it from starving the request threads
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="autoschedule")
+
+    @staticmethod
+    def _validate_staffing(staffing: list) -> None:
+        """ Helper method to check the staffing slots of a job. Raises ValueError for the first invalid slot """
+        if not isinstance(staffing, list) or not staffing:
+            raise ValueError("Staffing must be a non-empty list of slots")
+
+        for index, slot in enumerate(staffing):
+            problem = validate_weekly_slot(slot)
+
+            if not problem and (not isinstance(slot.get('count'), int) or slot['count'] < 1):
+                problem = "count must be a positive whole number"
+
+            if problem:
+                raise ValueError(f"Slot {index}: {problem}")
+
+    def set_availability(self, user_id: str, availability: list) -> bool:
+        """
+        Store the weekly availability of an employee, used when schedules are generated.
+        :param availability: Windows with day and 'HH:MM' start and end in the business time zone.
+            Employees who never set their availability count as available whenever the business is open.
+        """
+        if not isinstance(availability, list):
+            raise ValueError("Availability must be a list of windows")
+
+        for index, window in enumerate(availability):
+            problem = validate_weekly_slot(window)
+            if problem:
+                raise ValueError(f"Window {index}: {problem}")
+
+        windows = [{"day": window['day'], "start": window['start'], "end": window['end']} for window in availability]
+        result = self.users_collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"availability": windows}})
+
+        return result.matched_count > 0
+
+    def get_availability(self, user_id: str) -> list | None:
+        """ Get the weekly availability of an employee, or None if they never set it """
+        user = self.users_collection.find_one({"_id": ObjectId(user_id)}, {"availability": 1})
+        return user.get("availability") if user else None
+
+    def start_job(self, schedule_id: str, business_code: str, staffing: list, hours: list, user_id: str,
+                  timezone: str = "UTC", max_hours_per_week: int = DEFAULT_MAX_HOURS_PER_WEEK) -> str | None:
+        """
+        Queue the generation of a draft for a schedule's month.
+        Each staffing slot on each matching day becomes a demand, filled from the business's employees by
+        ScheduleSolver. Positions nobody can fill are added as open shifts employees can take.
+        :param staffing: Weekly slots with day, 'HH:MM' start and end and the number of employees needed (count).
+        :param hours: The business hours, a list of {day, open, close} with 'HH:MM' times.
+        :param timezone: IANA time zone of the slot times, business hours and availability.
+        :param max_hours_per_week: Most hours one employee is scheduled for in a week, counting stored shifts.
+        :return: The id of the job, or None if the schedule was not found.
+        """
+        self._validate_staffing(staffing)
+
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError, TypeError):
+            raise ValueError(f"Unknown time zone: {timezone}")
+
+        if not isinstance(max_hours_per_week, int) or max_hours_per_week < 1:
+            raise ValueError("max_hours_per_week must be a positive whole number")
+
+        if not ObjectId.is_valid(schedule_id):
+            return None
+
+        schedule = self.schedules_collection.find_one({"_id": ObjectId(schedule_id), "business_code": business_code},
+                                                      {"year": 1, "month": 1})
+        if not schedule:
+            return None
+
+        self._expire_orphaned_jobs(schedule_id)
+
+        if self.shifts_collection.find_one({"schedule_id": schedule_id, "job_id": {"$exists": True}}, {"_id": 1}):
+            raise ValueError("A draft has already been generated for this schedule")
+
+        job = {
+            "business_code": business_code,
+            "schedule_id": schedule_id,
+            "status": self.QUEUED,
+            "active": True,
+            "staffing": [{"day": slot['day'], "start": slot['start'], "end": slot['end'], "count": slot['count']}
+                         for slot in staffing],
+            "timezone": timezone,
+            "max_hours_per_week": max_hours_per_week,
+            "created_at": datetime.now(),
+            "created_by": user_id
+        }
+
+        # A second draft would double the staffing of every slot. The unique index on active jobs rejects it
+        try:
+            job_id = self.jobs_collection.insert_one(job).inserted_id
+        except errors.DuplicateKeyError:
+            raise ValueError("A draft is already being generated for this schedule")
+
+        if self._executor is None:
+            self._run_job(job_id, job, schedule, hours)
+        else:
+            self._executor.submit(self._run_job, job_id, job, schedule, hours)
+
+        return str(job_id)
+
+    def get_job(self, job_id: str, business_code: str) -> dict | None:
+        """ Get the state of a job, and its result once it is done """
+        if not ObjectId.is_valid(job_id):
+            return None
+
+        return self.jobs_collection.find_one({"_id": ObjectId(job_id), "business_code": business_code},
+                                             {"staffing": 0, "active": 0})
+
+    def _expire_orphaned_jobs(self, schedule_id: str):
+        """ Helper method to fail the active jobs of a schedule that outlived their lease, so a new job can start """
+        now = datetime.now()
+
+        self.jobs_collection.update_many(
+            {"schedule_id": schedule_id, "active": True, "$or": [
+                {"status": self.RUNNING, "started_at": {"$lt": now - self.lease}},
+                {"status": self.QUEUED, "created_at": {"$lt": now - timedelta(seconds=self.QUEUE_LEASE)}}
+            ]},
+            {"$set": {"status": self.FAILED, "error": "The job was stopped before it finished", "finished_at": now},
+             "$unset": {"active": ""}}
+        )
+
+    def _run_job(self, job_id: ObjectId, job: dict, schedule: dict, hours: list):
+        """ Helper method to generate a draft and record the outcome on the job. Runs on the worker pool """
+        started = self.jobs_collection.update_one({"_id": job_id, "status": self.QUEUED},
+                                                  {"$set": {"status": self.RUNNING, "started_at": datetime.now()}})
+
+        # Expired while it waited for a worker
+        if not started.matched_count:
+            return
+
+        try:
+            result = self._generate(str(job_id), job, schedule, hours)
+            update = {"$set": {"status": self.DONE, "result": result}}
+        except Exception as e:
+            update = {"$set": {"status": self.FAILED, "error": str(e)}}
+
+        update["$set"]["finished_at"] = datetime.now()
+        update["$unset"] = {"active": ""}
+        self.jobs_collection.update_one({"_id": job_id, "status": self.RUNNING}, update)
+
+    @staticmethod
+    def _is_available(windows: list | None, slot: dict) -> bool:
+        """ Helper method to check if an employee's availability covers a staffing slot """
+        if windows is None:
+            return True
+
+        return any(window["day"] == slot["day"] and window["start"] <= slot["start"] and slot["end"] <= window["end"]
+                   for window in windows)
+
+    def _generate(self, job_id: str, job: dict, schedule: dict, hours: list) -> dict:
+        """
+        Helper method to expand the staffing into demands, solve them and insert the draft in one bulk insert.
+        :return: The number of shifts added, how many of them are open, the skipped slot dates and solver statistics.
+        """
+        tz = ZoneInfo(job["timezone"])
+        staffing = job["staffing"]
+        demands, skipped = [], []
+
+        for occurrence in expand_weekly_slots(staffing, schedule["year"], schedule["month"], tz, hours):
+            if occurrence["problem"]:
+                skipped.append({"slot": occurrence["slot"], "date": occurrence["date"].isoformat(),
+                                "message": occurrence["problem"]})
+                continue
+
+            minutes = (parse_utc(occurrence["end"]) - parse_utc(occurrence["start"])).total_seconds() // 60
+            demands.append({
+                "slot": occurrence["slot"],
+                "start": occurrence["start"],
+                "end": occurrence["end"],
+                "minutes": int(minutes),
+                "week": occurrence["date"].isocalendar()[:2],
+                "count": staffing[occurrence["slot"]]["count"]
+            })
+
+        employees = {str(user["_id"]): user for user in self.users_collection.find(
+            {"business_code": job["business_code"], "role": "EMPLOYEE"}, {"name": 1, "username": 1, "availability": 1})}
+
+        candidates = {index: [employee_id for employee_id, user in employees.items()
+                              if self._is_available(user.get("availability"), slot)]
+                      for index, slot in enumerate(staffing)}
+
+        solver = ScheduleSolver(demands, candidates, max_week_minutes=job["max_hours_per_week"] * 60,
+                                time_limit=self.time_limit)
+
+        # Shifts the employees already have count against overlaps and the weekly cap, including those in the
+        # weeks the month starts and ends in
+        if demands:
+            window_start = to_utc_iso(parse_utc(demands[0]["start"]) - timedelta(days=7))
+            window_end = to_utc_iso(parse_utc(demands[-1]["end"]) + timedelta(days=7))
+
+            for shift in self.shifts_collection.find({"employee_id": {"$in": list(employees)},
+                                                      "start": {"$lt": window_end}, "end": {"$gt": window_start}},
+                                                     {"employee_id": 1, "start": 1, "end": 1}):
+                start, end = parse_utc(shift["start"]), parse_utc(shift["end"])
+                solver.add_existing(shift["employee_id"], shift["start"], shift["end"],
+                                    start.astimezone(tz).date().isocalendar()[:2],
+                                    int((end - start).total_seconds() // 60))
+
+        solution = solver.solve()
+        shifts = []
+
+        for demand, assigned, missing in zip(demands, solution["assigned"], solution["open"]):
+            # Positions nobody could fill are posted straight away so employees can take them
+            staff = [(employee_id, employees[employee_id].get("name") or employees[employee_id].get("username"))
+                     for employee_id in assigned] + [(None, ScheduleHandler.OPEN_SHIFT_NAME)] * missing
+
+            for employee_id, name in staff:
+                shifts.append({
+                    "_id": str(ObjectId()),
+                    "schedule_id": str(schedule["_id"]),
+                    "business_code": job["business_code"],
+                    "job_id": job_id,
+                    "employee_id": employee_id,
+                    "employee_name": name,
+                    "start": demand["start"],
+                    "end": demand["end"],
+                    "posted": employee_id is None,
+                    "clocked_in": False,
+                    "completed": False
+                })
+
+        # A job that outlived its lease may have been replaced by another, whose draft would be doubled by this one
+        if not self.jobs_collection.find_one({"_id": ObjectId(job_id), "status": self.RUNNING}, {"_id": 1}):
+            raise RuntimeError("The job expired before its draft was saved")
+
+        if shifts:
+            self.shifts_collection.insert_many(shifts, ordered=False)
+            self.schedules_collection.update_one({"_id": schedule["_id"]}, {"$inc": {"revision": 1}})
+
+        return {
+            "added": len(shifts),
+            "open": sum(solution["open"]),
+            "skipped": skipped,
+            "stats": solution["stats"]
+        }
+
+    def shutdown(self):
+        """ Stop the worker pool, waiting for running jobs to finish """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -5,6 +5,7 @@ from bson import ObjectId
 from pymongo import errors
 
 from handlers.account_handler import AccountHandler
+from handlers.cache_handler import CacheHandler
 from handlers.db_handler import DatabaseHandler
 from handlers.exceptions.exceptions import BusinessAlreadyExistsError
 from handlers.validation_handler import ValidationHandler
@@ -13,44 +14,28 @@ from tools import id_generator
 
 class BusinessHandler:
 
-    def __init__(self, db_handler: DatabaseHandler):
-        """ Initializes the BusinessHandler with database handler """
+    def __init__(self, db_handler: DatabaseHandler, cache: CacheHandler = None, user_cache: CacheHandler = None):
+        """
+        Initializes the BusinessHandler with database handler
+        :param cache: Cache for business lookups by code. Defaults to 1024 entries kept for 5 minutes.
+        :param user_cache: The user cache shared with ScheduleHandler, invalidated when a user joins a business.
+        """
         db = db_handler.database
 
+        # Businesses by code - they are read on every home page load and almost never change.
+        # Every write below invalidates its entry, the TTL bounds staleness left by other workers
+        self.cache = cache or CacheHandler(max_size=1024, ttl=300)
+        self.user_cache = user_cache or CacheHandler(max_size=4096, ttl=300)
+
         #Stores the database reference
         self.db = db
 
         # Users collection
         self.users_collection = self.db["Users"]
 
-        # Initialize database for business management -
-        # Create 'Businesses' Collection if it does not already exist
-        if "Businesses" not in db.list_collection_names():
-            db.create_collection("Businesses")
-
+        # Collections and indexes are created by SchemaHandler.bootstrap
         self.business_collection = db["Businesses"]
 
-        # Ensure unique field 'business_name' exists
-        self.business_collection.create_index([("business_name", 1)], unique=False)
-
-        # Ensure field 'hours' exists
-        self.business_collection.create_index([("hours", 1)], unique=False)
-
-        # Ensure field 'code' exists
-        self.business_collection.create_index([("code", 1)], unique=True)
-
-        # Ensure field 'created_by' exists
-        self.business_collection.create_index([("created_by", 1)], unique=False)
-
-        # Ensure field 'created_dt' exists
-        self.business_collection.create_index([("created_dt", 1)], unique=False)
-
-        # Ensure field 'schedules' exists
-        self.business_collection.create_index([("schedules", 1)], unique=False)
-
-        # Ensure field 'employees' exists
-        self.business_collection.create_index([("employees", 1)], unique=False)
-
     def _insert_business(self, business_name: str, hours: dict, user_id: str, code: str):
         business_dict = {
             "business_name": business_name,
@@ -63,17 +48,20 @@ class BusinessHandler:
         }
 
         self.business_collection.insert_one(business_dict)
+        self.cache.invalidate(code)
 
     def _insert_user(self, business: dict, user_id: str):
         self.business_collection.update_one(
             {"_id": business["_id"]},
             {"$addToSet": {"employees": user_id}}
         )
+        self.cache.invalidate(business["code"])
 
         self.users_collection.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": {"business_code": business["code"]}}
         )
+        self.user_cache.invalidate(str(user_id))
         return True
 
 
@@ -102,7 +90,7 @@ class BusinessHandler:
         if not username and not user_id:
             raise ValueError("User Info not given")
 
-        business = self.business_collection.find_one({"code": code})
+        business = self.get_business_from_code(code)
         if not business:
             raise ValueError("Business not found")
 
@@ -121,18 +109,23 @@ class BusinessHandler:
 
 
     def get_business_from_code(self, code: str):
-        return self.business_collection.find_one({"code": code})
+        return self.cache.get_or_load(code, lambda: self.business_collection.find_one({"code": code}))
 
 
-    def get_all_employees(self, business_code: str):
-        """ Get all employees by business code """
-        employees = self.users_collection.find({"business_code": business_code, "role": "EMPLOYEE"}).sort("username", 1)
+    def iter_all_employees(self, business_code: str):
+        """ Lazily yield all employees by business code """
+        employees = self.users_collection.find(
+            {"business_code": business_code, "role": "EMPLOYEE"},
+            {"username": 1, "name": 1}
+        ).sort("username", 1)
 
-        return [
-            {
+        for emp in employees:
+            yield {
                 "employee_id": str(emp.get("_id")),
                 "username": emp.get("username", ""),
                 "name": emp.get("name", "")
             }
-            for emp in employees
-        ]
\ No newline at end of file
+
+    def get_all_employees(self, business_code: str):
+        """ Get all employees by business code """
+        return list(self.iter_all_employees(business_code))
\ No newline at end of file
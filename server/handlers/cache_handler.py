@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheHandler:
+
+    def __init__(self, max_size: int = 1024, ttl: float | None = None, clock=time.monotonic):
+        """
+        Initializes a thread-safe, size-bounded LRU cache with optional expiry.
+        :param max_size: Maximum number of entries. The least recently used entry is evicted beyond this.
+        :param ttl: Seconds an entry stays valid, or None to keep entries until evicted or invalidated.
+        :param clock: Time source, replaceable in tests.
+        """
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1.")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """ Return the cached value for the key, or the default if it is missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                value, expires_at = entry
+
+                if expires_at is None or expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+
+                # Expired
+                del self._entries[key]
+
+            self._misses += 1
+            return default
+
+    def set(self, key, value):
+        """ Store a value, evicting the least recently used entry if the cache is full """
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for the key, calling the loader on a miss.
+        None results are not cached, so lookups for missing records are retried.
+        """
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = loader()
+
+            if value is not None:
+                self.set(key, value)
+
+        return value
+
+    def invalidate(self, key):
+        """ Drop a single entry """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """ Drop every entry """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """ Return the cache size and hit/miss counters """
+        with self._lock:
+            lookups = self._hits + self._misses
+
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,18 +1,97 @@
-from pymongo import MongoClient
+import threading
+
+from pymongo import MongoClient, monitoring
 from pymongo.server_api import ServerApi
 
 
+class PoolMonitor(monitoring.ConnectionPoolListener):
+
+    def __init__(self):
+        """
+        Counts the connections of the client's pools from connection pool events, so pool saturation can be
+        reported without asking the server. Registered on the MongoClient when it is created.
+        """
+        self.max_pool_size = None
+
+        self._lock = threading.Lock()
+        self._open = {}
+        self._in_use = {}
+        self._waiting = {}
+
+    def _add(self, counts: dict, address, amount: int):
+        """ Helper method to adjust the count of a pool """
+        with self._lock:
+            counts[address] = max(counts.get(address, 0) + amount, 0)
+
+    def get_stats(self) -> dict:
+        """
+        Return the connection counts of the busiest pool.
+        Saturation is the share of the pool's connections checked out, None if the pool size is unknown.
+        """
+        with self._lock:
+            address = max(self._in_use, key=self._in_use.get, default=None)
+            in_use = self._in_use.get(address, 0)
+
+            return {
+                "max_size": self.max_pool_size,
+                "open": self._open.get(address, 0),
+                "in_use": in_use,
+                "waiting": self._waiting.get(address, 0),
+                "saturation": round(in_use / self.max_pool_size, 3) if self.max_pool_size else None
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            for counts in (self._open, self._in_use, self._waiting):
+                counts.pop(event.address, None)
+
+    def connection_created(self, event):
+        self._add(self._open, event.address, 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(self._open, event.address, -1)
+
+    def connection_check_out_started(self, event):
+        self._add(self._waiting, event.address, 1)
+
+    def connection_check_out_failed(self, event):
+        self._add(self._waiting, event.address, -1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._waiting[event.address] = max(self._waiting.get(event.address, 0) - 1, 0)
+            self._in_use[event.address] = self._in_use.get(event.address, 0) + 1
+
+    def connection_checked_in(self, event):
+        self._add(self._in_use, event.address, -1)
+
+
 class DatabaseHandler:
 
     def __init__(self, conn_string: str):
         """ Initializes the database connection using the provided connection string """
+        self.pool_monitor = PoolMonitor()
 
         if conn_string:
             uri = conn_string
 
             try:
                 # Create a client from our connection string
-                self.client = MongoClient(uri, server_api=ServerApi(version='1', strict=True, deprecation_errors=True))
+                self.client = MongoClient(uri, server_api=ServerApi(version='1', strict=True, deprecation_errors=True),
+                                          event_listeners=[self.pool_monitor])
+                self.pool_monitor.max_pool_size = self.client.options.pool_options.max_pool_size
 
                 self.database = self.client['Capstone-T3']
                 print("Successfully Connected to Database.")
@@ -20,3 +20,19 @@ class BusinessAlreadyExistsError(Exception):
     def __init__(self, message="Business already exists."):
         self.message = message
         super().__init__(self.message)
+
+
+class PasswordHandlerBusyError(Exception):
+    """Exception raised when the password worker pool has no room for another call."""
+
+    def __init__(self, message="Server is busy. Please try again shortly."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ShiftConflictError(Exception):
+    """Exception raised when a shift would overlap another shift of the same employee."""
+
+    def __init__(self, message="Shift overlaps another shift of this employee."):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pymongo
+from pymongo import errors
+
+from handlers.db_handler import DatabaseHandler
+from tools import utc_now_iso
+
+
+class HealthHandler:
+
+    # Seconds a ping may take before the database counts as unreachable
+    PROBE_TIMEOUT = 2.0
+
+    # A result older than this many probe intervals means the probe thread is stuck, which is reported as not ready
+    STALE_INTERVALS = 3
+
+    def __init__(self, db_handler: DatabaseHandler, interval: float = 5.0, clock=time.monotonic):
+        """
+        Initializes the HealthHandler, which pings the database on a background thread and keeps the last result,
+        so readiness checks never reach the database themselves however often they are polled.
+        :param interval: Seconds between probes.
+        :param clock: Time source for the age of the last probe, replaceable in tests.
+        """
+        self.client = db_handler.client
+        self.pool_monitor = getattr(db_handler, "pool_monitor", None)
+
+        self.interval = interval
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Replaced as a whole by every probe, so readers never see a half written result
+        self._snapshot = {"reachable": False, "latency_ms": None, "error": "not probed yet",
+                          "checked_at": None, "probed": None, "pool": None}
+
+    def probe(self) -> dict:
+        """ Ping the database once and keep the result and the pool's connection counts """
+        started = time.perf_counter()
+        error = None
+
+        try:
+            with pymongo.timeout(self.PROBE_TIMEOUT):
+                self.client.admin.command("ping")
+
+        # Only the kind of error is kept, the message can name database hosts
+        except errors.PyMongoError as e:
+            error = type(e).__name__
+
+        self._snapshot = {
+            "reachable": error is None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error,
+            "checked_at": utc_now_iso(),
+            "probed": self._clock(),
+            "pool": self.pool_monitor.get_stats() if self.pool_monitor else None
+        }
+        return self._snapshot
+
+    def start(self):
+        """ Probe once, then keep probing every interval on a daemon thread """
+        self.probe()
+
+        self._thread = threading.Thread(target=self._run, name="health-probe", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """ Helper method to probe until stop() is called. Runs on its own thread """
+        while not self._stop.wait(self.interval):
+            self.probe()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_readiness(self) -> tuple[bool, dict]:
+        """
+        Report whether this instance can serve requests, from the last probe only.
+        Not ready when the database was unreachable, the probe result is stale, or every pooled connection
+        is in use with requests waiting for one.
+        :return: Whether the instance is ready, and the details of the last probe.
+        """
+        snapshot = self._snapshot
+        pool = snapshot["pool"]
+        age = None if snapshot["probed"] is None else self._clock() - snapshot["probed"]
+
+        problem = None
+        if not snapshot["reachable"]:
+            problem = "database unreachable"
+        elif age > self.interval * self.STALE_INTERVALS:
+            problem = "health probe is stale"
+        elif pool and pool["saturation"] is not None and pool["saturation"] >= 1 and pool["waiting"] > 0:
+            problem = "connection pool saturated"
+
+        return problem is None, {
+            "status": "ready" if problem is None else "unavailable",
+            "problem": problem,
+            "checked_at": snapshot["checked_at"],
+            "age_seconds": None if age is None else round(age, 1),
+            "database": {"reachable": snapshot["reachable"], "latency_ms": snapshot["latency_ms"],
+                         "error": snapshot["error"]},
+            "pool": pool
+        }
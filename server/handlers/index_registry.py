@@ -0,0 +1,148 @@
+from pymongo import ASCENDING, DESCENDING
+
+# Every index the handlers rely on, keyed by collection.
+# Each entry is shaped after the queries that use it - keep them in sync when a query changes.
+# Any index on a registered collection that is not listed here is dropped by reconcile_indexes.
+# SchemaHandler.bootstrap fingerprints this registry, so editing it is enough to trigger a reconcile on next boot.
+INDEX_REGISTRY = {
+    "Users": [
+        # AccountHandler.find_user_by_name, BusinessHandler.insert_user
+        {"name": "username_unique", "keys": [("username", ASCENDING)], "unique": True},
+
+        # BusinessHandler.get_all_employees - filter on business and role, sorted by username
+        {"name": "business_role_username",
+         "keys": [("business_code", ASCENDING), ("role", ASCENDING), ("username", ASCENDING)]},
+    ],
+    "Businesses": [
+        # BusinessHandler.get_business_from_code, BusinessHandler.insert_user
+        {"name": "code_unique", "keys": [("code", ASCENDING)], "unique": True},
+    ],
+    "Schedules": [
+        # ScheduleHandler.get_schedule_for_month, ScheduleHandler.get_schedules (prefix).
+        # Unique so a business has one schedule per month
+        {"name": "business_year_month_unique",
+         "keys": [("business_code", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)], "unique": True},
+    ],
+    "Shifts": [
+        # ScheduleHandler.get_shifts_for_schedule
+        {"name": "schedule_start", "keys": [("schedule_id", ASCENDING), ("start", ASCENDING)]},
+
+        # ActivityHandler.get_upcoming_shift
+        {"name": "employee_start", "keys": [("employee_id", ASCENDING), ("start", ASCENDING)]},
+
+        # TimesheetHandler.get_timesheet for a whole business
+        {"name": "business_start", "keys": [("business_code", ASCENDING), ("start", ASCENDING)]},
+
+        # ScheduleHandler.get_posted_shifts - only the few posted shifts are indexed. _id is the paging tiebreaker,
+        # part of the key so the sort is read off the index
+        {"name": "business_posted_start", "keys": [("business_code", ASCENDING), ("start", ASCENDING),
+                                                   ("_id", ASCENDING)],
+         "partialFilterExpression": {"posted": True}},
+    ],
+    "ScheduleJobs": [
+        # AutoScheduleHandler.start_job - one queued or running job per schedule, enforced by the server so two
+        # requests racing each other cannot both start one. Only queued and running jobs are flagged active
+        {"name": "active_schedule_unique", "keys": [("schedule_id", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"active": True}},
+    ],
+    "RevokedTokens": [
+        # Revocations are deleted by MongoDB once every token they cover has expired
+        {"name": "expires_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+
+        # RevocationHandler.sync - revocations recorded since the last read
+        {"name": "revoked_at", "keys": [("revoked_at", ASCENDING)]},
+    ],
+    "Templates": [
+        # ScheduleHandler.get_templates
+        {"name": "business", "keys": [("business_code", ASCENDING)]},
+    ],
+    "Activity": [
+        # ActivityHandler.get_employee_activities - newest first, keyset paged on (timestamp, _id).
+        # The collection itself is created by ActivityHandler.migrate_activity_storage, as a time-series collection
+        # from MongoDB 6.0, which allows indexes on the _id measurement field, and as a plain collection before
+        {"name": "business_timestamp_id",
+         "keys": [("meta.business_code", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]},
+
+        # ActivityHandler.get_employee_activities filtered to one employee
+        {"name": "business_employee_timestamp_id",
+         "keys": [("meta.business_code", ASCENDING), ("meta.employee_id", ASCENDING), ("timestamp", DESCENDING),
+                  ("_id", DESCENDING)]},
+    ],
+}
+
+def _matches(existing: dict, spec: dict) -> bool:
+    """ Helper function to check if an index reported by the server matches a registry entry """
+    if list(existing["key"].items()) != [tuple(key) for key in spec["keys"]]:
+        return False
+
+    return (existing.get("unique", False) == spec.get("unique", False) and
+            existing.get("partialFilterExpression") == spec.get("partialFilterExpression") and
+            existing.get("expireAfterSeconds") == spec.get("expireAfterSeconds"))
+
+
+def _blocks(existing: dict, spec: dict) -> bool:
+    """
+    Helper function to check if an index has to be dropped before a registry entry can be built.
+    MongoDB refuses a second index with the same name, or with the same keys and partial filter.
+    """
+    return (existing["name"] == spec["name"] or
+            (list(existing["key"].items()) == [tuple(key) for key in spec["keys"]] and
+             existing.get("partialFilterExpression") == spec.get("partialFilterExpression")))
+
+
+def reconcile_indexes(db, collection_names: list[str] = None) -> dict:
+    """
+    Bring the indexes of the registered collections in line with INDEX_REGISTRY.
+    Creates missing collections and indexes, and drops indexes that are no longer registered.
+    An existing index that matches an entry under another name (e.g. username_1 from before the registry) is kept.
+    Missing indexes are built before obsolete ones are dropped, so a unique constraint is never absent while
+    it is replaced. Only an index blocking a build (same name, or same keys) is dropped first.
+    :param db: The database to reconcile.
+    :param collection_names: Collections to reconcile. Defaults to every registered collection.
+    :return: The names of the indexes created and dropped, per collection.
+    """
+    collection_names = collection_names or list(INDEX_REGISTRY)
+    existing_collections = db.list_collection_names()
+    changes = {}
+
+    for name in collection_names:
+        if name not in existing_collections:
+            db.create_collection(name)
+
+        collection = db[name]
+        existing = {index["name"]: index for index in collection.list_indexes() if index["name"] != "_id_"}
+        kept, missing = set(), []
+
+        for spec in INDEX_REGISTRY[name]:
+            # Prefer the index of the same name, then any other index with the same definition
+            candidates = [spec["name"]] + [index_name for index_name in existing if index_name != spec["name"]]
+            match = next((index_name for index_name in candidates if index_name in existing and
+                          index_name not in kept and _matches(existing[index_name], spec)), None)
+
+            if match:
+                kept.add(match)
+            else:
+                missing.append(spec)
+
+        obsolete = [index_name for index_name in existing if index_name not in kept]
+        blocking = [index_name for index_name in obsolete
+                    if any(_blocks(existing[index_name], spec) for spec in missing)]
+        created, dropped = [], []
+
+        for index_name in blocking:
+            collection.drop_index(index_name)
+            dropped.append(index_name)
+
+        for spec in missing:
+            options = {key: value for key, value in spec.items() if key not in ("name", "keys")}
+            collection.create_index(spec["keys"], name=spec["name"], **options)
+            created.append(spec["name"])
+
+        for index_name in obsolete:
+            if index_name not in blocking:
+                collection.drop_index(index_name)
+                dropped.append(index_name)
+
+        changes[name] = {"created": created, "dropped": dropped}
+
+    return changes
@@ -1,11 +1,91 @@
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+from handlers.exceptions.exceptions import PasswordHandlerBusyError
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
 
 class PasswordHandler:
-    def __init__(self):
-        # Generate a salt for bcrypt hashing
-        self.salt = bcrypt.gensalt()
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, max_workers: int = 0, max_queue: int = 0):
+        """
+        Initializes the PasswordHandler.
+        :param rounds: bcrypt work factor used for new hashes.
+        :param max_workers: Number of worker threads used for bcrypt work. 0 runs bcrypt inline on the caller.
+        :param max_queue: Number of calls allowed to wait for a free worker before new calls are rejected.
+        """
+        if not MIN_ROUNDS <= rounds <= MAX_ROUNDS:
+            raise ValueError(f"bcrypt rounds must be between {MIN_ROUNDS} and {MAX_ROUNDS}.")
+
+        self.rounds = rounds
+
+        # bcrypt releases the GIL while hashing, so a thread pool keeps it off the request threads
+        # without the pickling overhead of a process pool
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._slots = None
+
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+            self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "hash": {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_ms": 0.0},
+            "verify": {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "queue_ms": 0.0},
+            "in_flight": 0,
+            "rejected": 0,
+        }
+
+    def _record(self, operation: str, elapsed_ms: float, queued_ms: float):
+        """ Helper method to record the latency of a single bcrypt call """
+        with self._metrics_lock:
+            stats = self._metrics[operation]
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["queue_ms"] += queued_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def _run(self, operation: str, func, *args):
+        """ Helper method to run a bcrypt call inline or on the worker pool, recording its latency """
+        submitted = time.perf_counter()
+
+        if self._executor is None:
+            result = func(*args)
+            self._record(operation, (time.perf_counter() - submitted) * 1000, 0.0)
+            return result
+
+        # Reject immediately instead of queueing without bound
+        if not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self._metrics["rejected"] += 1
+            raise PasswordHandlerBusyError
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return func(*args), (started - submitted) * 1000
+            finally:
+                self._slots.release()
+
+        with self._metrics_lock:
+            self._metrics["in_flight"] += 1
+
+        try:
+            result, queued_ms = self._executor.submit(task).result()
+        finally:
+            with self._metrics_lock:
+                self._metrics["in_flight"] -= 1
+
+        self._record(operation, (time.perf_counter() - submitted) * 1000, queued_ms)
+        return result
 
     def validate_password(self, password):
         """Checks if the password meets the security requirements."""
@@ -20,9 +100,82 @@ class PasswordHandler:
         return True
 
     def hash_password(self, password):
-        """Hashes the password using bcrypt for secure storage."""
-        return bcrypt.hashpw(password.encode(), self.salt).decode()
+        """Hashes the password using bcrypt with a fresh salt at the configured cost."""
+        return self._run("hash", bcrypt.hashpw, password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
 
     def verify_password_match(self, password, hashed_password):
         """Verifies a password against the stored bcrypt hash."""
-        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+        return self._run("verify", bcrypt.checkpw, password.encode(), hashed_password.encode())
+
+    @staticmethod
+    def get_hash_rounds(hashed_password: str) -> int | None:
+        """ Return the work factor stored in a bcrypt hash, or None if it cannot be read """
+        # bcrypt hashes look like $2b$12$<salt+digest>
+        parts = hashed_password.split("$")
+        if len(parts) < 4 or not parts[2].isdigit():
+            return None
+        return int(parts[2])
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """ Check whether a stored hash was made at a different cost than the configured one """
+        return self.get_hash_rounds(hashed_password) != self.rounds
+
+    @staticmethod
+    def calibrate_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 16, samples: int = 3) -> dict:
+        """
+        Find the highest bcrypt cost whose verification stays within the target time on this machine.
+        :param target_ms: Verification time budget in milliseconds.
+        :param min_rounds: Lowest cost to consider - returned even if it is over budget.
+        :param max_rounds: Highest cost to consider.
+        :param samples: Number of verifications timed at each cost. The median is used.
+        :return: The chosen rounds and the measured median verify time for each cost tried.
+        """
+        password = b"CalibrationPass1"
+        timings = {}
+        chosen = min_rounds
+
+        for rounds in range(min_rounds, max_rounds + 1):
+            hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+            durations = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                bcrypt.checkpw(password, hashed)
+                durations.append((time.perf_counter() - started) * 1000)
+
+            median_ms = sorted(durations)[len(durations) // 2]
+            timings[rounds] = round(median_ms, 1)
+
+            if median_ms > target_ms:
+                break
+
+            chosen = rounds
+
+        return {"rounds": chosen, "timings_ms": timings}
+
+    def get_metrics(self) -> dict:
+        """ Return a snapshot of the bcrypt call counters and latencies """
+        with self._metrics_lock:
+            snapshot = {
+                "workers": self.max_workers,
+                "queue_size": self.max_queue,
+                "in_flight": self._metrics["in_flight"],
+                "rejected": self._metrics["rejected"],
+            }
+
+            for operation in ("hash", "verify"):
+                stats = self._metrics[operation]
+                count = stats["count"]
+                snapshot[operation] = {
+                    "count": count,
+                    "avg_ms": round(stats["total_ms"] / count, 3) if count else 0.0,
+                    "avg_queue_ms": round(stats["queue_ms"] / count, 3) if count else 0.0,
+                    "max_ms": round(stats["max_ms"], 3),
+                }
+
+        return snapshot
+
+    def shutdown(self):
+        """ Stop the worker pool, waiting for in-flight calls to finish """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
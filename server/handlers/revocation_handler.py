@@ -0,0 +1,215 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import errors
+
+from handlers.db_handler import DatabaseHandler
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Initializes a Bloom filter sized for a number of keys at a false positive rate.
+        A key that was added is always reported, a key that was not is reported at about the error rate.
+        """
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        """ Helper method to derive the bit positions of a key from one digest, by double hashing """
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationHandler:
+
+    # Seconds between reads of the revocations recorded by other workers
+    DEFAULT_SYNC_INTERVAL = 5.0
+
+    # Seconds each sync reads back past the last one. A revocation stamped before a read can be committed after it
+    SYNC_OVERLAP = 5
+
+    # Seconds between dropping expired revocations, which rebuilds the Bloom filter
+    PURGE_INTERVAL = 600
+
+    def __init__(self, db_handler: DatabaseHandler, max_token_lifetime: float, capacity: int = 100_000,
+                 error_rate: float = 0.001, sync_interval: float = DEFAULT_SYNC_INTERVAL, clock=time.time):
+        """
+        Initializes the RevocationHandler, which answers whether a JWT was revoked without a database read.
+        Revoked token ids and identities are kept in memory until the tokens they cover expire, behind a Bloom
+        filter so the tokens of the vast majority of requests, which were never revoked, are cleared by it alone.
+        Revocations are also stored in the RevokedTokens collection, so other workers and restarts pick them up.
+        :param max_token_lifetime: Seconds the longest lived token (the refresh token) is valid for.
+            Revoking an identity has to outlive every token issued before it.
+        :param capacity: Revocations the Bloom filter is sized for. It is rebuilt larger when exceeded.
+        :param error_rate: Share of unrevoked tokens that fall through to the exact check.
+        :param sync_interval: Seconds between reads of new revocations. 0 only loads them once in start().
+        :param clock: Time source, replaceable in tests.
+        """
+        # Created, with its TTL index, by SchemaHandler.bootstrap
+        self.revoked_collection = db_handler.database["RevokedTokens"]
+
+        self.max_token_lifetime = max_token_lifetime
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._clock = clock
+
+        # Token id -> when the token expires
+        self._tokens = {}
+
+        # Identity -> (tokens issued before this are revoked, when the revocation can be forgotten)
+        self._identities = {}
+
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._next_purge = clock() + self.PURGE_INTERVAL
+        self._synced_until = None
+        self._stop = threading.Event()
+
+    def is_revoked(self, claims: dict) -> bool:
+        """ Check the claims of a verified JWT against the revocations. O(1) and never reads the database """
+        jti = claims.get("jti")
+        if jti and f"t:{jti}" in self._bloom:
+            expires_at = self._tokens.get(jti)
+            if expires_at is not None and expires_at > self._clock():
+                return True
+
+        identity = claims.get("sub")
+        if identity and f"u:{identity}" in self._bloom:
+            revocation = self._identities.get(identity)
+            if revocation is not None and claims.get("iat", 0) < revocation[0]:
+                return True
+
+        return False
+
+    def revoke_token(self, claims: dict):
+        """ Revoke one token, e.g. on logout, until it would have expired anyway """
+        expires_at = claims.get("exp", self._clock() + self.max_token_lifetime)
+
+        self._remember_token(claims["jti"], expires_at)
+        self._store({"_id": f"t:{claims['jti']}", "jti": claims["jti"]}, expires_at)
+
+    def revoke_identity(self, identity: str):
+        """
+        Revoke every token issued to an identity so far, e.g. when their role or business changes.
+        Tokens are compared by their whole-second issue time, so replacements issued right away stay valid.
+        """
+        revoked_before = int(self._clock())
+        expires_at = revoked_before + self.max_token_lifetime
+
+        self._remember_identity(identity, revoked_before, expires_at)
+        self._store({"_id": f"u:{identity}", "identity": identity, "revoked_before": revoked_before}, expires_at)
+
+    def _remember_token(self, jti: str, expires_at: float):
+        with self._lock:
+            self._tokens[jti] = expires_at
+            self._bloom.add(f"t:{jti}")
+            self._grow_if_full()
+
+    def _remember_identity(self, identity: str, revoked_before: int, expires_at: float):
+        with self._lock:
+            current = self._identities.get(identity)
+            if current is None or current[0] < revoked_before:
+                self._identities[identity] = (revoked_before, expires_at)
+            self._bloom.add(f"u:{identity}")
+            self._grow_if_full()
+
+    def _grow_if_full(self):
+        """ Helper method to rebuild the Bloom filter at twice the size once it holds more than it was sized for """
+        if len(self._tokens) + len(self._identities) > self._bloom.capacity:
+            self._rebuild(self._bloom.capacity * 2)
+
+    def _rebuild(self, capacity: int):
+        """ Helper method to build a new Bloom filter from the remembered revocations. Called with the lock held """
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in self._tokens:
+            bloom.add(f"t:{jti}")
+        for identity in self._identities:
+            bloom.add(f"u:{identity}")
+
+        # Swapped in whole, so is_revoked never sees a half built filter
+        self._bloom = bloom
+
+    def _store(self, document: dict, expires_at: float):
+        """ Helper method to record a revocation for other workers. MongoDB deletes it once it has expired """
+        now = datetime.now(timezone.utc)
+        document.update({"revoked_at": now, "expires_at": datetime.fromtimestamp(expires_at, timezone.utc)})
+
+        try:
+            self.revoked_collection.replace_one({"_id": document["_id"]}, document, upsert=True)
+
+        # The revocation still holds in this worker
+        except errors.PyMongoError as e:
+            print(f"Could not store revocation {document['_id']}: {e}")
+
+    def sync(self):
+        """ Load the revocations recorded since the last sync, including those of other workers """
+        now = datetime.now(timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+
+        # Revocations read twice are merged, so overlapping reads are harmless
+        if self._synced_until is not None:
+            query["revoked_at"] = {"$gte": self._synced_until - timedelta(seconds=self.SYNC_OVERLAP)}
+
+        for document in self.revoked_collection.find(query):
+            expires_at = document["expires_at"].replace(tzinfo=timezone.utc).timestamp()
+
+            if "jti" in document:
+                self._remember_token(document["jti"], expires_at)
+            else:
+                self._remember_identity(document["identity"], document["revoked_before"], expires_at)
+
+        self._synced_until = now
+        self._purge()
+
+    def _purge(self):
+        """ Helper method to forget revocations whose tokens have all expired, every PURGE_INTERVAL seconds """
+        now = self._clock()
+        if now < self._next_purge:
+            return
+
+        with self._lock:
+            self._tokens = {jti: expires_at for jti, expires_at in self._tokens.items() if expires_at > now}
+            self._identities = {identity: revocation for identity, revocation in self._identities.items()
+                                if revocation[1] > now}
+            self._rebuild(self._bloom.capacity)
+            self._next_purge = now + self.PURGE_INTERVAL
+
+    def start(self):
+        """ Load the stored revocations, then keep reading new ones every sync interval on a daemon thread """
+        self.sync()
+
+        if self.sync_interval > 0:
+            threading.Thread(target=self._run, name="revocation-sync", daemon=True).start()
+
+    def _run(self):
+        """ Helper method to sync until stop() is called. Runs on its own thread """
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except errors.PyMongoError as e:
+                print(f"Could not read revocations: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"tokens": len(self._tokens), "identities": len(self._identities),
+                    "bloom_bits": self._bloom.size, "bloom_hashes": self._bloom.hashes}
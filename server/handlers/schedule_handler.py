@@ -1,78 +1,307 @@
-from datetime import datetime
+import bisect
+import calendar
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import pymongo
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 
+from handlers.cache_handler import CacheHandler
 from handlers.db_handler import DatabaseHandler
+from handlers.exceptions.exceptions import ShiftConflictError
+from tools import parse_utc, to_utc_iso, utc_now_iso
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def validate_weekly_slot(slot) -> str | None:
+    """ Check a weekly slot with a day and 'HH:MM' start and end times. Returns the problem, or None if it is valid """
+    if not isinstance(slot, dict):
+        return "Slot must be an object"
+
+    if slot.get('day') not in WEEKDAYS:
+        return f"day must be one of {', '.join(WEEKDAYS)}"
+
+    try:
+        if datetime.strptime(slot['start'], "%H:%M") >= datetime.strptime(slot['end'], "%H:%M"):
+            return "Slot must end after it starts"
+    except (KeyError, TypeError, ValueError):
+        return "start and end must be HH:MM times"
+
+    return None
+
+
+def expand_weekly_slots(slots: list[dict], year: int, month: int, tz: ZoneInfo, hours: list):
+    """
+    Lazily expand weekly slots into every matching day of a month, in date order.
+    :param slots: Slots with day, start and end ('HH:MM' times in tz).
+    :param hours: The business hours, a list of {day, open, close} with 'HH:MM' times.
+    :return: One entry per slot and day with the slot index, the local date, the UTC start and end and,
+        for days the business is closed or slots outside its hours, the problem.
+    """
+    opening_hours = {day["day"]: (day["open"], day["close"]) for day in hours or []}
+
+    slots_by_day = defaultdict(list)
+    for index, slot in enumerate(slots):
+        slots_by_day[slot["day"]].append((index, slot))
+
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        current = date(year, month, day)
+        weekday = WEEKDAYS[current.weekday()]
+
+        for index, slot in slots_by_day[weekday]:
+            if weekday not in opening_hours:
+                problem = "Business is closed"
+            elif not opening_hours[weekday][0] <= slot["start"] < slot["end"] <= opening_hours[weekday][1]:
+                problem = "Outside business hours"
+            else:
+                problem = None
+
+            start = datetime.combine(current, datetime.strptime(slot["start"], "%H:%M").time(), tzinfo=tz)
+            end = datetime.combine(current, datetime.strptime(slot["end"], "%H:%M").time(), tzinfo=tz)
+
+            yield {"slot": index, "date": current, "start": to_utc_iso(start), "end": to_utc_iso(end),
+                   "problem": problem}
 
 
 class ScheduleHandler:
 
-    def __init__(self, db_handler: DatabaseHandler):
-        """ Initializes the ScheduleHandler with database connection """
-        db = db_handler.database
+    # Fields owned by the shift store that callers may not overwrite through edit_shift
+    PROTECTED_SHIFT_FIELDS = ("_id", "schedule_id", "business_code")
 
-        self.users_collection = db["Users"]
+    # User fields kept in the user cache
+    USER_SUMMARY_PROJECTION = {"name": 1, "username": 1, "role": 1, "business_code": 1}
 
-        # Initialize database for schedule management -
-        # Create 'Schedules' Collection if it does not already exist
-        if "Schedules" not in db.list_collection_names():
-            db.create_collection("Schedules")
+    # Display name of template slots without an employee, which are posted for anyone to take
+    OPEN_SHIFT_NAME = "Open shift"
 
-        self.schedules_collection = db["Schedules"]
+    # Longest shift accepted. Overlap checks only look this far back for shifts that start earlier
+    MAX_SHIFT_LENGTH = timedelta(hours=24)
 
-        # Ensure field 'year' exists
-        self.schedules_collection.create_index([("year", 1)], unique=False)
+    def __init__(self, db_handler: DatabaseHandler, user_cache: CacheHandler = None):
+        """
+        Initializes the ScheduleHandler with database connection
+        :param user_cache: Cache of user summaries by user id, shared with the handlers that change users.
+            Defaults to 4096 entries kept for 5 minutes.
+        """
+        db = db_handler.database
 
-        # Ensure field 'month' exists
-        self.schedules_collection.create_index([("month", 1)], unique=False)
+        # The same few employees are looked up for every shift written.
+        # Writes to users invalidate their entry, the TTL bounds staleness left by other workers
+        self.user_cache = user_cache or CacheHandler(max_size=4096, ttl=300)
 
-        # Ensure field 'business_code' exists
-        self.schedules_collection.create_index([("business_code", 1)], unique=False)
+        self.users_collection = db["Users"]
 
-        # Ensure field 'shifts' exists
-        self.schedules_collection.create_index([("shifts", 1)], unique=False)
+        # Collections and indexes are created by SchemaHandler.bootstrap.
+        # Shifts are stored one document per shift so single shift reads and writes do not touch the whole schedule
 
-    def _insert_schedule(self, year: str, month: str, business_code: str, user_id: str):
+        self.schedules_collection = db["Schedules"]
+        self.shifts_collection = db["Shifts"]
+
+        # Weekly shift patterns of a business, expanded into a month by apply_template
+        self.templates_collection = db["Templates"]
+
+    def _insert_schedule(self, year: int, month: int, business_code: str, user_id: str):
         """ Helper method to insert a new schedule into the database """
 
         schedule_dict = {
             "year": year,
             "month": month,
             "business_code": business_code,
-            "shifts": [],
             "created_at": datetime.now(),
-            "created_by": user_id
+            "created_by": user_id,
+            "revision": 0
         }
 
         self.schedules_collection.insert_one(schedule_dict)
 
     def _insert_shift(self, schedule_id: str, shift: dict):
-        result = self.schedules_collection.update_one(
-            {"_id": ObjectId(schedule_id)},
-            {"$push": {"shifts": shift}}
-        )
+        """ Helper method to insert a shift into the shift store under its schedule """
+        schedule = self.schedules_collection.find_one({"_id": ObjectId(schedule_id)}, {"business_code": 1})
 
-        if result.modified_count > 0:
-            return True
-        else:
+        if not schedule:
             return False
 
+        shift.update({"schedule_id": str(schedule["_id"]), "business_code": schedule["business_code"]})
+        self.shifts_collection.insert_one(shift)
+        self._bump_revision(schedule["_id"])
+
+        return True
+
+    def _bump_revision(self, schedule_id):
+        """ Helper method to mark a schedule as changed so cached copies (ETags) are invalidated """
+        self.schedules_collection.update_one({"_id": ObjectId(schedule_id)}, {"$inc": {"revision": 1}})
+
+    @staticmethod
+    def _summarize_user(user: dict) -> dict:
+        """ Helper method to reduce a user to the display name, role and business stored in the user cache """
+        return {
+            "name": user.get('name') or user.get('username') or 'username',
+            "role": user.get('role'),
+            "business_code": user.get('business_code')
+        }
+
+    def _get_user_summary(self, user_id: str) -> dict | None:
+        """ Helper method to get a user's display name, role and business through the user cache """
+        def load():
+            user = self.users_collection.find_one({"_id": ObjectId(user_id)}, self.USER_SUMMARY_PROJECTION)
+            return self._summarize_user(user) if user else None
+
+        return self.user_cache.get_or_load(str(user_id), load)
+
+    def _get_employee_name(self, user_id: str):
+        """ Helper method to get the display name stored on an employee's shifts """
+        summary = self._get_user_summary(user_id)
+
+        return summary["name"] if summary else None
 
-    def new_schedule(self, year: str, month: str, business_code: str, user_id: str):
+    def new_schedule(self, year: int, month: int, business_code: str, user_id: str):
         try:
-            self._insert_schedule(year, month, business_code, user_id)
+            # Stored as integers so the unique (business_code, year, month) index catches duplicates
+            self._insert_schedule(int(year), int(month), business_code, user_id)
             return True
         except pymongo.errors.DuplicateKeyError:
             return False
 
+    def iter_schedules(self, business_code: str):
+        """ Get a cursor over all schedules in a business """
+        return self.schedules_collection.find({'business_code': business_code})
+
     def get_schedules(self, business_code: str):
-        schedules = list(self.schedules_collection.find({'business_code': business_code}))
+        schedules = list(self.iter_schedules(business_code))
         return schedules
 
-    def get_schedule_for_month(self, business_code: str, month: int):
-        schedules = self.schedules_collection.find_one({'business_code': business_code, 'month': month})
-        return schedules
+    def get_schedule_revisions(self, business_code: str):
+        """ Get only the id and revision of every schedule in a business, to check for changes cheaply """
+        return list(self.schedules_collection.find({'business_code': business_code}, {'revision': 1}).sort("_id", 1))
+
+    def get_schedule_revision(self, business_code: str, year: int, month: int):
+        """ Get only the id and revision of a business's schedule for a month, without its shifts """
+        return self.schedules_collection.find_one({'business_code': business_code, 'year': year, 'month': month},
+                                                  {'revision': 1})
+
+    def get_shifts_for_schedule(self, schedule_id: str, window_start: str = None, window_end: str = None):
+        """
+        Get the shifts of a schedule in start order.
+        :param window_start: Only shifts starting at or after this ISO timestamp.
+        :param window_end: Only shifts starting before this ISO timestamp.
+        """
+        query = {"schedule_id": str(schedule_id)}
+
+        if window_start is not None or window_end is not None:
+            query["start"] = {}
+            if window_start is not None:
+                query["start"]["$gte"] = window_start
+            if window_end is not None:
+                query["start"]["$lt"] = window_end
+
+        return list(self.shifts_collection.find(query).sort("start", 1))
+
+    def get_schedule_for_month(self, business_code: str, year: int, month: int, window_start: str = None,
+                               window_end: str = None):
+        """
+        Get a business's schedule for a month with its shifts.
+        :param window_start: Only include shifts starting at or after this ISO timestamp.
+        :param window_end: Only include shifts starting before this ISO timestamp.
+        """
+        schedule = self.schedules_collection.find_one({'business_code': business_code, 'year': year, 'month': month})
+
+        if schedule:
+            schedule["shifts"] = self.get_shifts_for_schedule(schedule["_id"], window_start, window_end)
+
+        return schedule
+
+    @staticmethod
+    def _normalize_times(shift: dict):
+        """ Helper method to store start and end in one ISO format, so they compare correctly as strings """
+        for key in ('start', 'end'):
+            try:
+                shift[key] = to_utc_iso(parse_utc(shift[key]))
+            except (TypeError, ValueError, AttributeError):
+                pass
+
+    def _find_overlap(self, employee_id: str, start: str, end: str, exclude_id: str = None) -> dict | None:
+        """
+        Helper method to find a stored shift of an employee that overlaps [start, end).
+        Stored shifts can already overlap each other (legacy data, or two writes racing past this check), so any
+        shift starting before the end and ending after the start is matched, not only the latest one.
+        No shift is longer than MAX_SHIFT_LENGTH, so only shifts starting less than that before the start can
+        reach into it. That bounds the (employee_id, start) index scan to a day of the employee's shifts,
+        however long their history is.
+        """
+        # Open shifts belong to nobody, so siblings at the same time are no clash
+        if not employee_id:
+            return None
+
+        earliest = to_utc_iso(parse_utc(start) - self.MAX_SHIFT_LENGTH)
+        query = {"employee_id": employee_id, "start": {"$gt": earliest, "$lt": end}, "end": {"$gt": start}}
+
+        if exclude_id is not None:
+            query["_id"] = {"$ne": exclude_id}
+
+        return self.shifts_collection.find_one(query, {"start": 1, "end": 1})
+
+    def _find_batch_overlaps(self, shifts: list[dict], exclude_ids: list[str] = ()) -> list[bool]:
+        """
+        Helper method to flag the shifts of a batch that overlap a stored shift or an earlier shift of the batch.
+        The stored shifts of the batch's employees inside the batch's time span are loaded with one query
+        into a sorted interval list per employee, which each shift is then checked against with a binary search.
+        Stored shifts can overlap each other, so each list carries the latest end so far alongside it: a shift
+        overlaps when any interval starting before its end ends after its start, not only the last one.
+        :param shifts: Shifts with employee_id, start and end. Shifts without an employee are never flagged.
+        :param exclude_ids: Stored shifts to ignore, e.g. the shifts being reassigned.
+        :return: One flag per shift, in order.
+        """
+        assigned = [shift for shift in shifts if shift.get('employee_id')]
+        intervals = defaultdict(list)
+
+        # Latest end among each employee's intervals up to and including each position
+        latest_ends = defaultdict(list)
+
+        if assigned:
+            query = {
+                "employee_id": {"$in": list({shift['employee_id'] for shift in assigned})},
+                "start": {"$gt": to_utc_iso(min(parse_utc(shift['start']) for shift in assigned) -
+                                            self.MAX_SHIFT_LENGTH),
+                          "$lt": max(shift['end'] for shift in assigned)},
+                "end": {"$gt": min(shift['start'] for shift in assigned)},
+                "_id": {"$nin": list(exclude_ids)}
+            }
+            for stored in self.shifts_collection.find(query, {"employee_id": 1, "start": 1, "end": 1}):
+                intervals[stored['employee_id']].append((stored['start'], stored['end']))
+
+            for employee_id, employee_intervals in intervals.items():
+                employee_intervals.sort()
+                latest = ""
+                for _, end in employee_intervals:
+                    latest = max(latest, end)
+                    latest_ends[employee_id].append(latest)
+
+        overlaps = []
+        for shift in shifts:
+            if not shift.get('employee_id'):
+                overlaps.append(False)
+                continue
+
+            employee_intervals = intervals[shift['employee_id']]
+            employee_ends = latest_ends[shift['employee_id']]
+
+            # Among the intervals starting before this shift ends, the one ending latest decides
+            position = bisect.bisect_left(employee_intervals, (shift['end'],))
+            overlap = position > 0 and employee_ends[position - 1] > shift['start']
+
+            if not overlap:
+                employee_intervals.insert(position, (shift['start'], shift['end']))
+                employee_ends.insert(position, max(employee_ends[position - 1] if position else "", shift['end']))
+
+                for later in range(position + 1, len(employee_ends)):
+                    employee_ends[later] = max(employee_ends[later], shift['end'])
+
+            overlaps.append(overlap)
+
+        return overlaps
 
     def add_shift(self, schedule_id: str, shift: dict):
 
@@ -82,6 +311,16 @@ class ScheduleHandler:
         if not all(key in shift for key in required_keys):
             return False
 
+        problem = self._validate_new_shift(shift)
+        if problem:
+            raise ValueError(problem)
+
+        self._normalize_times(shift)
+
+        # Reject shifts that would double book the employee
+        if self._find_overlap(shift['employee_id'], shift['start'], shift['end']):
+            raise ShiftConflictError
+
         # Add a unique _id field to the shift
         shift.update({'_id': str(ObjectId())})
 
@@ -95,27 +334,130 @@ class ScheduleHandler:
         shift.update({'completed': False})
 
         # Add employee name field to the shift
-        user = self.users_collection.find_one({"_id": ObjectId(shift['employee_id'])})
-        user = self.users_collection.find_one({"_id": ObjectId(shift['employee_id'])})
-        if user:
-            name = user.get('name') or user.get('username') or 'username'
-        else:
-            name = 'unknown'
-
-        shift.update({'employee_name': name})
+        name = self._get_employee_name(shift['employee_id'])
+        shift.update({'employee_name': name or 'unknown'})
 
         if self._insert_shift(schedule_id=schedule_id, shift=shift):
             return True
 
         return False
 
+    def _get_employee_names(self, user_ids: list[str], business_code: str) -> dict:
+        """
+        Helper method to resolve the display names of many employees of a business.
+        Cached users are served from the user cache, the rest are loaded with one query.
+        """
+        summaries = {}
+        missing = []
+
+        for user_id in set(user_ids):
+            summary = self.user_cache.get(user_id)
+
+            if summary is None:
+                missing.append(user_id)
+            else:
+                summaries[user_id] = summary
+
+        object_ids = [ObjectId(user_id) for user_id in missing if ObjectId.is_valid(user_id)]
+        if object_ids:
+            for user in self.users_collection.find({"_id": {"$in": object_ids}}, self.USER_SUMMARY_PROJECTION):
+                summary = self._summarize_user(user)
+                self.user_cache.set(str(user["_id"]), summary)
+                summaries[str(user["_id"])] = summary
+
+        return {user_id: summary["name"] for user_id, summary in summaries.items()
+                if summary["business_code"] == business_code}
+
+    @staticmethod
+    def _validate_new_shift(shift) -> str | None:
+        """ Helper method to check a shift submitted for creation or editing. Returns the problem, or None if valid """
+        if not isinstance(shift, dict):
+            return "Shift must be an object"
+
+        missing = [key for key in ('employee_id', 'start', 'end') if key not in shift]
+        if missing:
+            return f"Missing fields: {', '.join(missing)}"
+
+        try:
+            length = parse_utc(shift['end']) - parse_utc(shift['start'])
+        except (TypeError, ValueError, AttributeError):
+            return "start and end must be ISO 8601 timestamps"
+
+        if length <= timedelta(0):
+            return "Shift must end after it starts"
+
+        if length > ScheduleHandler.MAX_SHIFT_LENGTH:
+            return f"Shift can be at most {ScheduleHandler.MAX_SHIFT_LENGTH.total_seconds() / 3600:g} hours long"
+
+        return None
+
+    def add_shifts(self, schedule_id: str, shifts: list, business_code: str):
+        """
+        Add many shifts to a schedule with one user lookup and one insert.
+        Invalid shifts are reported and skipped, the valid ones are still added.
+        :param schedule_id: The schedule to add the shifts to.
+        :param shifts: The shifts, each with employee_id, start and end.
+        :param business_code: The caller's business. The schedule and employees must belong to it.
+        :return: One result per submitted shift, in order, or None if the schedule was not found.
+        """
+        if not ObjectId.is_valid(schedule_id):
+            return None
+
+        schedule = self.schedules_collection.find_one({"_id": ObjectId(schedule_id), "business_code": business_code},
+                                                      {"business_code": 1})
+        if not schedule:
+            return None
+
+        problems = [self._validate_new_shift(shift) for shift in shifts]
+        for shift, problem in zip(shifts, problems):
+            if problem is None:
+                self._normalize_times(shift)
+
+        names = self._get_employee_names([shift['employee_id'] for shift, error in zip(shifts, problems)
+                                          if error is None and isinstance(shift['employee_id'], str)],
+                                         business_code)
+
+        # Overlaps are checked against stored shifts and the other valid shifts of the request
+        candidates = [shift if error is None and shift['employee_id'] in names else {}
+                      for shift, error in zip(shifts, problems)]
+        overlaps = self._find_batch_overlaps(candidates)
+
+        results = []
+        new_shifts = []
+        for index, (shift, error, overlap) in enumerate(zip(shifts, problems, overlaps)):
+            if error is None and names.get(shift['employee_id']) is None:
+                error = "Unknown employee"
+            elif error is None and overlap:
+                error = "Overlaps another shift of this employee"
+
+            if error:
+                results.append({"index": index, "success": False, "message": error})
+                continue
+
+            new_shift = {
+                **{k: v for k, v in shift.items() if k not in self.PROTECTED_SHIFT_FIELDS},
+                "_id": str(ObjectId()),
+                "schedule_id": str(schedule["_id"]),
+                "business_code": business_code,
+                "employee_name": names[shift['employee_id']],
+                "posted": False,
+                "clocked_in": False,
+                "completed": False
+            }
+            new_shifts.append(new_shift)
+            results.append({"index": index, "success": True, "shift_id": new_shift["_id"]})
+
+        if new_shifts:
+            self.shifts_collection.insert_many(new_shifts, ordered=False)
+            self._bump_revision(schedule["_id"])
+
+        return results
+
     def delete_shift(self, schedule_id: str, shift_id: str):
-        result = self.schedules_collection.update_one(
-            {"_id": ObjectId(schedule_id)},
-            {"$pull": {"shifts": {"_id": shift_id}}}
-        )
+        result = self.shifts_collection.delete_one({"_id": shift_id, "schedule_id": schedule_id})
 
-        if result.modified_count > 0:
+        if result.deleted_count > 0:
+            self._bump_revision(schedule_id)
             return True
         else:
             return False
@@ -127,73 +469,418 @@ class ScheduleHandler:
         if not all(key in shift for key in required_keys):
             return False
 
-        # Remove _id from the update data
-        shift_data = {k: v for k, v in shift.items() if k != "_id"}
+        problem = self._validate_new_shift(shift)
+        if problem:
+            raise ValueError(problem)
 
-        result = self.schedules_collection.update_one(
-            {
-                "_id": ObjectId(schedule_id),
-                "shifts._id": shift['_id']
-            },
-            {
-                "$set": {f"shifts.$.{key}": value for key, value in shift_data.items()}
-            }
-        )
+        self._normalize_times(shift)
 
-        return True
+        # Reject edits that would double book the employee
+        if self._find_overlap(shift['employee_id'], shift['start'], shift['end'], exclude_id=shift['_id']):
+            raise ShiftConflictError
 
+        # Remove the store-owned fields from the update data
+        shift_data = {k: v for k, v in shift.items() if k not in self.PROTECTED_SHIFT_FIELDS}
 
+        result = self.shifts_collection.update_one(
+            {"_id": shift['_id'], "schedule_id": schedule_id},
+            {"$set": shift_data}
+        )
+
+        if result.modified_count > 0:
+            self._bump_revision(schedule_id)
+
+        return result.matched_count > 0
+
+    def get_schedule_conflicts(self, schedule_id: str, business_code: str) -> list[dict] | None:
+        """
+        Find every pair of overlapping shifts of the same employee in a schedule.
+        The shifts are read once and swept in (employee, start) order, tracking the shift that ends latest so far.
+        :return: One entry per conflicting shift, or None if the schedule was not found.
+        """
+        if not ObjectId.is_valid(schedule_id) or not self.schedules_collection.find_one(
+                {"_id": ObjectId(schedule_id), "business_code": business_code}, {"_id": 1}):
+            return None
+
+        shifts = self.shifts_collection.find({"schedule_id": schedule_id, "employee_id": {"$ne": None}},
+                                             {"employee_id": 1, "employee_name": 1, "start": 1, "end": 1})
+
+        conflicts = []
+        latest = None
+        for shift in sorted(shifts, key=lambda s: (s["employee_id"], s["start"])):
+            if latest and latest["employee_id"] == shift["employee_id"] and shift["start"] < latest["end"]:
+                conflicts.append({
+                    "employee_id": shift["employee_id"],
+                    "employee_name": shift.get("employee_name"),
+                    "shift_id": shift["_id"],
+                    "start": shift["start"],
+                    "end": shift["end"],
+                    "conflicts_with": latest["_id"]
+                })
+
+            if not latest or latest["employee_id"] != shift["employee_id"] or shift["end"] > latest["end"]:
+                latest = shift
+
+        return conflicts
 
     def post_shift(self, shift_id: str):
-        shift_id = shift_id
-        result = self.schedules_collection.update_one(
-            {"shifts._id": shift_id},
-            {"$set": {"shifts.$.posted": True}}
+        # Return the schedule id from the same update so its revision can be bumped
+        shift = self.shifts_collection.find_one_and_update(
+            {"_id": shift_id, "posted": {"$ne": True}},
+            {"$set": {"posted": True}},
+            projection={"schedule_id": 1},
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count > 0:
+        if shift:
+            self._bump_revision(shift["schedule_id"])
             return True
         return False
 
+    def _bulk_update_shifts(self, shift_ids: list[str], business_code: str, check, conditions: dict, update: dict,
+                            applied: dict, assignee: str = None) -> list[dict]:
+        """
+        Helper method to apply the same conditional update to many shifts of a business in one bulk write.
+        :param check: Called with each shift found, returns why it cannot be updated or None.
+        :param conditions: Filter repeating the check in the update itself, so a concurrent change is not overwritten.
+        :param update: The update applied to each eligible shift.
+        :param applied: Filter matching shifts in their updated state, used to sort out a lost race.
+        :param assignee: Employee the shifts are being given to, if any. Shifts clashing with their others are refused.
+        :return: One result per distinct shift id, in order.
+        """
+        shift_ids = list(dict.fromkeys(shift_ids))
+        shifts = {shift["_id"]: shift for shift in self.shifts_collection.find(
+            {"_id": {"$in": shift_ids}, "business_code": business_code},
+            {"schedule_id": 1, "employee_id": 1, "posted": 1, "completed": 1, "start": 1, "end": 1})}
+
+        results = {}
+        eligible = []
+        for shift_id in shift_ids:
+            shift = shifts.get(shift_id)
+            problem = "Shift not found" if shift is None else check(shift)
+
+            if problem:
+                results[shift_id] = {"shift_id": shift_id, "success": False, "message": problem}
+            else:
+                eligible.append(shift_id)
+
+        if assignee and eligible:
+            overlaps = self._find_batch_overlaps(
+                [{"employee_id": assignee, "start": shifts[shift_id]["start"], "end": shifts[shift_id]["end"]}
+                 for shift_id in eligible], exclude_ids=eligible)
+
+            for shift_id, overlap in zip(list(eligible), overlaps):
+                if overlap:
+                    results[shift_id] = {"shift_id": shift_id, "success": False,
+                                         "message": "Overlaps another shift of this employee"}
+                    eligible.remove(shift_id)
+
+        if eligible:
+            result = self.shifts_collection.bulk_write(
+                [UpdateOne({"_id": shift_id, "business_code": business_code, **conditions}, update)
+                 for shift_id in eligible],
+                ordered=False
+            )
+
+            # Another request changed some of the shifts between the read and the write
+            if result.modified_count < len(eligible):
+                updated = {shift["_id"] for shift in self.shifts_collection.find(
+                    {"_id": {"$in": eligible}, **applied}, {"_id": 1})}
+            else:
+                updated = set(eligible)
+
+            for shift_id in eligible:
+                results[shift_id] = ({"shift_id": shift_id, "success": True} if shift_id in updated else
+                                     {"shift_id": shift_id, "success": False, "message": "Shift was changed"})
+
+            schedule_ids = {ObjectId(shifts[shift_id]["schedule_id"]) for shift_id in updated}
+            if schedule_ids:
+                self.schedules_collection.update_many({"_id": {"$in": list(schedule_ids)}}, {"$inc": {"revision": 1}})
+
+        return [results[shift_id] for shift_id in shift_ids]
+
+    def post_shifts(self, shift_ids: list[str], user_id: str, business_code: str) -> list[dict]:
+        """
+        Post many of an employee's own shifts for others to take, in one bulk write.
+        :return: One result per distinct shift id, in order.
+        """
+        def check(shift):
+            if shift.get("employee_id") != user_id:
+                return "Not your shift"
+            if shift.get("posted"):
+                return "Shift is already posted"
+            if shift.get("completed"):
+                return "Shift is completed"
+            return None
+
+        return self._bulk_update_shifts(
+            shift_ids, business_code, check,
+            conditions={"employee_id": user_id, "posted": {"$ne": True}, "completed": {"$ne": True}},
+            update={"$set": {"posted": True}},
+            applied={"employee_id": user_id, "posted": True}
+        )
 
-    def get_posted_shifts(self, business_code: str):
-        # Find all schedules for this business
-        schedules = self.schedules_collection.find(
-            {"business_code": business_code},
-            {"shifts": 1, "_id": 0}
+    def take_shifts(self, shift_ids: list[str], user_id: str, business_code: str) -> list[dict] | None:
+        """
+        Take many posted shifts of other employees, in one bulk write.
+        :return: One result per distinct shift id, in order, or None if the employee was not found.
+        """
+        name = self._get_employee_name(user_id)
+
+        if not name:
+            return None
+
+        def check(shift):
+            if not shift.get("posted"):
+                return "Shift is not posted"
+            if shift.get("employee_id") == user_id:
+                return "Shift is already yours"
+            if shift.get("completed"):
+                return "Shift is completed"
+            return None
+
+        return self._bulk_update_shifts(
+            shift_ids, business_code, check,
+            conditions={"posted": True, "employee_id": {"$ne": user_id}, "completed": {"$ne": True}},
+            update={"$set": {"posted": False, "employee_id": user_id, "employee_name": name}},
+            applied={"employee_id": user_id, "posted": False},
+            assignee=user_id
         )
 
-        posted_shifts = []
+    def get_posted_shifts(self, business_code: str, limit: int = None, offset: int = 0):
+        """
+        Get the posted shifts of a business that are still open to take, soonest first.
+        Served in (start, _id) order from the partial index on posted shifts, without an in-memory sort,
+        so cost follows the number of open shifts.
+        :param limit: Maximum number of shifts to return. None returns all of them.
+        :param offset: Number of shifts to skip, for paging.
+        """
+        query = {
+            "business_code": business_code,
+            "posted": True,
+            "completed": False,
+            "start": {"$gte": utc_now_iso()}
+        }
 
-        for schedule in schedules:
-            for shift in schedule.get("shifts", []):
-                if shift.get("posted") is True:
-                    posted_shifts.append(shift)
+        cursor = self.shifts_collection.find(query).sort([("start", 1), ("_id", 1)]).skip(offset)
 
-        return posted_shifts
+        if limit is not None:
+            cursor = cursor.limit(limit)
 
+        return list(cursor)
 
     def take_shift(self, shift_id: str, user_id: str):
-        shift_id = shift_id
-        user = self.users_collection.find_one({"_id": ObjectId(user_id)})
+        name = self._get_employee_name(user_id)
+
+        if not name:
+            return False
 
-        if not user:
+        posted = self.shifts_collection.find_one({"_id": shift_id, "posted": True}, {"start": 1, "end": 1})
+        if not posted:
             return False
 
-        name = user.get('name', 'Unknown')
+        # Reject taking a shift that clashes with one the employee already has
+        if self._find_overlap(user_id, posted['start'], posted['end'], exclude_id=shift_id):
+            raise ShiftConflictError
 
-        result = self.schedules_collection.update_one(
-            {"shifts._id": shift_id},
+        # Only a posted shift can be taken, so two employees cannot both take the same shift
+        shift = self.shifts_collection.find_one_and_update(
+            {"_id": shift_id, "posted": True},
             {
                 "$set": {
-                    "shifts.$.posted": False,
-                    "shifts.$.employee_id": user_id,
-                    "shifts.$.employee_name": name
+                    "posted": False,
+                    "employee_id": user_id,
+                    "employee_name": name
                 }
-            }
+            },
+            projection={"schedule_id": 1},
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count > 0:
+        if shift:
+            self._bump_revision(shift["schedule_id"])
             return True
 
         return False
+
+    def migrate_embedded_shifts(self) -> int:
+        """
+        Move shifts still embedded in a schedule's 'shifts' array into the shift store.
+        :return: The number of shifts moved.
+        """
+        moved = 0
+
+        for schedule in self.schedules_collection.find({"shifts": {"$exists": True}}):
+            shifts = [
+                {**shift, "schedule_id": str(schedule["_id"]), "business_code": schedule["business_code"]}
+                for shift in schedule.get("shifts", [])
+            ]
+
+            if shifts:
+                # Skip shifts already copied by an earlier, interrupted run
+                existing = {s["_id"] for s in self.shifts_collection.find(
+                    {"_id": {"$in": [s["_id"] for s in shifts]}}, {"_id": 1})}
+                new_shifts = [s for s in shifts if s["_id"] not in existing]
+
+                if new_shifts:
+                    self.shifts_collection.insert_many(new_shifts, ordered=False)
+                moved += len(new_shifts)
+
+            self.schedules_collection.update_one({"_id": schedule["_id"]}, {"$unset": {"shifts": ""}})
+
+        return moved
+
+    def merge_duplicate_schedules(self) -> int:
+        """
+        Normalize schedule years and months to integers and merge schedules that share a business, year and month.
+        The oldest schedule of each group is kept and the shifts of the others are moved onto it.
+        :return: The number of duplicate schedules removed.
+        """
+        for schedule in self.schedules_collection.find({"$or": [{"year": {"$type": "string"}},
+                                                                 {"month": {"$type": "string"}}]}):
+            self.schedules_collection.update_one(
+                {"_id": schedule["_id"]},
+                {"$set": {"year": int(schedule["year"]), "month": int(schedule["month"])}}
+            )
+
+        groups = {}
+        for schedule in self.schedules_collection.find({}, {"business_code": 1, "year": 1, "month": 1}).sort("_id", 1):
+            key = (schedule["business_code"], schedule["year"], schedule["month"])
+            groups.setdefault(key, []).append(schedule["_id"])
+
+        removed = 0
+        for keep_id, *duplicate_ids in groups.values():
+            if not duplicate_ids:
+                continue
+
+            self.shifts_collection.update_many(
+                {"schedule_id": {"$in": [str(schedule_id) for schedule_id in duplicate_ids]}},
+                {"$set": {"schedule_id": str(keep_id)}}
+            )
+            removed += self.schedules_collection.delete_many({"_id": {"$in": duplicate_ids}}).deleted_count
+
+        return removed
+
+    @staticmethod
+    def _validate_template_slot(slot) -> str | None:
+        """ Helper method to check a weekly template slot. Returns the problem, or None if it is valid """
+        problem = validate_weekly_slot(slot)
+        if problem:
+            return problem
+
+        if slot.get('employee_id') is not None and not isinstance(slot['employee_id'], str):
+            return "employee_id must be a string or null for an open slot"
+
+        return None
+
+    def create_template(self, business_code: str, name: str, slots: list, user_id: str, timezone: str = "UTC") -> str:
+        """
+        Store a weekly shift template for a business.
+        :param slots: Weekly slots, each with day (e.g. 'Monday'), start and end ('HH:MM') and an optional employee_id.
+            Slots without an employee become open shifts when the template is applied.
+        :param timezone: IANA time zone the slot times and business hours are in.
+        :return: The id of the new template.
+        """
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError, TypeError):
+            raise ValueError(f"Unknown time zone: {timezone}")
+
+        for index, slot in enumerate(slots):
+            problem = self._validate_template_slot(slot)
+            if problem:
+                raise ValueError(f"Slot {index}: {problem}")
+
+        template = {
+            "business_code": business_code,
+            "name": name,
+            "timezone": timezone,
+            "slots": [{"day": slot['day'], "start": slot['start'], "end": slot['end'],
+                       "employee_id": slot.get('employee_id')} for slot in slots],
+            "created_at": datetime.now(),
+            "created_by": user_id
+        }
+
+        return str(self.templates_collection.insert_one(template).inserted_id)
+
+    def get_templates(self, business_code: str):
+        """ Get all shift templates of a business """
+        return list(self.templates_collection.find({"business_code": business_code}))
+
+    def delete_template(self, business_code: str, template_id: str) -> bool:
+        if not ObjectId.is_valid(template_id):
+            return False
+
+        result = self.templates_collection.delete_one({"_id": ObjectId(template_id), "business_code": business_code})
+        return result.deleted_count > 0
+
+    def apply_template(self, template_id: str, schedule_id: str, business_code: str, hours: list) -> dict | None:
+        """
+        Expand a weekly template into shifts for every matching day of a schedule's month, in one insert.
+        Slots falling on a closed day, outside the business hours or for an employee not in the business are skipped.
+        :param hours: The business hours, a list of {day, open, close} with 'HH:MM' times.
+        :return: The number of shifts added and the skipped slot dates, or None if the template or schedule is missing.
+        """
+        if not ObjectId.is_valid(template_id) or not ObjectId.is_valid(schedule_id):
+            return None
+
+        template = self.templates_collection.find_one({"_id": ObjectId(template_id), "business_code": business_code})
+        schedule = self.schedules_collection.find_one({"_id": ObjectId(schedule_id), "business_code": business_code},
+                                                      {"year": 1, "month": 1})
+        if not template or not schedule:
+            return None
+
+        # Applying the same template twice would duplicate every shift
+        if self.shifts_collection.find_one({"schedule_id": str(schedule["_id"]), "template_id": template_id},
+                                           {"_id": 1}):
+            raise ValueError("Template has already been applied to this schedule")
+
+        names = self._get_employee_names([slot["employee_id"] for slot in template["slots"] if slot["employee_id"]],
+                                         business_code)
+        shifts, skipped = [], []
+
+        for occurrence in expand_weekly_slots(template["slots"], schedule["year"], schedule["month"],
+                                              ZoneInfo(template.get("timezone", "UTC")), hours):
+            employee_id = template["slots"][occurrence["slot"]]["employee_id"]
+
+            problem = occurrence["problem"]
+            if not problem and employee_id and employee_id not in names:
+                problem = "Unknown employee"
+
+            if problem:
+                skipped.append({"slot": occurrence["slot"], "date": occurrence["date"].isoformat(), "message": problem})
+                continue
+
+            # slot and date are only kept to report overlaps and removed before the insert
+            shifts.append({
+                "slot": occurrence["slot"],
+                "date": occurrence["date"].isoformat(),
+                "_id": str(ObjectId()),
+                "schedule_id": str(schedule["_id"]),
+                "business_code": business_code,
+                "template_id": template_id,
+                "employee_id": employee_id,
+                "employee_name": names[employee_id] if employee_id else self.OPEN_SHIFT_NAME,
+                "start": occurrence["start"],
+                "end": occurrence["end"],
+                # Open slots are posted straight away so employees can take them
+                "posted": employee_id is None,
+                "clocked_in": False,
+                "completed": False
+            })
+
+        # Leave out generated shifts that would double book an employee
+        overlaps = self._find_batch_overlaps(shifts)
+        skipped.extend({"slot": shift.pop("slot"), "date": shift.pop("date"),
+                        "message": "Overlaps another shift of this employee"}
+                       for shift, overlap in zip(shifts, overlaps) if overlap)
+        shifts = [shift for shift, overlap in zip(shifts, overlaps) if not overlap]
+
+        for shift in shifts:
+            del shift["slot"], shift["date"]
+
+        if shifts:
+            self.shifts_collection.insert_many(shifts, ordered=False)
+            self._bump_revision(schedule["_id"])
+
+        return {"added": len(shifts), "skipped": skipped}
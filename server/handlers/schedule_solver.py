@@ -0,0 +1,260 @@
+import bisect
+import time
+from collections import defaultdict
+
+# Demand index of busy intervals that come from shifts stored before the solver ran. They are never moved
+EXISTING = -1
+
+
+class ScheduleSolver:
+    """
+    Assigns employees to staffing demands with a greedy pass followed by local search.
+
+    A demand is one staffing slot on one day: a UTC start and end, the number of employees it needs and
+    the weekly slot it came from. Every employee available for that slot is a candidate.
+    Employees are never double booked and never go over the weekly cap.
+    The greedy pass fills the scarcest demands first with the least loaded candidates. Local search then
+    fills what is still open by moving one blocking shift to another candidate, and evens out the load by
+    moving shifts from busier to less busy candidates.
+    """
+
+    # Balance passes stop earlier once a pass moves nothing
+    MAX_BALANCE_PASSES = 5
+
+    def __init__(self, demands: list[dict], candidates: dict, max_week_minutes: int = None,
+                 time_limit: float = 10.0):
+        """
+        :param demands: Demands with start, end (UTC ISO strings), minutes, week, count and slot.
+        :param candidates: Employee ids available for each slot, keyed by slot.
+        :param max_week_minutes: Most minutes an employee may work in a week. None for no cap.
+        :param time_limit: Seconds the local search may run for. The greedy pass always completes.
+        """
+        self.demands = demands
+        self.candidates = candidates
+        self.max_week_minutes = max_week_minutes
+        self.time_limit = time_limit
+
+        # Employees assigned to each demand
+        self.assigned = [[] for _ in demands]
+
+        # Busy intervals per employee, sorted by start: (start, end, demand index)
+        self.busy = defaultdict(list)
+
+        # Minutes per employee, in total and per week
+        self.load = defaultdict(int)
+        self.week_load = defaultdict(int)
+
+    def add_existing(self, employee_id: str, start: str, end: str, week, minutes: int):
+        """
+        Mark an employee busy for a shift that is already stored.
+        Stored shifts can overlap each other, so they are merged into one busy interval with those they overlap.
+        """
+        busy = self.busy[employee_id]
+
+        for interval in self._overlaps(employee_id, {"start": start, "end": end}):
+            busy.remove(interval)
+            start, end = min(start, interval[0]), max(end, interval[1])
+
+        bisect.insort(busy, (start, end, EXISTING))
+        self.load[employee_id] += minutes
+        self.week_load[(employee_id, week)] += minutes
+
+    def _overlaps(self, employee_id: str, demand: dict) -> list[tuple]:
+        """
+        Helper method to get the busy intervals of an employee that overlap a demand.
+        An employee's intervals do not overlap each other (add_existing merges the stored shifts that do, and
+        demands are only assigned where they fit), so their ends are sorted too and the scan
+        back from the last interval starting before the demand's end stops at the first one ending before its start.
+        """
+        busy = self.busy[employee_id]
+        overlaps = []
+
+        index = bisect.bisect_left(busy, (demand["end"],)) - 1
+        while index >= 0 and busy[index][1] > demand["start"]:
+            overlaps.append(busy[index])
+            index -= 1
+
+        return overlaps
+
+    def _fits(self, employee_id: str, index: int) -> bool:
+        """ Helper method to check if an employee can take a demand without a clash or going over the weekly cap """
+        demand = self.demands[index]
+
+        if (self.max_week_minutes is not None and
+                self.week_load[(employee_id, demand["week"])] + demand["minutes"] > self.max_week_minutes):
+            return False
+
+        return not self._overlaps(employee_id, demand)
+
+    def _assign(self, employee_id: str, index: int):
+        demand = self.demands[index]
+        self.assigned[index].append(employee_id)
+        bisect.insort(self.busy[employee_id], (demand["start"], demand["end"], index))
+        self.load[employee_id] += demand["minutes"]
+        self.week_load[(employee_id, demand["week"])] += demand["minutes"]
+
+    def _unassign(self, employee_id: str, index: int):
+        demand = self.demands[index]
+        self.assigned[index].remove(employee_id)
+        busy = self.busy[employee_id]
+        busy.pop(bisect.bisect_left(busy, (demand["start"], demand["end"], index)))
+        self.load[employee_id] -= demand["minutes"]
+        self.week_load[(employee_id, demand["week"])] -= demand["minutes"]
+
+    def _open(self, index: int) -> int:
+        """ Helper method to get the number of positions of a demand nobody is assigned to """
+        return self.demands[index]["count"] - len(self.assigned[index])
+
+    def _ranked(self, index: int) -> list[str]:
+        """ Helper method to get the candidates of a demand, least loaded first """
+        return sorted(self.candidates.get(self.demands[index]["slot"], ()), key=self.load.__getitem__)
+
+    def _greedy(self):
+        """ Helper method to fill the demands with the fewest candidates per position first """
+        def scarcity(index):
+            demand = self.demands[index]
+            return len(self.candidates.get(demand["slot"], ())) / demand["count"], demand["start"]
+
+        for index in sorted(range(len(self.demands)), key=scarcity):
+            for employee_id in self._ranked(index):
+                if not self._open(index):
+                    break
+
+                if self._fits(employee_id, index):
+                    self._assign(employee_id, index)
+
+    def _move_blocker(self, employee_id: str, index: int, stuck: set) -> bool:
+        """
+        Helper method to free a candidate for an open demand by handing one of their shifts to someone else.
+        The blocker is the one generated shift overlapping the demand, or a generated shift in the same week
+        when the candidate is at the weekly cap.
+        :param stuck: Blocking demands no other candidate can take. Filled in here and only valid until a move is made.
+        """
+        demand = self.demands[index]
+        overlaps = self._overlaps(employee_id, demand)
+
+        if overlaps:
+            # Stored shifts stay put, and freeing two overlapping shifts is out of reach of a single move
+            if len(overlaps) > 1 or overlaps[0][2] == EXISTING:
+                return False
+            blockers = [overlaps[0][2]]
+        else:
+            blockers = [blocker for _, _, blocker in self.busy[employee_id]
+                        if blocker != EXISTING and self.demands[blocker]["week"] == demand["week"]]
+
+        for blocker in blockers:
+            if blocker in stuck:
+                continue
+
+            self._unassign(employee_id, blocker)
+
+            if self._fits(employee_id, index):
+                for other in self._ranked(blocker):
+                    if other != employee_id and self._fits(other, blocker):
+                        self._assign(other, blocker)
+                        self._assign(employee_id, index)
+                        return True
+
+                stuck.add(blocker)
+
+            self._assign(employee_id, blocker)
+
+        return False
+
+    def _repair(self, deadline: float) -> int:
+        """ Helper method to fill the positions the greedy pass left open. Returns the number filled """
+        filled = 0
+
+        for index in range(len(self.demands)):
+            if not self._open(index):
+                continue
+
+            stuck = set()
+
+            for employee_id in self._ranked(index):
+                if not self._open(index) or time.perf_counter() > deadline:
+                    break
+
+                if employee_id in self.assigned[index]:
+                    continue
+
+                if self._fits(employee_id, index):
+                    self._assign(employee_id, index)
+                    filled += 1
+                elif self._move_blocker(employee_id, index, stuck):
+                    filled += 1
+                    stuck.clear()
+
+        return filled
+
+    def _balance(self, deadline: float) -> int:
+        """
+        Helper method to move shifts to less loaded candidates. Returns the number of shifts moved.
+        A move is only made when the receiver stays below the giver, so every move narrows the spread and the
+        passes end. Givers are taken busiest first and receivers least loaded first, so each candidate of a demand
+        is looked at once per pass.
+        """
+        moved = 0
+
+        for index, demand in enumerate(self.demands):
+            if time.perf_counter() > deadline:
+                break
+
+            ranked = self._ranked(index)
+            position = 0
+
+            for employee_id in sorted(self.assigned[index], key=self.load.__getitem__, reverse=True):
+                while position < len(ranked):
+                    other = ranked[position]
+                    if self.load[other] + demand["minutes"] >= self.load[employee_id]:
+                        break
+
+                    position += 1
+
+                    # Assigned candidates overlap the demand themselves, so _fits leaves them out
+                    if self._fits(other, index):
+                        self._unassign(employee_id, index)
+                        self._assign(other, index)
+                        moved += 1
+                        break
+                else:
+                    break
+
+        return moved
+
+    def solve(self) -> dict:
+        """
+        Run the greedy pass and the local search.
+        :return: The employees assigned to each demand, the open positions per demand and solver statistics.
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_limit
+
+        self._greedy()
+        greedy_open = sum(self._open(index) for index in range(len(self.demands)))
+
+        repaired = self._repair(deadline)
+
+        balance_moves = 0
+        for _ in range(self.MAX_BALANCE_PASSES):
+            moved = self._balance(deadline)
+            balance_moves += moved
+            if not moved:
+                break
+
+        loads = [self.load[employee_id] for employee_id in
+                 {employee_id for ids in self.candidates.values() for employee_id in ids}]
+
+        return {
+            "assigned": self.assigned,
+            "open": [self._open(index) for index in range(len(self.demands))],
+            "stats": {
+                "positions": sum(demand["count"] for demand in self.demands),
+                "open_after_greedy": greedy_open,
+                "repaired": repaired,
+                "balance_moves": balance_moves,
+                "min_hours": round(min(loads, default=0) / 60, 2),
+                "max_hours": round(max(loads, default=0) / 60, 2),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+        }
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from pymongo import errors
+
+from handlers.db_handler import DatabaseHandler
+from handlers.index_registry import INDEX_REGISTRY, reconcile_indexes
+
+# Bump when a data migration is added. Index changes are picked up from the registry fingerprint.
+SCHEMA_VERSION = 3
+
+
+class SchemaHandler:
+
+    MARKER_ID = "schema"
+    LOCK_ID = "bootstrap_lock"
+
+    def __init__(self, db_handler: DatabaseHandler, lock_timeout: int = 300):
+        """
+        Initializes the SchemaHandler with the database handler.
+        :param lock_timeout: Seconds after which a bootstrap lock left by a crashed worker is ignored.
+        """
+        self.db = db_handler.database
+        self.meta_collection = self.db["Meta"]
+        self.lock_timeout = lock_timeout
+
+        # Data migrations to run when upgrading past each version
+        self.migrations = {}
+
+    @staticmethod
+    def index_fingerprint() -> str:
+        """ Return a hash of the index registry so index changes trigger a bootstrap """
+        encoded = json.dumps(INDEX_REGISTRY, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def register_migration(self, version: int, migration):
+        """
+        Register a data migration to run when the stored schema is older than the given version.
+        :param version: The schema version the migration upgrades to.
+        :param migration: A callable that takes no arguments.
+        """
+        self.migrations.setdefault(version, []).append(migration)
+
+    def get_marker(self) -> dict | None:
+        """ Return the stored schema version marker, if there is one """
+        return self.meta_collection.find_one({"_id": self.MARKER_ID})
+
+    def _is_current(self, marker: dict | None) -> bool:
+        """ Helper method to check whether the stored marker matches this build """
+        return (marker is not None and marker.get("version") == SCHEMA_VERSION and
+                marker.get("index_fingerprint") == self.index_fingerprint())
+
+    def _acquire_lock(self) -> bool:
+        """ Helper method to take the bootstrap lock so only one worker runs DDL at a time """
+        now = datetime.now()
+
+        # Clear a lock left behind by a worker that died mid-bootstrap
+        self.meta_collection.delete_one({"_id": self.LOCK_ID, "expires_at": {"$lt": now}})
+
+        try:
+            self.meta_collection.insert_one({"_id": self.LOCK_ID,
+                                             "expires_at": now + timedelta(seconds=self.lock_timeout)})
+            return True
+
+        except errors.DuplicateKeyError:
+            return False
+
+    def _release_lock(self):
+        """ Helper method to release the bootstrap lock """
+        self.meta_collection.delete_one({"_id": self.LOCK_ID})
+
+    def _run(self, marker: dict | None) -> dict:
+        """ Helper method to run any pending migrations and the index reconcile, then store the new marker """
+        stored_version = marker.get("version", 0) if marker else 0
+
+        # Migrations run first so they can prepare data for new indexes (e.g. removing duplicates before a unique index)
+        for version in sorted(self.migrations):
+            if version > stored_version:
+                for migration in self.migrations[version]:
+                    migration()
+
+        changes = reconcile_indexes(self.db)
+
+        self.meta_collection.update_one(
+            {"_id": self.MARKER_ID},
+            {"$set": {"version": SCHEMA_VERSION,
+                      "index_fingerprint": self.index_fingerprint(),
+                      "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+        return changes
+
+    def bootstrap(self, wait_seconds: float = 60, poll_interval: float = 0.5) -> bool:
+        """
+        Bring the database schema up to date if the stored version marker is behind this build.
+        When the marker is current this costs a single read and no DDL.
+        :param wait_seconds: How long to wait for another worker that is already bootstrapping.
+        :param poll_interval: Seconds between checks while waiting.
+        :return: True if this call ran the bootstrap, False if the schema was already current.
+        """
+        deadline = time.monotonic() + wait_seconds
+
+        while True:
+            marker = self.get_marker()
+
+            if self._is_current(marker):
+                return False
+
+            if self._acquire_lock():
+                try:
+                    # Another worker may have finished between our read and taking the lock
+                    marker = self.get_marker()
+                    if self._is_current(marker):
+                        return False
+
+                    self._run(marker)
+                    return True
+
+                finally:
+                    self._release_lock()
+
+            if time.monotonic() >= deadline:
+                raise TimeoutError("Timed out waiting for another worker to bootstrap the database schema.")
+
+            time.sleep(poll_interval)
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from handlers.db_handler import DatabaseHandler
+from tools import to_utc_iso
+
+MS_PER_HOUR = 60 * 60 * 1000
+
+
+class TimesheetHandler:
+
+    # Clocking in later than this after the start, or out earlier than this before the end, is flagged
+    PUNCH_GRACE = timedelta(minutes=5)
+
+    # Longest range one timesheet may cover - a quarter
+    MAX_RANGE = timedelta(days=93)
+
+    # Per-shift counters summed into the per-employee and business totals
+    COUNTERS = ("shifts", "scheduled_ms", "worked_ms", "late_clock_ins", "early_clock_outs", "missed_shifts")
+
+    def __init__(self, db_handler: DatabaseHandler):
+        """ Initializes the TimesheetHandler with the database handler """
+        db = db_handler.database
+
+        # Collections and indexes are created by SchemaHandler.bootstrap
+        self.shifts = db["Shifts"]
+
+    @staticmethod
+    def _timesheet_query(business_code: str, start: datetime, end: datetime, employee_id: str = None) -> dict:
+        """ Helper method to build the filter for the shifts starting inside a range """
+        query = {"business_code": business_code, "start": {"$gte": to_utc_iso(start), "$lt": to_utc_iso(end)}}
+
+        if employee_id is not None:
+            query["employee_id"] = employee_id
+        else:
+            # Leave out open shifts nobody has taken
+            query["employee_id"] = {"$ne": None}
+
+        return query
+
+    def _timesheet_pipeline(self, query: dict) -> list[dict]:
+        """
+        Helper method to build the aggregation that turns shifts into per-employee totals.
+        Shift times are stored as ISO strings and punches as dates, so the shift times are converted first.
+        Shifts are grouped in start order, so each row carries the name on the employee's latest shift.
+        """
+        grace_ms = int(self.PUNCH_GRACE.total_seconds() * 1000)
+        clocked_in = {"$ifNull": ["$clocked_in_at", False]}
+        clocked_out = {"$ifNull": ["$clocked_out_at", False]}
+
+        return [
+            {"$match": query},
+
+            # Read in order off the (business_code, start) or (employee_id, start) index, for $last below
+            {"$sort": {"start": 1}},
+            {"$project": {
+                "employee_id": 1,
+                "employee_name": 1,
+                "clocked_in_at": 1,
+                "clocked_out_at": 1,
+                "start": {"$toDate": "$start"},
+                "end": {"$toDate": "$end"}
+            }},
+            {"$project": {
+                "employee_id": 1,
+                "employee_name": 1,
+                "scheduled_ms": {"$subtract": ["$end", "$start"]},
+                "worked_ms": {"$cond": [{"$and": [clocked_in, clocked_out]},
+                                        {"$subtract": ["$clocked_out_at", "$clocked_in_at"]}, 0]},
+                "late_clock_ins": {"$cond": [{"$and": [clocked_in,
+                                                       {"$gt": ["$clocked_in_at", {"$add": ["$start", grace_ms]}]}]},
+                                             1, 0]},
+                "early_clock_outs": {"$cond": [{"$and": [clocked_out,
+                                                         {"$lt": ["$clocked_out_at",
+                                                                  {"$subtract": ["$end", grace_ms]}]}]},
+                                               1, 0]},
+                # Shifts that are over but were never clocked into
+                "missed_shifts": {"$cond": [{"$and": [{"$not": [clocked_in]}, {"$lt": ["$end", "$$NOW"]}]}, 1, 0]}
+            }},
+            {"$group": {
+                "_id": "$employee_id",
+                "employee_name": {"$last": "$employee_name"},
+                "shifts": {"$sum": 1},
+                "scheduled_ms": {"$sum": "$scheduled_ms"},
+                "worked_ms": {"$sum": "$worked_ms"},
+                "late_clock_ins": {"$sum": "$late_clock_ins"},
+                "early_clock_outs": {"$sum": "$early_clock_outs"},
+                "missed_shifts": {"$sum": "$missed_shifts"}
+            }},
+            {"$sort": {"employee_name": 1, "_id": 1}}
+        ]
+
+    @staticmethod
+    def _to_response(counters: dict) -> dict:
+        """ Helper method to convert summed milliseconds into hours for the API """
+        response = {key: value for key, value in counters.items() if key not in ("_id", "scheduled_ms", "worked_ms")}
+        response["scheduled_hours"] = round(counters["scheduled_ms"] / MS_PER_HOUR, 2)
+        response["worked_hours"] = round(counters["worked_ms"] / MS_PER_HOUR, 2)
+
+        return response
+
+    def get_timesheet(self, business_code: str, start: datetime, end: datetime, employee_id: str = None) -> dict:
+        """
+        Get scheduled and worked hours per employee for the shifts starting inside a range.
+        The per-employee figures come from a single aggregation, the business totals are summed from those rows.
+        :param start: Start of the range, inclusive.
+        :param end: End of the range, exclusive.
+        :param employee_id: Only this employee's shifts.
+        :return: The per-employee rows and the business totals.
+        """
+        if end <= start:
+            raise ValueError("The end of the range must be after its start.")
+
+        if end - start > self.MAX_RANGE:
+            raise ValueError(f"A timesheet can cover at most {self.MAX_RANGE.days} days.")
+
+        query = self._timesheet_query(business_code, start, end, employee_id)
+        rows = list(self.shifts.aggregate(self._timesheet_pipeline(query)))
+
+        totals = {counter: sum(row[counter] for row in rows) for counter in self.COUNTERS}
+        totals["employees"] = len(rows)
+
+        employees = [{"employee_id": row["_id"], **self._to_response(row)} for row in rows]
+
+        return {"employees": employees, "totals": self._to_response(totals)}
@@ -1,23 +1,40 @@
 from flask import request, jsonify, g
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, \
-    set_access_cookies, create_refresh_token
-from handlers.exceptions.exceptions import PasswordFormatError, UserAlreadyExistsError
+    set_access_cookies, create_refresh_token, verify_jwt_in_request, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from handlers.exceptions.exceptions import PasswordFormatError, UserAlreadyExistsError, PasswordHandlerBusyError
 from handlers.enums.roles import Role
 from handlers.role_handler import RoleValidationHandler
+from routes.pipeline import endpoint
 import jwt as pyjwt
 from datetime import datetime
 
-
-def create_user_endpoint():
+# Claims every token carries. Refresh tokens carry them too, so /refresh can reissue them without a database read
+TOKEN_CLAIMS = ("role", "code", "user_id")
+
+CREATE_USER_SCHEMA = {
+    "type": "object",
+    "required": ["firstName", "lastName", "username", "password", "role"],
+    "properties": {
+        "firstName": {"type": "string", "minLength": 1},
+        "lastName": {"type": "string", "minLength": 1},
+        "username": {"type": "string", "minLength": 1},
+        "password": {"type": "string"},
+        "role": {"type": "string", "enum": [role.value for role in Role]},
+        "code": {"type": ["string", "null"]}
+    }
+}
+
+LOGIN_SCHEMA = {
+    "type": "object",
+    "required": ["username", "password"],
+    "properties": {"username": {"type": "string"}, "password": {"type": "string"}}
+}
+
+
+@endpoint(schema=CREATE_USER_SCHEMA)
+def create_user_endpoint(data):
     """ Endpoint to create a new user """
-
-    data = request.get_json()
-
-    # Ensure the required fields exist
-    if (not data or 'firstName' not in data or 'lastName' not in data or
-            'username' not in data or 'password' not in data or 'role' not in data):
-        return jsonify({"message": "Name, Username, password, and role are required"}), 400
-
     first_name = data['firstName']
     last_name = data['lastName']
     username = data['username']
@@ -33,8 +50,9 @@ def create_user_endpoint():
         # Attempt to create the user and return success message
         if g.account_handler.create_user(first_name, last_name, username, password, role, code):
             user_id = g.account_handler.find_user_by_name(username)['_id']
-            access_token = create_access_token(identity=username, additional_claims={"role": role, "code": code, "user_id": str(user_id)})
-            refresh_token = create_refresh_token(identity=username)
+            claims = {"role": role, "code": code, "user_id": str(user_id)}
+            access_token = create_access_token(identity=username, additional_claims=claims)
+            refresh_token = create_refresh_token(identity=username, additional_claims=claims)
 
             # Decode token to read expiration
             decoded = pyjwt.decode(access_token, options={"verify_signature": False})
@@ -54,30 +72,38 @@ def create_user_endpoint():
         # Catch known errors
         return jsonify({"message": e.message}), 400
 
+    except PasswordHandlerBusyError as e:
+        # Password workers are saturated - ask the client to back off
+        return jsonify({"message": e.message}), 503, {"Retry-After": "1"}
+
     # Default error response if something else goes wrong
     return jsonify({"message": "Failure. Unknown Error"}), 400
 
 
 
-def login_endpoint():
+@endpoint(schema=LOGIN_SCHEMA)
+def login_endpoint(data):
     """ Endpoint to login a user """
-    data = request.get_json()
-
-    if not data or 'username' not in data or 'password' not in data:
-        return jsonify({"message": "Username and password are required"}), 400
-
     username = data['username']
     password = data['password']
 
-    if g.account_handler.validate_login(username, password):
+    try:
+        is_valid = g.account_handler.validate_login(username, password)
+
+    except PasswordHandlerBusyError as e:
+        # Password workers are saturated - ask the client to back off
+        return jsonify({"message": e.message}), 503, {"Retry-After": "1"}
+
+    if is_valid:
         user = g.account_handler.find_user_by_name(username)
         role = user['role']
         code = user.get('business_code', None)
         user_id = user['_id']
 
         # Create JWT token
-        access_token = create_access_token(identity=username, additional_claims={"role": role, "code": code, "user_id": str(user_id)})
-        refresh_token = create_refresh_token(identity=username)
+        claims = {"role": role, "code": code, "user_id": str(user_id)}
+        access_token = create_access_token(identity=username, additional_claims=claims)
+        refresh_token = create_refresh_token(identity=username, additional_claims=claims)
 
         # Decode token to read expiration
         decoded = pyjwt.decode(access_token, options={"verify_signature": False})
@@ -94,3 +120,53 @@ def login_endpoint():
     return jsonify({"message": "Invalid username or password"}), 401
 
 
+def refresh_endpoint():
+    """ Endpoint to exchange a refresh token for an access token carrying the same role, code and user id """
+    # Refresh token check
+    verify_jwt_in_request(refresh=True)
+    claims = get_jwt()
+
+    if g.revocation_handler is not None and g.revocation_handler.is_revoked(claims):
+        return jsonify({"message": "Token has been revoked"}), 401
+
+    username = claims['sub']
+
+    if 'role' in claims:
+        token_claims = {key: claims.get(key) for key in TOKEN_CLAIMS}
+
+    else:
+        # Refresh tokens issued before they carried the claims
+        user = g.account_handler.find_user_by_name(username)
+        if not user:
+            return jsonify({"message": "User not found"}), 401
+
+        token_claims = {"role": user['role'], "code": user.get('business_code', None), "user_id": str(user['_id'])}
+
+    access_token = create_access_token(identity=username, additional_claims=token_claims)
+    return jsonify({"msg": "token refreshed", "message": "success", "JWT": access_token}), 200
+
+
+@endpoint(roles=list(Role))
+def logout_endpoint(claims):
+    """ Endpoint to revoke the access token of the request, and the refresh token if one is sent as refresh_JWT """
+    if g.revocation_handler is None:
+        return jsonify({"message": "Logout is not available"}), 503
+
+    data = request.get_json(silent=True) or {}
+    refresh_claims = None
+
+    if data.get('refresh_JWT'):
+        try:
+            # An expired refresh token is decoded too, it just needs no revoking
+            refresh_claims = decode_token(data['refresh_JWT'], allow_expired=True)
+        except (pyjwt.PyJWTError, JWTExtendedException):
+            return jsonify({"message": "Invalid refresh token"}), 400
+
+        if refresh_claims.get('type') != 'refresh' or refresh_claims.get('sub') != claims['sub']:
+            return jsonify({"message": "Invalid refresh token"}), 400
+
+    g.revocation_handler.revoke_token(claims)
+    if refresh_claims is not None:
+        g.revocation_handler.revoke_token(refresh_claims)
+
+    return jsonify({"message": "success"}), 200
@@ -1,25 +1,24 @@
 from flask import request, jsonify, g
-from flask_jwt_extended import verify_jwt_in_request, get_jwt
 
 from handlers.enums.roles import Role
-from handlers.validation_handler import is_authorized
-from tools import jsonify_keys
+from routes.pipeline import endpoint
+from routes.streaming import wants_ndjson, ndjson_response, sse_response
+from tools import jsonify_keys, parse_utc
 
+# Page size limits for the manager activity feed
+DEFAULT_ACTIVITY_PAGE = 100
+MAX_ACTIVITY_PAGE = 500
 
-def upcoming_shift_endpoint():
-    """ Endpoint to get an employees upcoming shift """
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
+LOG_ACTIVITY_SCHEMA = {
+    "type": "object",
+    "required": ["shift_id", "clock_in"],
+    "properties": {"shift_id": {"type": "string"}, "clock_in": {"type": "boolean"}}
+}
 
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
 
+@endpoint(roles=[Role.EMPLOYEE])
+def upcoming_shift_endpoint(claims):
+    """ Endpoint to get an employees upcoming shift """
     user_id = claims["user_id"]
     business_code = claims["code"]
 
@@ -37,24 +36,9 @@ def upcoming_shift_endpoint():
         return jsonify({"message": msg}), 400
 
 
-def log_activity_endpoint():
-
-    data = request.get_json()
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
-
-    if not data or "shift_id" not in data or "clock_in" not in data:
-        return jsonify({"message": "Missing Required Fields. shift_id and clock_in required."}), 400
-
+@endpoint(roles=[Role.EMPLOYEE], schema=LOG_ACTIVITY_SCHEMA)
+def log_activity_endpoint(claims, data):
+    """ Endpoint for an employee to clock in or out of a shift """
     shift_id = data["shift_id"]
     clock_in = data["clock_in"]
 
@@ -74,32 +58,75 @@ def log_activity_endpoint():
         return jsonify({"message": msg}), 400
 
 
-def employee_activities_endpoint():
-    """ Endpoint for managers to load employee activities """
-
-    # JWT check
-    verify_jwt_in_request()
+@endpoint(roles=[Role.MANAGER])
+def employee_activities_endpoint(claims):
+    """ Endpoint for managers to load one page of employee activities """
+    business_code = claims["code"]
 
-    # Get the claims from the JWT token
-    claims = get_jwt()
+    limit = request.args.get("limit", default=DEFAULT_ACTIVITY_PAGE, type=int)
+    if not 1 <= limit <= MAX_ACTIVITY_PAGE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_ACTIVITY_PAGE}"}), 400
 
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
+    # Optional clock direction filter - 'in' or 'out'
+    direction = request.args.get("direction")
+    if direction not in (None, "in", "out"):
+        return jsonify({"message": "direction must be 'in' or 'out'"}), 400
 
-    business_code = claims["code"]
+    # Optional date range, as ISO 8601 timestamps
+    try:
+        start = parse_utc(request.args["from"]) if "from" in request.args else None
+        end = parse_utc(request.args["to"]) if "to" in request.args else None
+    except ValueError:
+        return jsonify({"message": "from and to must be ISO 8601 timestamps"}), 400
+
+    filters = {
+        "employee_id": request.args.get("employee_id"),
+        "shift_id": request.args.get("shift_id"),
+        "start": start,
+        "end": end,
+        "clock_in": None if direction is None else direction == "in"
+    }
 
     try:
-        activities = g.activity_handler.get_employee_activities(business_code=business_code)
+        # Opt-in streaming of every matching activity, without paging
+        if wants_ndjson():
+            return ndjson_response(g.activity_handler.iter_employee_activities(business_code=business_code, **filters),
+                                   keys_to_convert=['_id'])
+
+        activities, next_cursor = g.activity_handler.get_employee_activities(
+            business_code=business_code,
+            limit=limit,
+            cursor=request.args.get("cursor"),
+            **filters
+        )
         activities = jsonify_keys(original=activities, keys_to_convert=['_id'])
 
         if activities:
-            return jsonify({"message": "success", "activities": activities}), 200
+            return jsonify({"message": "success", "activities": activities, "next_cursor": next_cursor}), 200
 
         else:
-            return jsonify({"message": "No Recent Activities"}), 202
+            return jsonify({"message": "No Recent Activities", "activities": [], "next_cursor": None}), 202
+
+    except ValueError as e:
+        # Malformed cursor
+        return jsonify({"message": str(e)}), 400
 
     except Exception as e:
         msg = f"failure: {e}"
-        return jsonify({"message": msg}), 400
\ No newline at end of file
+        return jsonify({"message": msg}), 400
+
+
+@endpoint(roles=[Role.MANAGER])
+def activity_stream_endpoint(claims):
+    """ Endpoint for managers to follow new employee activities as Server-Sent Events """
+    # EventSource sends the header on reconnects, fetch based clients can use either
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    try:
+        events = g.activity_handler.stream_activities(business_code=claims["code"], last_event_id=last_event_id)
+
+    except ValueError as e:
+        # Malformed event id
+        return jsonify({"message": str(e)}), 400
+
+    return sse_response(events, event_name="activity", keys_to_convert=['_id'])
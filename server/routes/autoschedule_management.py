@@ -0,0 +1,82 @@
+from flask import request, jsonify, g
+
+from handlers.autoschedule_handler import AutoScheduleHandler
+from handlers.enums.roles import Role
+from routes.pipeline import endpoint
+from tools import jsonify_keys
+
+# Slots and availability windows are checked in depth by AutoScheduleHandler
+GENERATE_SCHEDULE_SCHEMA = {
+    "type": "object",
+    "required": ["schedule_id", "staffing"],
+    "properties": {
+        "schedule_id": {"type": "string"},
+        "staffing": {"type": "array", "minItems": 1, "items": {"type": "object"}},
+        "timezone": {"type": "string"},
+        "max_hours_per_week": {"type": "integer", "minimum": 1}
+    }
+}
+
+SET_AVAILABILITY_SCHEMA = {
+    "type": "object",
+    "required": ["availability"],
+    "properties": {"availability": {"type": "array", "items": {"type": "object"}}}
+}
+
+
+@endpoint(roles=[Role.MANAGER], schema=GENERATE_SCHEDULE_SCHEMA)
+def generate_schedule_endpoint(claims, data):
+    """ Endpoint to start generating a draft for a schedule's month in the background """
+    business = g.business_handler.get_business_from_code(code=claims['code'])
+    if not business:
+        return jsonify({"message": "failure: business does not exist"}), 400
+
+    try:
+        job_id = g.autoschedule_handler.start_job(
+            schedule_id=data['schedule_id'], business_code=business['code'], staffing=data['staffing'],
+            hours=business.get('hours'), user_id=claims['user_id'], timezone=data.get('timezone', 'UTC'),
+            max_hours_per_week=data.get('max_hours_per_week', AutoScheduleHandler.DEFAULT_MAX_HOURS_PER_WEEK))
+
+        if job_id is None:
+            return jsonify({"message": "Schedule not found"}), 404
+
+        # The draft is generated by a background worker, poll the job for its result
+        return jsonify({"message": "accepted", "job_id": job_id}), 202
+
+    except ValueError as e:
+        # Invalid staffing or a draft already exists
+        return jsonify({"message": str(e)}), 400
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
+
+
+@endpoint(roles=[Role.MANAGER])
+def schedule_job_endpoint(claims):
+    """ Endpoint to get the state of a schedule generation job """
+    job = g.autoschedule_handler.get_job(job_id=request.args.get('job_id', ''), business_code=claims['code'])
+    if not job:
+        return jsonify({"message": "Job not found"}), 404
+
+    return jsonify({"message": "success", "job": jsonify_keys(original=job, keys_to_convert=['_id'])}), 200
+
+
+@endpoint(roles=[Role.EMPLOYEE, Role.MANAGER])
+def get_availability_endpoint(claims):
+    """ Endpoint to get the weekly availability of the logged in employee """
+    availability = g.autoschedule_handler.get_availability(user_id=claims['user_id'])
+    return jsonify({"message": "success", "availability": availability}), 200
+
+
+@endpoint(roles=[Role.EMPLOYEE, Role.MANAGER], schema=SET_AVAILABILITY_SCHEMA)
+def set_availability_endpoint(claims, data):
+    """ Endpoint to set the weekly availability of the logged in employee """
+    try:
+        if g.autoschedule_handler.set_availability(user_id=claims['user_id'], availability=data['availability']):
+            return jsonify({"message": "success"}), 200
+
+        return jsonify({"message": "User not found"}), 404
+
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
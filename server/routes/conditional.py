@@ -0,0 +1,28 @@
+import hashlib
+
+from flask import Response, request
+
+
+def make_etag(*parts) -> str:
+    """ Build an ETag from the values a response is derived from, e.g. schedule ids and revisions """
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    """ Tag a response so clients revalidate it with If-None-Match instead of refetching """
+    response.set_etag(etag)
+
+    # Private to the logged in user, and always revalidated
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag: str) -> Response | None:
+    """
+    Check the request's If-None-Match against an ETag.
+    :return: An empty 304 response if the client's copy is current, otherwise None.
+    """
+    if not request.if_none_match.contains(etag):
+        return None
+
+    return with_etag(Response(status=304), etag)
@@ -0,0 +1,24 @@
+from flask import jsonify, g
+
+
+def _no_store(response):
+    """ Helper method to keep proxies and browsers from answering health checks from their cache """
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def live_endpoint():
+    """ Endpoint for liveness checks. Answers as long as the process serves requests, without touching the database """
+    return _no_store(jsonify({"status": "ok"})), 200
+
+
+def ready_endpoint():
+    """
+    Endpoint for readiness checks. Answers from the last background probe of HealthHandler,
+    so polling it never adds database load. 503 tells load balancers to route around this instance.
+    """
+    if g.health_handler is None:
+        return _no_store(jsonify({"status": "unavailable", "problem": "health probe not configured"})), 503
+
+    ready, health = g.health_handler.get_readiness()
+    return _no_store(jsonify(health)), 200 if ready else 503
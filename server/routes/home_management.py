@@ -1,29 +1,29 @@
 from datetime import datetime
 
-from flask import jsonify, g
-from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask import jsonify, g, request
 
 from handlers.enums.roles import Role
-from handlers.validation_handler import is_authorized
+from routes.conditional import make_etag, not_modified, with_etag
+from routes.pipeline import endpoint
+from tools import parse_utc, to_utc_iso
 
 
-def populate_home_endpoint():
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER, Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
-
+@endpoint(roles=[Role.MANAGER, Role.EMPLOYEE])
+def populate_home_endpoint(claims):
     # Extract the code from the claims
     code = claims['code']
 
-    # Get the current month
-    current_month = datetime.now().month
+    # Get the requested month, defaulting to the current one
+    now = datetime.now()
+    year = request.args.get('year', default=now.year, type=int)
+    month = request.args.get('month', default=now.month, type=int)
+
+    # Optional window so only the shifts the page shows are returned, e.g. the current week
+    try:
+        window_start = to_utc_iso(parse_utc(request.args['from'])) if 'from' in request.args else None
+        window_end = to_utc_iso(parse_utc(request.args['to'])) if 'to' in request.args else None
+    except ValueError:
+        return jsonify({"message": "from and to must be ISO 8601 timestamps"}), 400
 
     if code and code != '':
 
@@ -31,17 +31,32 @@ def populate_home_endpoint():
         business = g.business_handler.get_business_from_code(code=code)
 
         if business:
-            # Get the schedule for the business and current month
-            schedule = g.schedule_handler.get_schedule_for_month(business_code=code, month=current_month)
+            def etag_for(revision_doc):
+                revision = (revision_doc['_id'], revision_doc.get('revision', 0)) if revision_doc else None
+                return make_etag(business["code"], business["business_name"], year, month, window_start, window_end,
+                                 revision)
+
+            # Answer a revalidation from the schedule revision alone, without loading any shifts
+            cached = not_modified(etag_for(
+                g.schedule_handler.get_schedule_revision(business_code=code, year=year, month=month)))
+            if cached:
+                return cached
+
+            # Get the schedule for the business and month
+            schedule = g.schedule_handler.get_schedule_for_month(business_code=code, year=year, month=month,
+                                                                 window_start=window_start, window_end=window_end)
             schedule_id = None if not schedule else schedule['_id']
 
-            return jsonify({
+            response = jsonify({
                 "message": "success",
                 "business_name": business["business_name"],
                 "business_code": business["code"],
                 "schedule_id": str(schedule_id),
                 "shifts": schedule["shifts"] if schedule else ""
-            }), 200
+            })
+
+            # Tag with the revision read before the shifts, so the tag is never newer than the data
+            return with_etag(response, etag_for(schedule)), 200
         else:
             return jsonify({"message": "failure: business does not exist"}), 400
 
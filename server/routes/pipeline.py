@@ -0,0 +1,238 @@
+import functools
+import time
+
+from flask import current_app, g, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from flask_jwt_extended.exceptions import RevokedTokenError
+
+from handlers.cache_handler import CacheHandler
+from handlers.enums.roles import Role
+
+# Verified tokens remembered per app. A browser session reuses one access token for its whole lifetime
+TOKEN_CACHE_SIZE = 4096
+
+# Python types accepted for each JSON schema type. bool is excluded from the numbers where it is checked
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None)
+}
+
+# Same response as is_authorized, so clients see no difference between the two
+_FORBIDDEN = {'msg': 'You do not have the required role to access this resource'}, 403
+
+
+# How type names read in error messages
+_ARTICLES = {"object": "an object", "array": "an array", "string": "a string", "integer": "an integer",
+             "number": "a number", "boolean": "a boolean", "null": "null"}
+
+_KEYWORDS = {"type", "properties", "required", "items", "minItems", "maxItems", "minLength", "maxLength",
+             "minimum", "maximum", "enum"}
+
+
+def _join(path: str, key) -> str:
+    """ Helper function to build the field path shown in error messages, e.g. shift.start or shift_ids[2] """
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+
+    return f"{path}.{key}" if path else key
+
+
+def _compile(schema: dict, where: str):
+    """
+    Helper function to compile one level of a schema into a list of checks.
+    Each check takes the value and its path, which is only formatted into a message when the check fails.
+    """
+    unsupported = set(schema) - _KEYWORDS
+    if unsupported:
+        raise ValueError(f"Unsupported schema keywords at '{where}': {sorted(unsupported)}")
+
+    checks = []
+
+    if "type" in schema:
+        type_names = [schema["type"]] if isinstance(schema["type"], str) else list(schema["type"])
+        python_types = tuple(t for type_name in type_names for t in
+                             (_TYPES[type_name] if isinstance(_TYPES[type_name], tuple) else (_TYPES[type_name],)))
+        allows_bool = "boolean" in type_names
+        expected = " or ".join(_ARTICLES[type_name] for type_name in type_names)
+
+        def check_type(value, path):
+            # bool is a subclass of int, but true is not a number in JSON
+            if not isinstance(value, python_types) or (isinstance(value, bool) and not allows_bool):
+                return f"{path or 'body'} must be {expected}"
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = tuple(schema["enum"])
+        options = ", ".join(str(option) for option in allowed)
+
+        def check_enum(value, path):
+            if value not in allowed:
+                return f"{path or 'body'} must be one of {options}"
+
+        checks.append(check_enum)
+
+    for keyword, too_short, unit in (("minLength", True, "characters"), ("maxLength", False, "characters"),
+                                     ("minItems", True, "items"), ("maxItems", False, "items")):
+        if keyword in schema:
+            checks.append(_size_check(schema[keyword], too_short, unit))
+
+    if "minimum" in schema or "maximum" in schema:
+        minimum = schema.get("minimum", float("-inf"))
+        maximum = schema.get("maximum", float("inf"))
+
+        def check_range(value, path):
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and not minimum <= value <= maximum:
+                return f"{path or 'body'} must be between {minimum} and {maximum}"
+
+        checks.append(check_range)
+
+    required = tuple(schema.get("required", ()))
+    properties = tuple((key, _compile(sub_schema, _join(where, key)))
+                       for key, sub_schema in schema.get("properties", {}).items())
+
+    if required or properties:
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return None
+
+            for key in required:
+                if key not in value:
+                    return f"{_join(path, key)} is required"
+
+            for key, sub_checks in properties:
+                if key in value:
+                    problem = _run(sub_checks, value[key], _join(path, key))
+                    if problem:
+                        return problem
+
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_checks = _compile(schema["items"], _join(where, 0))
+
+        def check_items(value, path):
+            if not isinstance(value, list):
+                return None
+
+            for index, item in enumerate(value):
+                problem = _run(item_checks, item, _join(path, index))
+                if problem:
+                    return problem
+
+        checks.append(check_items)
+
+    return tuple(checks)
+
+
+def _run(checks: tuple, value, path: str) -> str | None:
+    """ Helper function to apply compiled checks, returning the first problem """
+    for check in checks:
+        problem = check(value, path)
+        if problem:
+            return problem
+
+    return None
+
+
+def _size_check(limit: int, too_short: bool, unit: str):
+    """ Helper function to build a length check for strings or arrays """
+    bound = "at least" if too_short else "at most"
+
+    def check_size(value, path):
+        if isinstance(value, (str, list)) and (len(value) < limit if too_short else len(value) > limit):
+            return f"{path or 'body'} must have {bound} {limit} {unit}"
+
+    return check_size
+
+
+def compile_schema(schema: dict):
+    """
+    Compile a JSON schema into a function that checks a value in one pass and stops at the first problem.
+    Supports the subset the endpoints use: type (a name or a list of names), properties, required,
+    items, minItems, maxItems, minLength, maxLength, minimum, maximum and enum.
+    Unsupported keywords raise ValueError here, so a typo in a schema fails at import time.
+    :return: A function returning the first problem as a message, or None if the value matches.
+    """
+    checks = _compile(schema, "body")
+
+    def validate(value) -> str | None:
+        return _run(checks, value, "")
+
+    return validate
+
+
+def _verified_claims() -> dict:
+    """
+    Helper function to get the claims of the request's JWT, decoding and verifying each token only once.
+    A cached token is only reused before it expires, otherwise it is verified again by verify_jwt_in_request,
+    which raises for missing, invalid and expired tokens. Revocation is checked on every request.
+    """
+    cache = current_app.extensions.get("endpoint_token_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("endpoint_token_cache", CacheHandler(max_size=TOKEN_CACHE_SIZE))
+
+    token = request.headers.get(current_app.config.get("JWT_HEADER_NAME", "Authorization"))
+    claims = cache.get(token) if token else None
+
+    if claims is None or ("exp" in claims and claims["exp"] <= time.time()):
+        verify_jwt_in_request()
+        claims = get_jwt()
+        cache.set(token, claims)
+
+    # Logged out tokens are found here even while they are cached. Answered with 401 by JWTManager
+    revocation_handler = getattr(g, "revocation_handler", None)
+    if revocation_handler is not None and revocation_handler.is_revoked(claims):
+        raise RevokedTokenError({}, claims)
+
+    return claims
+
+
+def endpoint(roles: list[Role] = None, schema: dict = None):
+    """
+    Declare what a view needs before it runs, compiled once when the view is defined.
+    The returned view verifies the JWT and role, then parses and validates the JSON body, and answers
+    401/403/400 itself so a rejected request never reaches a handler or the database.
+    :param roles: Roles allowed to call the view. The view receives the JWT claims as 'claims' and must read
+        the identity from them, get_jwt() is not set up when the token was verified by an earlier request.
+        None leaves the view open to anyone without a token.
+    :param schema: JSON schema of the request body. The view receives the parsed body as 'data'.
+        None means the view does not read a body.
+    """
+    allowed = None if roles is None else frozenset(role.value for role in roles)
+    validate = None if schema is None else compile_schema(schema)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if allowed is not None:
+                # Raises for a missing or invalid token, answered with 401 by JWTManager
+                claims = _verified_claims()
+
+                if claims.get('role') not in allowed:
+                    return _FORBIDDEN
+
+                kwargs['claims'] = claims
+
+            if validate is not None:
+                data = request.get_json(silent=True)
+                problem = "Request body must be JSON" if data is None else validate(data)
+
+                if problem:
+                    return jsonify({"message": problem}), 400
+
+                kwargs['data'] = data
+
+            return view(**kwargs)
+
+        # Kept for inspection, e.g. listing the roles of every route
+        wrapper.roles = allowed
+        wrapper.schema = schema
+        return wrapper
+
+    return decorator
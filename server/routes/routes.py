@@ -2,24 +2,39 @@ from datetime import datetime
 
 import jwt
 from flask import g, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, set_access_cookies
 
 from handlers.account_handler import AccountHandler
 from handlers.activity_handler import ActivityHandler
+from handlers.autoschedule_handler import AutoScheduleHandler
 from handlers.business_handler import BusinessHandler
+from handlers.enums.roles import Role
+from handlers.health_handler import HealthHandler
+from handlers.revocation_handler import RevocationHandler
 from handlers.schedule_handler import ScheduleHandler
+from handlers.timesheet_handler import TimesheetHandler
 
-from routes.account_management import create_user_endpoint, login_endpoint
-from routes.activity_management import upcoming_shift_endpoint, log_activity_endpoint, employee_activities_endpoint
+from routes.account_management import create_user_endpoint, login_endpoint, refresh_endpoint, logout_endpoint
+from routes.autoschedule_management import generate_schedule_endpoint, schedule_job_endpoint, \
+    get_availability_endpoint, set_availability_endpoint
+from routes.activity_management import upcoming_shift_endpoint, log_activity_endpoint, employee_activities_endpoint, \
+    activity_stream_endpoint
 from routes.business_management import create_business_endpoint, link_business_endpoint
+from routes.health_management import live_endpoint, ready_endpoint
 from routes.home_management import populate_home_endpoint
 from routes.schedule_management import new_schedule_endpoint, get_schedules_endpoint, add_shift_endpoint, \
-    delete_shift_endpoint, edit_shift_endpoint, get_posted_shifts_endpoint, take_shift_endpoint, post_shift_endpoint
+    add_shifts_endpoint, delete_shift_endpoint, edit_shift_endpoint, get_posted_shifts_endpoint, take_shift_endpoint, \
+    post_shift_endpoint, post_shifts_endpoint, take_shifts_endpoint, get_schedule_conflicts_endpoint
+from routes.template_management import create_template_endpoint, get_templates_endpoint, \
+    delete_template_endpoint, apply_template_endpoint
+from routes.timesheet_management import manager_timesheet_endpoint, employee_timesheet_endpoint
 
 from routes.business_management import get_all_employees_endpoint
+from routes.pipeline import endpoint
 
 def setup_routes(app, account_handler: AccountHandler, business_handler: BusinessHandler,
-                 schedule_handler: ScheduleHandler, activity_handler: ActivityHandler):
+                 schedule_handler: ScheduleHandler, activity_handler: ActivityHandler,
+                 timesheet_handler: TimesheetHandler = None, autoschedule_handler: AutoScheduleHandler = None,
+                 health_handler: HealthHandler = None, revocation_handler: RevocationHandler = None):
     """ Setup routes and bind to the app """
 
     @app.before_request
@@ -29,20 +44,33 @@ def setup_routes(app, account_handler: AccountHandler, business_handler: Busines
         g.business_handler = business_handler
         g.schedule_handler = schedule_handler
         g.activity_handler = activity_handler
+        g.timesheet_handler = timesheet_handler
+        g.autoschedule_handler = autoschedule_handler
+        g.health_handler = health_handler
+        g.revocation_handler = revocation_handler
 
-    @app.route("/refresh", methods=["POST"])
-    @jwt_required(refresh=True)
-    def refresh():
-        identity = get_jwt_identity()
-        new_access_token = create_access_token(identity=identity)
-        return jsonify({"msg": "token refreshed", "JWT": new_access_token}), 200
-
+    # Kept for older clients, /api/health/live replaces it
     @app.route('/api/ping')
     def ping():
         return jsonify({"status": "ok"}), 200
 
+    app.add_url_rule('/api/health/live', view_func=live_endpoint, methods=['GET'])
+    app.add_url_rule('/api/health/ready', view_func=ready_endpoint, methods=['GET'])
+
+    # Process-wide load and cache figures, not for employees or anonymous callers
+    @app.route('/api/metrics')
+    @endpoint(roles=[Role.MANAGER])
+    def metrics(claims):
+        return jsonify({"password": account_handler.pw_handler.get_metrics(),
+                        "business_cache": business_handler.cache.get_stats(),
+                        "user_cache": schedule_handler.user_cache.get_stats(),
+                        "activity_stream": activity_handler.stream.get_stats(),
+                        "revocation": revocation_handler.get_stats() if revocation_handler else None}), 200
+
     app.add_url_rule('/api/auth/register', view_func=create_user_endpoint, methods=['POST'])
     app.add_url_rule('/api/auth/login', view_func=login_endpoint, methods=['POST'])
+    app.add_url_rule('/api/auth/logout', view_func=logout_endpoint, methods=['POST'])
+    app.add_url_rule('/refresh', view_func=refresh_endpoint, methods=['POST'])
 
     app.add_url_rule('/api/business', view_func=create_business_endpoint, methods=['POST'])
     app.add_url_rule('/api/link_business', view_func=link_business_endpoint, methods=['POST'])
@@ -52,17 +80,35 @@ def setup_routes(app, account_handler: AccountHandler, business_handler: Busines
 
     app.add_url_rule('/api/manager/schedules', view_func=get_schedules_endpoint, methods=['GET'])
     app.add_url_rule('/api/manager/schedules/new', view_func=new_schedule_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/schedules/conflicts', view_func=get_schedule_conflicts_endpoint, methods=['GET'])
     app.add_url_rule('/api/manager/schedules/add_shift', view_func=add_shift_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/schedules/add_shifts', view_func=add_shifts_endpoint, methods=['POST'])
     app.add_url_rule('/api/manager/schedules/delete_shift', view_func=delete_shift_endpoint, methods=['POST'])
     app.add_url_rule('/api/manager/schedules/edit_shift', view_func=edit_shift_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/schedules/generate', view_func=generate_schedule_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/schedules/generate', view_func=schedule_job_endpoint, methods=['GET'])
+
+    app.add_url_rule('/api/manager/templates', view_func=get_templates_endpoint, methods=['GET'])
+    app.add_url_rule('/api/manager/templates/new', view_func=create_template_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/templates/delete', view_func=delete_template_endpoint, methods=['POST'])
+    app.add_url_rule('/api/manager/templates/apply', view_func=apply_template_endpoint, methods=['POST'])
 
     app.add_url_rule('/api/employee/shifts', view_func=get_posted_shifts_endpoint, methods=['GET'])
     app.add_url_rule('/api/employee/post_shift', view_func=post_shift_endpoint, methods=['POST'])
     app.add_url_rule('/api/employee/take_shift', view_func=take_shift_endpoint, methods=['POST'])
+    app.add_url_rule('/api/employee/post_shifts', view_func=post_shifts_endpoint, methods=['POST'])
+    app.add_url_rule('/api/employee/take_shifts', view_func=take_shifts_endpoint, methods=['POST'])
+
+    app.add_url_rule('/api/employee/availability', view_func=get_availability_endpoint, methods=['GET'])
+    app.add_url_rule('/api/employee/availability', view_func=set_availability_endpoint, methods=['POST'])
 
     app.add_url_rule('/api/employee/next_shift', view_func=upcoming_shift_endpoint, methods=['GET'])
     app.add_url_rule('/api/employee/log_activity', view_func=log_activity_endpoint, methods=['POST'])
     app.add_url_rule('/api/manager/activity', view_func=employee_activities_endpoint, methods=['GET'])
+    app.add_url_rule('/api/manager/activity/stream', view_func=activity_stream_endpoint, methods=['GET'])
+
+    app.add_url_rule('/api/manager/timesheet', view_func=manager_timesheet_endpoint, methods=['GET'])
+    app.add_url_rule('/api/employee/timesheet', view_func=employee_timesheet_endpoint, methods=['GET'])
 
 
 
@@ -1,37 +1,58 @@
 from flask import request, jsonify, g
-from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
 
 from handlers.enums.roles import Role
-from handlers.validation_handler import is_authorized
+from handlers.exceptions.exceptions import ShiftConflictError
+from routes.conditional import make_etag, not_modified, with_etag
+from routes.pipeline import endpoint
+from routes.streaming import wants_ndjson, ndjson_response
 from tools import jsonify_keys
 
-
-
-
-
-def new_schedule_endpoint():
+# Most shifts accepted by one bulk request
+MAX_BULK_SHIFTS = 500
+
+# Most shifts posted or taken by one bulk request
+MAX_BULK_SHIFT_IDS = 100
+
+# Request bodies, compiled once by @endpoint
+SHIFT_SCHEMA = {
+    "type": "object",
+    "required": ["schedule_id", "shift"],
+    "properties": {"schedule_id": {"type": "string"}, "shift": {"type": "object"}}
+}
+
+SHIFT_ID_SCHEMA = {
+    "type": "object",
+    "required": ["shift_id"],
+    "properties": {"shift_id": {"type": "string"}}
+}
+
+BULK_SHIFT_IDS_SCHEMA = {
+    "type": "object",
+    "required": ["shift_ids"],
+    "properties": {
+        "shift_ids": {"type": "array", "minItems": 1, "maxItems": MAX_BULK_SHIFT_IDS, "items": {"type": "string"}}
+    }
+}
+
+
+@endpoint(roles=[Role.MANAGER], schema={
+    "type": "object",
+    "required": ["year", "month"],
+    "properties": {"year": {"type": ["integer", "string"]}, "month": {"type": ["integer", "string"]}}
+})
+def new_schedule_endpoint(claims, data):
     """ Endpoint to create a new schedule """
-    data = request.get_json()
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
-
-    if not data or 'year' not in data or 'month' not in data:
-        return jsonify({"message": "Business code is required"}), 400
-
     business_code = claims['code']
     user_id = claims['user_id']
 
-    year = data['year']
-    month = data['month']
+    try:
+        year = int(data['year'])
+        month = int(data['month'])
+    except (TypeError, ValueError):
+        return jsonify({"message": "year and month must be numbers"}), 400
+
+    if not 1 <= month <= 12:
+        return jsonify({"message": "month must be between 1 and 12"}), 400
 
     if g.schedule_handler.new_schedule(year, month, business_code, user_id):
 
@@ -41,52 +62,54 @@ def new_schedule_endpoint():
         return jsonify({"message": "failure"}), 400
 
 
-def get_schedules_endpoint():
+@endpoint(roles=[Role.MANAGER])
+def get_schedules_endpoint(claims):
     """ Endpoint to get all schedules in a business """
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
-
     business_code = claims['code']
 
     try:
+        # Opt-in streaming for businesses with many schedules
+        if wants_ndjson():
+            return ndjson_response(g.schedule_handler.iter_schedules(business_code), keys_to_convert=['_id'])
+
+        # Answer a revalidation from the schedule ids and revisions alone
+        etag = make_etag(business_code, *((s['_id'], s.get('revision', 0))
+                                          for s in g.schedule_handler.get_schedule_revisions(business_code)))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
         schedules = g.schedule_handler.get_schedules(business_code)
         schedules = jsonify_keys(original=schedules, keys_to_convert=['_id'])
-        return jsonify({"schedules": schedules, "message": "success"}), 200
+        return with_etag(jsonify({"schedules": schedules, "message": "success"}), etag), 200
 
     except Exception as e:
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
 
 
-def add_shift_endpoint():
-    """ Endpoint to add a shift to a schedule """
-    # data = request.get_json()
-    data = request.get_json(silent=False, force=True)
-    print(data)
-
-    # JWT check
-    verify_jwt_in_request()
+@endpoint(roles=[Role.MANAGER])
+def get_schedule_conflicts_endpoint(claims):
+    """ Endpoint to list the overlapping shifts of each employee in a schedule """
+    schedule_id = request.args.get('schedule_id')
+    if not schedule_id:
+        return jsonify({"message": "Schedule ID is required"}), 400
 
-    # Get the claims from the JWT token
-    claims = get_jwt()
+    try:
+        conflicts = g.schedule_handler.get_schedule_conflicts(schedule_id=schedule_id, business_code=claims['code'])
+        if conflicts is None:
+            return jsonify({"message": "Schedule not found"}), 404
 
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
+        return jsonify({"message": "success", "conflicts": conflicts}), 200
 
-    if not data or 'schedule_id' not in data or 'shift' not in data:
-        return jsonify({"message": "Schedule ID and shift object are required"}), 400
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
 
 
+@endpoint(roles=[Role.MANAGER], schema=SHIFT_SCHEMA)
+def add_shift_endpoint(claims, data):
+    """ Endpoint to add a shift to a schedule """
     schedule_id = data['schedule_id']
     shift = data['shift']
 
@@ -94,6 +117,9 @@ def add_shift_endpoint():
         if g.schedule_handler.add_shift(schedule_id=schedule_id, shift=shift):
             return jsonify({"message": "success"}), 200
 
+    except ShiftConflictError as e:
+        return jsonify({"message": e.message}), 409
+
     except Exception as e:
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
@@ -101,24 +127,39 @@ def add_shift_endpoint():
     return jsonify({"message": "failure"}), 400
 
 
-def delete_shift_endpoint():
-    """ Endpoint to add a shift to a schedule """
-    data = request.get_json()
+@endpoint(roles=[Role.MANAGER], schema={
+    "type": "object",
+    "required": ["schedule_id", "shifts"],
+    "properties": {
+        "schedule_id": {"type": "string"},
+        "shifts": {"type": "array", "minItems": 1, "maxItems": MAX_BULK_SHIFTS, "items": {"type": "object"}}
+    }
+})
+def add_shifts_endpoint(claims, data):
+    """ Endpoint to add many shifts to a schedule in one request """
+    try:
+        results = g.schedule_handler.add_shifts(schedule_id=data['schedule_id'], shifts=data['shifts'],
+                                                business_code=claims['code'])
 
-    # JWT check
-    verify_jwt_in_request()
+        if results is None:
+            return jsonify({"message": "failure: schedule does not exist"}), 400
 
-    # Get the claims from the JWT token
-    claims = get_jwt()
+        added = sum(result["success"] for result in results)
+        return jsonify({"message": "success", "added": added, "failed": len(results) - added,
+                        "results": results}), 200
 
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
 
-    if not data or 'schedule_id' not in data or 'shift_id' not in data:
-        return jsonify({"message": "Schedule ID and Shift ID are required"}), 400
 
+@endpoint(roles=[Role.MANAGER], schema={
+    "type": "object",
+    "required": ["schedule_id", "shift_id"],
+    "properties": {"schedule_id": {"type": "string"}, "shift_id": {"type": "string"}}
+})
+def delete_shift_endpoint(claims, data):
+    """ Endpoint to delete a shift from a schedule """
     schedule_id = data['schedule_id']
     shift_id = data['shift_id']
 
@@ -133,24 +174,9 @@ def delete_shift_endpoint():
     return jsonify({"message": "failure"}), 400
 
 
-def edit_shift_endpoint():
-    """ Endpoint to add a shift to a schedule """
-    data = request.get_json()
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check
-    auth_check = is_authorized(claims, [Role.MANAGER])
-    if auth_check:
-        return auth_check
-
-    if not data or 'schedule_id' not in data or 'shift' not in data:
-        return jsonify({"message": "Schedule ID and shift object are required"}), 400
-
+@endpoint(roles=[Role.MANAGER], schema=SHIFT_SCHEMA)
+def edit_shift_endpoint(claims, data):
+    """ Endpoint to edit a shift of a schedule """
     schedule_id = data['schedule_id']
     shift = data['shift']
 
@@ -158,6 +184,9 @@ def edit_shift_endpoint():
         if g.schedule_handler.edit_shift(schedule_id=schedule_id, shift=shift):
             return jsonify({"message": "success"}), 200
 
+    except ShiftConflictError as e:
+        return jsonify({"message": e.message}), 409
+
     except Exception as e:
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
@@ -165,23 +194,9 @@ def edit_shift_endpoint():
     return jsonify({"message": "failure"}), 400
 
 
-def post_shift_endpoint():
-    data = request.get_json()
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check, only for employees that post shifts
-    auth_check = is_authorized(claims, [Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
-
-    if not data or 'shift_id' not in data:
-        return jsonify({"message": "Shift id is required"}), 400
-
+@endpoint(roles=[Role.EMPLOYEE], schema=SHIFT_ID_SCHEMA)
+def post_shift_endpoint(claims, data):
+    """ Endpoint for an employee to post a shift for others to take """
     shift_id = data['shift_id']
 
     try:
@@ -194,51 +209,40 @@ def post_shift_endpoint():
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
 
-def get_posted_shifts_endpoint():
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from the JWT token
-    claims = get_jwt()
-
-    # Role enforcement check where employee and employees can see shifts
-    auth_check = is_authorized(claims, [Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
-
+@endpoint(roles=[Role.EMPLOYEE])
+def get_posted_shifts_endpoint(claims):
     # Get business_code from the JWT token
     business_code = claims['code']
 
+    # Optional pagination
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', default=0, type=int)
+
+    if (limit is not None and limit < 1) or offset < 0:
+        return jsonify({"message": "limit must be positive and offset cannot be negative"}), 400
+
     try:
-        posted_shifts = g.schedule_handler.get_posted_shifts(business_code)
+        # Ask for one extra shift to know whether another page exists
+        posted_shifts = g.schedule_handler.get_posted_shifts(business_code,
+                                                             limit=None if limit is None else limit + 1,
+                                                             offset=offset)
+        has_more = limit is not None and len(posted_shifts) > limit
+        posted_shifts = posted_shifts[:limit]
+
         # Convert ObjectIds to strings
         posted_shifts = jsonify_keys(original=posted_shifts, keys_to_convert=['_id'])
-        return jsonify({"posted_shifts": posted_shifts, "message":"success"}), 200
+        return jsonify({"posted_shifts": posted_shifts, "has_more": has_more, "message": "success"}), 200
 
     except Exception as e:
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
 
-def take_shift_endpoint():
-    data = request.get_json()
-
-    # JWT check
-    verify_jwt_in_request()
-
-    # Get the claims from JWT token
-    claims = get_jwt()
-
-    # Role enforcement check, employees can take shifts
-    auth_check = is_authorized(claims, [Role.EMPLOYEE])
-    if auth_check:
-        return auth_check
-
+@endpoint(roles=[Role.EMPLOYEE], schema=SHIFT_ID_SCHEMA)
+def take_shift_endpoint(claims, data):
+    """ Endpoint for an employee to take a posted shift """
     # get user_id from the JWT claims
     user_id = claims['user_id']
 
-    if not data or 'shift_id' not in data:
-        return jsonify({"message": "Shift id is required"}), 400
-
     shift_id = data['shift_id']
 
     try:
@@ -247,10 +251,47 @@ def take_shift_endpoint():
         else:
             return jsonify({"message": "Shift not found"}), 404
 
+    except ShiftConflictError as e:
+        return jsonify({"message": e.message}), 409
+
     except Exception as e:
         msg = f"failure: {e}"
         return jsonify({"message": msg}), 400
 
 
+def _bulk_shift_response(results):
+    """ Helper function to build the response of a bulk post/take request """
+    succeeded = sum(result["success"] for result in results)
+    return jsonify({"message": "success", "succeeded": succeeded, "failed": len(results) - succeeded,
+                    "results": results}), 200
+
+
+@endpoint(roles=[Role.EMPLOYEE], schema=BULK_SHIFT_IDS_SCHEMA)
+def post_shifts_endpoint(claims, data):
+    """ Endpoint to post many of the employee's shifts in one request """
+    try:
+        results = g.schedule_handler.post_shifts(shift_ids=data['shift_ids'], user_id=claims['user_id'],
+                                                 business_code=claims['code'])
+        return _bulk_shift_response(results)
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
 
 
+@endpoint(roles=[Role.EMPLOYEE], schema=BULK_SHIFT_IDS_SCHEMA)
+def take_shifts_endpoint(claims, data):
+    """ Endpoint to take many posted shifts in one request """
+    try:
+        results = g.schedule_handler.take_shifts(shift_ids=data['shift_ids'], user_id=claims['user_id'],
+                                                 business_code=claims['code'])
+
+        if results is None:
+            return jsonify({"message": "failure: user does not exist"}), 400
+
+        return _bulk_shift_response(results)
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
+
@@ -0,0 +1,88 @@
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+
+from tools import jsonify_keys
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+SSE_MIMETYPE = "text/event-stream"
+
+# Milliseconds an EventSource waits before reconnecting
+SSE_RETRY_MS = 3000
+
+# Documents serialized per chunk written to the socket
+CHUNK_SIZE = 100
+
+
+def wants_ndjson() -> bool:
+    """
+    Check whether the client opted into a streamed NDJSON response (Accept header or ?stream=ndjson).
+    NDJSON has to be listed by name, wildcards such as */* (sent by fetch and browsers) get plain JSON.
+    """
+    if request.args.get("stream", "").lower() in ("1", "true", "ndjson"):
+        return True
+
+    return any(mimetype == NDJSON_MIMETYPE and quality > 0 for mimetype, quality in request.accept_mimetypes)
+
+
+def ndjson_response(documents, keys_to_convert: list[str] = None) -> Response:
+    """
+    Stream documents as newline delimited JSON, one document per line.
+    Documents are pulled from the iterable (e.g. a pymongo cursor) as the client reads,
+    so only one chunk is held in memory at a time.
+    :param documents: Iterable of dicts to stream.
+    :param keys_to_convert: Keys converted to strings on each document, as with jsonify_keys.
+    """
+    keys_to_convert = keys_to_convert or []
+    dumps = current_app.json.dumps
+
+    def generate():
+        iterator = iter(documents)
+
+        while True:
+            chunk = list(islice(iterator, CHUNK_SIZE))
+            if not chunk:
+                break
+
+            yield "".join(dumps(jsonify_keys(original=doc, keys_to_convert=keys_to_convert)) + "\n" for doc in chunk)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def sse_response(events, event_name: str, keys_to_convert: list[str] = None) -> Response:
+    """
+    Stream events as Server-Sent Events.
+    Each event carries its id, so a reconnecting client can send it back as Last-Event-ID.
+    :param events: Iterable of (event id, payload dict) pairs, with None for a heartbeat. Closed when the client leaves.
+    :param event_name: Event type the payloads are sent as.
+    :param keys_to_convert: Keys converted to strings on each payload, as with jsonify_keys.
+    """
+    keys_to_convert = keys_to_convert or []
+    dumps = current_app.json.dumps
+
+    def generate():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+
+            for item in events:
+                if item is None:
+                    # A comment line, ignored by clients, keeps idle connections and proxies open
+                    yield ": heartbeat\n\n"
+                    continue
+
+                event_id, payload = item
+                data = dumps(jsonify_keys(original=payload, keys_to_convert=keys_to_convert))
+                yield f"id: {event_id}\nevent: {event_name}\ndata: {data}\n\n"
+
+        finally:
+            # Let the event source clean up, e.g. drop its subscription
+            close = getattr(events, "close", None)
+            if close:
+                close()
+
+    response = Response(stream_with_context(generate()), mimetype=SSE_MIMETYPE)
+    response.headers["Cache-Control"] = "no-cache"
+
+    # Stop reverse proxies such as nginx from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,93 @@
+from flask import jsonify, g
+
+from handlers.enums.roles import Role
+from routes.pipeline import endpoint
+from tools import jsonify_keys
+
+# Slots are checked in depth by ScheduleHandler
+CREATE_TEMPLATE_SCHEMA = {
+    "type": "object",
+    "required": ["name", "slots"],
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "slots": {"type": "array", "minItems": 1, "items": {"type": "object"}},
+        "timezone": {"type": "string"}
+    }
+}
+
+DELETE_TEMPLATE_SCHEMA = {
+    "type": "object",
+    "required": ["template_id"],
+    "properties": {"template_id": {"type": "string"}}
+}
+
+APPLY_TEMPLATE_SCHEMA = {
+    "type": "object",
+    "required": ["template_id", "schedule_id"],
+    "properties": {"template_id": {"type": "string"}, "schedule_id": {"type": "string"}}
+}
+
+
+@endpoint(roles=[Role.MANAGER], schema=CREATE_TEMPLATE_SCHEMA)
+def create_template_endpoint(claims, data):
+    """ Endpoint to save a weekly shift template for the manager's business """
+    try:
+        template_id = g.schedule_handler.create_template(business_code=claims['code'], name=data['name'],
+                                                         slots=data['slots'], user_id=claims['user_id'],
+                                                         timezone=data.get('timezone', 'UTC'))
+        return jsonify({"message": "success", "template_id": template_id}), 200
+
+    except ValueError as e:
+        # Invalid slot or time zone
+        return jsonify({"message": str(e)}), 400
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
+
+
+@endpoint(roles=[Role.MANAGER])
+def get_templates_endpoint(claims):
+    """ Endpoint to get the shift templates of the manager's business """
+    try:
+        templates = g.schedule_handler.get_templates(business_code=claims['code'])
+        templates = jsonify_keys(original=templates, keys_to_convert=['_id'])
+        return jsonify({"message": "success", "templates": templates}), 200
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
+
+
+@endpoint(roles=[Role.MANAGER], schema=DELETE_TEMPLATE_SCHEMA)
+def delete_template_endpoint(claims, data):
+    """ Endpoint to delete a shift template """
+    if g.schedule_handler.delete_template(business_code=claims['code'], template_id=data['template_id']):
+        return jsonify({"message": "success"}), 200
+
+    return jsonify({"message": "Template not found"}), 404
+
+
+@endpoint(roles=[Role.MANAGER], schema=APPLY_TEMPLATE_SCHEMA)
+def apply_template_endpoint(claims, data):
+    """ Endpoint to fill a schedule's month with the shifts of a weekly template """
+    business = g.business_handler.get_business_from_code(code=claims['code'])
+    if not business:
+        return jsonify({"message": "failure: business does not exist"}), 400
+
+    try:
+        result = g.schedule_handler.apply_template(template_id=data['template_id'], schedule_id=data['schedule_id'],
+                                                   business_code=business['code'], hours=business.get('hours'))
+
+        if result is None:
+            return jsonify({"message": "Template or schedule not found"}), 404
+
+        return jsonify({"message": "success", **result}), 200
+
+    except ValueError as e:
+        # Already applied
+        return jsonify({"message": str(e)}), 400
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from flask import request, jsonify, g
+
+from handlers.enums.roles import Role
+from routes.pipeline import endpoint
+from tools import parse_utc, to_utc_iso
+
+
+def _timesheet_range():
+    """ Helper function to read the from/to range of a timesheet request, defaulting to the current month """
+    month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    if month_start.month == 12:
+        next_month = month_start.replace(year=month_start.year + 1, month=1)
+    else:
+        next_month = month_start.replace(month=month_start.month + 1)
+
+    start = parse_utc(request.args["from"]) if "from" in request.args else month_start
+    end = parse_utc(request.args["to"]) if "to" in request.args else next_month
+
+    return start, end
+
+
+def _timesheet_response(business_code: str, employee_id: str = None):
+    """ Helper function to build the timesheet response shared by the manager and employee endpoints """
+    try:
+        start, end = _timesheet_range()
+        timesheet = g.timesheet_handler.get_timesheet(business_code=business_code, start=start, end=end,
+                                                      employee_id=employee_id)
+
+        return jsonify({"message": "success", "from": to_utc_iso(start), "to": to_utc_iso(end), **timesheet}), 200
+
+    except ValueError as e:
+        # Malformed or too long range
+        return jsonify({"message": str(e)}), 400
+
+    except Exception as e:
+        msg = f"failure: {e}"
+        return jsonify({"message": msg}), 400
+
+
+@endpoint(roles=[Role.MANAGER])
+def manager_timesheet_endpoint(claims):
+    """ Endpoint to get the hours of every employee in a business, or one with ?employee_id """
+    return _timesheet_response(business_code=claims["code"], employee_id=request.args.get("employee_id"))
+
+
+@endpoint(roles=[Role.EMPLOYEE, Role.MANAGER])
+def employee_timesheet_endpoint(claims):
+    """ Endpoint to get the hours of the logged in employee """
+    return _timesheet_response(business_code=claims["code"], employee_id=claims["user_id"])
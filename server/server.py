@@ -1,3 +1,4 @@
+import time
 from datetime import timedelta, datetime, timezone
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager, get_jwt, create_access_token, get_jwt_identity, set_access_cookies
@@ -6,22 +7,68 @@ from flask_cors import CORS
 from configurations.config_manager import ConfigurationManager
 from handlers.account_handler import AccountHandler
 from handlers.activity_handler import ActivityHandler
+from handlers.activity_stream_handler import ActivityStreamHandler
+from handlers.autoschedule_handler import AutoScheduleHandler
 from handlers.business_handler import BusinessHandler
+from handlers.cache_handler import CacheHandler
 from handlers.db_handler import DatabaseHandler
+from handlers.health_handler import HealthHandler
 from handlers.password_handler import PasswordHandler
+from handlers.revocation_handler import RevocationHandler
 from handlers.schedule_handler import ScheduleHandler
+from handlers.schema_handler import SchemaHandler
+from handlers.timesheet_handler import TimesheetHandler
 from routes.routes import setup_routes
 
 
+# Token lifetimes. Revocations are kept until the longest lived token issued before them has expired
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+
 class Server:
     def __init__(self, config: ConfigurationManager):
+        started = time.perf_counter()
+
         # Create instances of classes and the Flask app
         self.db_handler = DatabaseHandler(config.MONGO_URI)
-        self.pw_handler = PasswordHandler()
+        self.pw_handler = PasswordHandler(rounds=config.PASSWORD_ROUNDS, max_workers=config.PASSWORD_WORKERS,
+                                          max_queue=config.PASSWORD_QUEUE_SIZE)
         self.acct_handler = AccountHandler(db_handler=self.db_handler, pw_handler=self.pw_handler)
-        self.business_handler = BusinessHandler(db_handler=self.db_handler)
-        self.schedule_handler = ScheduleHandler(db_handler=self.db_handler)
-        self.activity_handler = ActivityHandler(db_handler=self.db_handler)
+        # User summaries are read by the schedule handler and invalidated by the business handler
+        self.user_cache = CacheHandler(max_size=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+        self.business_handler = BusinessHandler(db_handler=self.db_handler,
+                                                cache=CacheHandler(max_size=config.BUSINESS_CACHE_SIZE,
+                                                                   ttl=config.BUSINESS_CACHE_TTL),
+                                                user_cache=self.user_cache)
+        self.schedule_handler = ScheduleHandler(db_handler=self.db_handler, user_cache=self.user_cache)
+        self.activity_stream = ActivityStreamHandler(db_handler=self.db_handler)
+        self.activity_handler = ActivityHandler(db_handler=self.db_handler, stream=self.activity_stream)
+        self.timesheet_handler = TimesheetHandler(db_handler=self.db_handler)
+        self.autoschedule_handler = AutoScheduleHandler(db_handler=self.db_handler,
+                                                        max_workers=config.AUTOSCHEDULE_WORKERS,
+                                                        time_limit=config.AUTOSCHEDULE_TIME_LIMIT)
+        self.revocation_handler = RevocationHandler(db_handler=self.db_handler,
+                                                    max_token_lifetime=REFRESH_TOKEN_EXPIRES.total_seconds(),
+                                                    sync_interval=config.REVOCATION_SYNC_INTERVAL)
+
+        # Create collections, indexes and run data migrations - only when the stored schema version is behind
+        self.schema_handler = SchemaHandler(db_handler=self.db_handler)
+        self.schema_handler.register_migration(1, self.schedule_handler.migrate_embedded_shifts)
+        self.schema_handler.register_migration(2, self.schedule_handler.merge_duplicate_schedules)
+        self.schema_handler.register_migration(3, self.activity_handler.migrate_activity_storage)
+        bootstrapped = self.schema_handler.bootstrap()
+
+        # Follow activity inserts from every worker where change streams are available
+        self.activity_stream.start()
+
+        # Readiness checks answer from this probe's last result instead of querying the database
+        self.health_handler = HealthHandler(db_handler=self.db_handler, interval=config.HEALTH_PROBE_INTERVAL)
+        self.health_handler.start()
+
+        # Load the revocations of earlier runs and other workers, then follow new ones
+        self.revocation_handler.start()
 
         self.app = Flask(__name__)
 
@@ -33,7 +80,8 @@ class Server:
 
         # Assign config variables
         self.app.config['JWT_SECRET_KEY'] = config.JWT_SECRET_KEY
-        self.app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=15)
+        self.app.config['JWT_ACCESS_TOKEN_EXPIRES'] = ACCESS_TOKEN_EXPIRES
+        self.app.config['JWT_REFRESH_TOKEN_EXPIRES'] = REFRESH_TOKEN_EXPIRES
         self.app.config["JWT_TOKEN_LOCATION"] = ["headers"]
         self.app.config["JWT_HEADER_NAME"] = "Authorization"
         self.app.config["JWT_HEADER_TYPE"] = "Bearer"
@@ -41,7 +89,12 @@ class Server:
         self.port = config.SERVER_PORT
 
         # Set up all the API routes with the account handlers
-        setup_routes(self.app, self.acct_handler, self.business_handler, self.schedule_handler, self.activity_handler)
+        setup_routes(self.app, self.acct_handler, self.business_handler, self.schedule_handler, self.activity_handler,
+                     self.timesheet_handler, self.autoschedule_handler, self.health_handler, self.revocation_handler)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        schema_status = "schema bootstrapped" if bootstrapped else "schema up to date"
+        print(f"Server initialized in {elapsed_ms:.0f} ms ({schema_status}).")
 
     def run(self, debug: bool = False):
         # Start the Flask server with the specified host and port
@@ -0,0 +1,369 @@
+"""Integration Tests for ActivityHandler. Test shift lookups and clock in/out"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+from pymongo import errors
+
+from handlers.activity_handler import ActivityHandler
+from handlers.index_registry import reconcile_indexes
+from tools import encode_cursor
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.database = self.client['test_db']
+
+
+@pytest.fixture
+def activity_handler():
+    """Create a mock activity handler"""
+    db_handler = MockDatabaseHandler()
+    handler = ActivityHandler(db_handler)
+
+    handler.shifts.delete_many({})
+    handler.schedules.delete_many({})
+    handler.activity.delete_many({})
+    return handler
+
+
+def iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def insert_shift(handler, start: datetime, employee_id="emp1", schedule_id=None, **fields):
+    shift = {
+        "_id": str(ObjectId()),
+        "schedule_id": schedule_id or str(ObjectId()),
+        "business_code": "BIZ123",
+        "employee_id": employee_id,
+        "employee_name": "Jane Doe",
+        "start": iso(start),
+        "end": iso(start + timedelta(hours=8)),
+        "posted": False,
+        "clocked_in": False,
+        "completed": False,
+        **fields
+    }
+    handler.shifts.insert_one(shift)
+    return shift
+
+
+class TestUpcomingShift:
+    """Tests for ActivityHandler.get_upcoming_shift"""
+
+    def test_soonest_shift_across_schedules(self, activity_handler):
+        """Test that the soonest shift is found even when it is in another schedule"""
+        now = datetime.now(timezone.utc)
+        insert_shift(activity_handler, now + timedelta(days=20), schedule_id="sched1")
+        sooner = insert_shift(activity_handler, now + timedelta(days=2), schedule_id="sched2")
+
+        shift = activity_handler.get_upcoming_shift(user_id="emp1", business_code="BIZ123")
+        assert shift["_id"] == sooner["_id"]
+
+    def test_skips_past_completed_and_other_employees(self, activity_handler):
+        """Test that only the employee's open future shifts are considered"""
+        now = datetime.now(timezone.utc)
+        insert_shift(activity_handler, now - timedelta(days=1))
+        insert_shift(activity_handler, now + timedelta(days=1), completed=True)
+        insert_shift(activity_handler, now + timedelta(days=1), employee_id="emp2")
+        expected = insert_shift(activity_handler, now + timedelta(days=3))
+
+        shift = activity_handler.get_upcoming_shift(user_id="emp1", business_code="BIZ123")
+        assert shift["_id"] == expected["_id"]
+
+    def test_no_upcoming_shift(self, activity_handler):
+        """Test that False is returned when nothing is scheduled"""
+        assert activity_handler.get_upcoming_shift(user_id="emp1", business_code="BIZ123") is False
+
+
+class TestLogActivity:
+    """Tests for ActivityHandler.log_activity"""
+
+    def test_clock_in_within_window(self, activity_handler):
+        """Test clocking in close to the shift start"""
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc) + timedelta(minutes=10))
+
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=True) is True
+
+        stored = activity_handler.shifts.find_one({"_id": shift["_id"]})
+        assert stored["clocked_in"] is True
+        assert "clocked_in_at" in stored
+
+        activity = activity_handler.activity.find_one({"shift_id": shift["_id"]})
+        assert activity["clock_in"] is True
+        assert activity["employee_name"] == "Jane Doe"
+        assert activity["meta"] == {"business_code": "BIZ123", "employee_id": "emp1"}
+        assert isinstance(activity["timestamp"], datetime)
+
+    def test_duplicate_clock_in_rejected(self, activity_handler):
+        """Test that the same punch submitted twice is only recorded once"""
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc))
+
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=True) is True
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=True) is False
+        assert activity_handler.activity.count_documents({"shift_id": shift["_id"]}) == 1
+
+    def test_clock_in_outside_window(self, activity_handler):
+        """Test that clocking in far from the shift start fails"""
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc) + timedelta(hours=2))
+
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=True) is False
+        assert activity_handler.activity.count_documents({}) == 0
+
+    def test_clock_out_after_clock_in(self, activity_handler):
+        """Test clocking out of a shift that was clocked in"""
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc) - timedelta(hours=8), clocked_in=True)
+
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=False) is True
+
+        stored = activity_handler.shifts.find_one({"_id": shift["_id"]})
+        assert stored["completed"] is True
+        assert stored["clocked_in"] is False
+
+    def test_clock_out_without_clock_in(self, activity_handler):
+        """Test that a shift that was never clocked in cannot be clocked out"""
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc) - timedelta(hours=8))
+
+        assert activity_handler.log_activity(shift_id=shift["_id"], clock_in=False) is False
+
+    def test_punch_bumps_schedule_revision(self, activity_handler):
+        """Test that clocking in and out marks the shift's schedule as changed"""
+        schedule_id = activity_handler.schedules.insert_one({"business_code": "BIZ123", "revision": 0}).inserted_id
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc), schedule_id=str(schedule_id))
+
+        activity_handler.log_activity(shift_id=shift["_id"], clock_in=True)
+        activity_handler.log_activity(shift_id=shift["_id"], clock_in=True)
+
+        assert activity_handler.schedules.find_one({"_id": schedule_id})["revision"] == 1
+
+    def test_unknown_shift(self, activity_handler):
+        """Test punching a shift that does not exist"""
+        assert activity_handler.log_activity(shift_id=str(ObjectId()), clock_in=True) is False
+
+
+class TestEmployeeActivities:
+    """Tests for ActivityHandler.get_employee_activities"""
+
+    @pytest.fixture
+    def activities(self, activity_handler):
+        """Insert ten activities, alternating employees and clock direction, one minute apart"""
+        base = datetime(2099, 1, 1, tzinfo=timezone.utc)
+        docs = [{
+            "shift_id": f"shift{i // 2}",
+            "meta": {"business_code": "BIZ123", "employee_id": f"emp{i % 2}"},
+            "employee_name": "Jane Doe",
+            "clock_in": i % 2 == 0,
+            "timestamp": base + timedelta(minutes=i)
+        } for i in range(10)]
+        activity_handler.activity.insert_many(docs)
+        return docs
+
+    def test_pages_cover_everything_newest_first(self, activity_handler, activities):
+        """Test that following next_cursor walks every activity once, newest first"""
+        seen = []
+        cursor = None
+
+        while True:
+            page, cursor = activity_handler.get_employee_activities("BIZ123", limit=3, cursor=cursor)
+            seen.extend(a["timestamp"] for a in page)
+            if cursor is None:
+                break
+
+        assert seen == sorted((iso(a["timestamp"]) for a in activities), reverse=True)
+
+    def test_filters(self, activity_handler, activities):
+        """Test the employee, direction and date range filters"""
+        page, _ = activity_handler.get_employee_activities("BIZ123", employee_id="emp1")
+        assert {a["employee_id"] for a in page} == {"emp1"}
+
+        page, _ = activity_handler.get_employee_activities("BIZ123", clock_in=False)
+        assert len(page) == 5 and not any(a["clock_in"] for a in page)
+
+        page, _ = activity_handler.get_employee_activities("BIZ123", shift_id="shift2")
+        assert len(page) == 2
+
+        page, _ = activity_handler.get_employee_activities("BIZ123", start=activities[2]["timestamp"],
+                                                           end=activities[5]["timestamp"])
+        assert [a["timestamp"] for a in page] == [iso(activities[i]["timestamp"]) for i in (4, 3, 2)]
+
+    def test_response_shape(self, activity_handler, activities):
+        """Test that activities are returned flat with ISO timestamps, as before the storage change"""
+        page, _ = activity_handler.get_employee_activities("BIZ123", limit=1)
+
+        assert "meta" not in page[0]
+        assert page[0]["business_code"] == "BIZ123"
+        assert page[0]["employee_id"] == "emp1"
+        assert page[0]["timestamp"] == "2099-01-01T00:09:00.000Z"
+
+    def test_invalid_cursor(self, activity_handler):
+        """Test that a malformed cursor is rejected"""
+        with pytest.raises(ValueError):
+            activity_handler.get_employee_activities("BIZ123", cursor="not-a-cursor")
+
+
+class TestActivityStream:
+    """Tests for ActivityHandler.stream_activities"""
+
+    @pytest.fixture
+    def stored(self, activity_handler):
+        """Insert five activities, one minute apart"""
+        base = datetime(2099, 1, 1, tzinfo=timezone.utc)
+        docs = [{"shift_id": f"shift{i}", "meta": {"business_code": "BIZ123", "employee_id": "emp1"},
+                 "employee_name": "Jane Doe", "clock_in": True, "timestamp": base + timedelta(minutes=i)}
+                for i in range(5)]
+        activity_handler.activity.insert_many(docs)
+        return docs
+
+    def test_live_punch(self, activity_handler):
+        """Test that a punch recorded after subscribing is pushed to the stream"""
+        stream = activity_handler.stream_activities("BIZ123", heartbeat=0.01)
+        assert next(stream) is None
+
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc))
+        activity_handler.log_activity(shift_id=shift["_id"], clock_in=True)
+
+        event_id, activity = next(stream)
+        assert activity["shift_id"] == shift["_id"]
+        assert activity["business_code"] == "BIZ123"
+        assert event_id
+        stream.close()
+
+    def test_other_business_not_pushed(self, activity_handler):
+        """Test that a stream only carries its own business's activities"""
+        stream = activity_handler.stream_activities("OTHER", heartbeat=0.01)
+        next(stream)
+
+        shift = insert_shift(activity_handler, datetime.now(timezone.utc))
+        activity_handler.log_activity(shift_id=shift["_id"], clock_in=True)
+
+        assert activity_handler.stream.get_stats()["subscribers"] == 1
+        assert next(stream) is None
+        stream.close()
+
+    def test_resume_from_last_event_id(self, activity_handler, stored):
+        """Test that a reconnecting client first gets what it missed, oldest first"""
+        last_event_id = encode_cursor([stored[1]["timestamp"], stored[1]["_id"]])
+        stream = activity_handler.stream_activities("BIZ123", last_event_id=last_event_id, heartbeat=0.01)
+
+        replayed = [next(stream)[1]["shift_id"] for _ in range(3)]
+
+        assert replayed == ["shift2", "shift3", "shift4"]
+        assert next(stream) is None
+        stream.close()
+
+    def test_catch_up_on_heartbeat(self, activity_handler):
+        """Test that activities recorded by another worker are picked up on the next heartbeat"""
+        stream = activity_handler.stream_activities("BIZ123", heartbeat=0.01)
+        next(stream)
+
+        activity_handler.activity.insert_one({"shift_id": "elsewhere", "clock_in": True,
+                                              "meta": {"business_code": "BIZ123", "employee_id": "emp1"},
+                                              "timestamp": datetime.now(timezone.utc)})
+
+        event = next(stream)
+        assert event[1]["shift_id"] == "elsewhere"
+
+        # Seen activities are not sent again by later catch-ups
+        assert next(stream) is None
+        stream.close()
+
+    def test_close_unsubscribes(self, activity_handler):
+        """Test that closing the stream drops its subscription"""
+        stream = activity_handler.stream_activities("BIZ123", heartbeat=0.01)
+        next(stream)
+        stream.close()
+
+        assert activity_handler.stream.get_stats() == {"change_streams": False, "businesses": 0, "subscribers": 0}
+
+    def test_slow_subscriber_dropped(self, activity_handler):
+        """Test that a stream falling too far behind ends so the client reconnects and replays"""
+        activity_handler.stream.SUBSCRIBER_QUEUE_SIZE = 2
+        stream = activity_handler.stream_activities("BIZ123", heartbeat=0.01)
+        next(stream)
+
+        for i in range(3):
+            activity_handler.stream.publish({"_id": ObjectId(), "meta": {"business_code": "BIZ123"},
+                                             "timestamp": datetime.now(timezone.utc)})
+
+        with pytest.raises(StopIteration):
+            next(stream)
+        assert activity_handler.stream.get_stats()["subscribers"] == 0
+
+    def test_invalid_last_event_id(self, activity_handler):
+        """Test that a malformed event id is rejected before the stream starts"""
+        with pytest.raises(ValueError):
+            activity_handler.stream_activities("BIZ123", last_event_id="not-an-id")
+
+
+class TestActivityStorageMigration:
+    """Tests for ActivityHandler.migrate_activity_storage"""
+
+    def test_backfills_string_records(self, activity_handler):
+        """Test that flat, string timestamp activities are converted and keep their ids"""
+        activity_handler.db.drop_collection("Activity")
+        legacy_id = activity_handler.activity.insert_one({
+            "shift_id": "shift1", "business_code": "BIZ123", "employee_id": "emp1", "employee_name": "Jane Doe",
+            "clock_in": True, "timestamp": "2024-03-01T09:00:00.123456+00:00"
+        }).inserted_id
+
+        assert activity_handler.migrate_activity_storage() == 1
+
+        activity = activity_handler.activity.find_one({})
+        assert activity["_id"] == legacy_id
+        assert activity["meta"] == {"business_code": "BIZ123", "employee_id": "emp1"}
+        assert activity["timestamp"] == datetime(2024, 3, 1, 9, 0, 0, 123000)
+        assert "Activity_legacy" not in activity_handler.db.list_collection_names()
+
+    def test_resumes_interrupted_copy(self, activity_handler):
+        """Test that a copy interrupted after the rename starts over without duplicates"""
+        activity_handler.db.drop_collection("Activity")
+        activity_handler.db["Activity_legacy"].insert_many(
+            [{"business_code": "BIZ123", "employee_id": "emp1", "timestamp": "2024-03-01T09:00:00Z"}
+             for _ in range(3)])
+        activity_handler.activity.insert_one({"meta": {}, "timestamp": datetime(2024, 3, 1)})
+
+        assert activity_handler.migrate_activity_storage() == 3
+        assert activity_handler.activity.count_documents({}) == 3
+
+    def test_fresh_database(self, activity_handler):
+        """Test that a missing collection is just created"""
+        activity_handler.db.drop_collection("Activity")
+
+        assert activity_handler.migrate_activity_storage() == 0
+        assert "Activity" in activity_handler.db.list_collection_names()
+
+    def test_plain_collection_before_6_0(self, activity_handler, monkeypatch):
+        """Test that servers without indexes on measurement fields get a plain collection the indexes fit on"""
+        activity_handler.db.drop_collection("Activity")
+        monkeypatch.setattr(activity_handler.db.client, "server_info", lambda: {"versionArray": [5, 0, 9, 0]})
+        create_collection = activity_handler.db.create_collection
+        options = []
+
+        def spy(name, **kwargs):
+            options.append(kwargs)
+            return create_collection(name, **kwargs)
+
+        monkeypatch.setattr(activity_handler.db, "create_collection", spy)
+
+        activity_handler.migrate_activity_storage()
+
+        assert options == [{}]
+        reconcile_indexes(activity_handler.db, ["Activity"])
+
+    def test_copies_collection_that_cannot_be_renamed(self, activity_handler, monkeypatch):
+        """Test that a time-series collection left by an earlier build is copied aside instead of renamed"""
+        activity_handler.db.drop_collection("Activity")
+        activity_handler.activity.insert_many([{"meta": {"business_code": "BIZ123", "employee_id": "emp1"},
+                                                "timestamp": datetime(2024, 3, 1)} for _ in range(3)])
+
+        def rename(new_name):
+            raise errors.OperationFailure("cannot rename a time-series collection")
+
+        monkeypatch.setattr(activity_handler.activity, "rename", rename)
+
+        assert activity_handler.migrate_activity_storage() == 3
+        assert activity_handler.activity.count_documents({}) == 3
+        assert {"Activity_legacy", "Activity_staging"}.isdisjoint(activity_handler.db.list_collection_names())
@@ -0,0 +1,166 @@
+"""Integration Tests for AutoScheduleHandler. Jobs run inline so their outcome can be checked right away"""
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock import MongoClient
+
+from handlers.autoschedule_handler import AutoScheduleHandler
+from handlers.index_registry import reconcile_indexes
+from handlers.schedule_handler import ScheduleHandler
+
+HOURS = [{"day": day, "open": "08:00", "close": "22:00"}
+         for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")]
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.database = self.client['test_db']
+
+
+@pytest.fixture
+def db_handler():
+    db_handler = MockDatabaseHandler()
+    for name in ("Users", "Schedules", "Shifts", "ScheduleJobs"):
+        db_handler.database[name].delete_many({})
+    reconcile_indexes(db_handler.database, ["ScheduleJobs"])
+    return db_handler
+
+
+@pytest.fixture
+def autoschedule_handler(db_handler):
+    """Create an autoschedule handler running jobs inline"""
+    return AutoScheduleHandler(db_handler, max_workers=0)
+
+
+@pytest.fixture
+def schedule_id(db_handler):
+    """Create the October 2025 schedule and return its id"""
+    ScheduleHandler(db_handler).new_schedule(2025, 10, "BIZ123", "manager1")
+    return str(db_handler.database["Schedules"].find_one({"business_code": "BIZ123"})["_id"])
+
+
+@pytest.fixture
+def employee_ids(db_handler):
+    """Insert three employees of the business and one of another business"""
+    users = db_handler.database["Users"]
+    ids = [str(users.insert_one({"name": name, "username": name.lower(), "role": "EMPLOYEE",
+                                 "business_code": "BIZ123"}).inserted_id) for name in ("Jane", "John", "Max")]
+    users.insert_one({"name": "Other", "role": "EMPLOYEE", "business_code": "OTHER"})
+    return ids
+
+
+class TestAutoScheduleHandler:
+    """Tests for AutoScheduleHandler"""
+
+    def test_generates_month(self, autoschedule_handler, schedule_id, employee_ids, db_handler):
+        """Test that a job fills every weekday slot of the month in one go"""
+        autoschedule_handler.set_availability(employee_ids[2], [{"day": "Monday", "start": "08:00", "end": "12:00"}])
+
+        job_id = autoschedule_handler.start_job(schedule_id, "BIZ123", [
+            {"day": "Monday", "start": "09:00", "end": "17:00", "count": 2},
+            {"day": "Saturday", "start": "09:00", "end": "17:00", "count": 1}
+        ], HOURS, "manager1")
+
+        job = autoschedule_handler.get_job(job_id, "BIZ123")
+        assert job["status"] == AutoScheduleHandler.DONE
+
+        # Four Mondays in October 2025 with two employees each, the business is closed on Saturdays
+        assert job["result"]["added"] == 8
+        assert job["result"]["open"] == 0
+        assert len(job["result"]["skipped"]) == 4
+
+        shifts = list(db_handler.database["Shifts"].find({"schedule_id": schedule_id}))
+        assert {shift["employee_name"] for shift in shifts} == {"Jane", "John"}
+        assert all(shift["job_id"] == job_id and not shift["posted"] for shift in shifts)
+        assert db_handler.database["Schedules"].find_one()["revision"] == 1
+
+    def test_unfilled_positions_posted(self, autoschedule_handler, schedule_id, employee_ids, db_handler):
+        """Test that positions nobody is available for become posted open shifts"""
+        job_id = autoschedule_handler.start_job(schedule_id, "BIZ123", [
+            {"day": "Monday", "start": "09:00", "end": "17:00", "count": 4}
+        ], HOURS, "manager1")
+
+        assert autoschedule_handler.get_job(job_id, "BIZ123")["result"]["open"] == 4
+        open_shifts = list(db_handler.database["Shifts"].find({"employee_id": None}))
+        assert len(open_shifts) == 4
+        assert all(shift["posted"] and shift["employee_name"] == "Open shift" for shift in open_shifts)
+
+    def test_existing_shifts_respected(self, autoschedule_handler, schedule_id, employee_ids, db_handler):
+        """Test that employees are not scheduled over shifts they already have"""
+        for employee_id in employee_ids[:2]:
+            db_handler.database["Shifts"].insert_one({"_id": employee_id, "schedule_id": schedule_id,
+                                                      "employee_id": employee_id,
+                                                      "start": "2025-10-06T12:00:00.000Z",
+                                                      "end": "2025-10-06T14:00:00.000Z"})
+
+        job_id = autoschedule_handler.start_job(schedule_id, "BIZ123", [
+            {"day": "Monday", "start": "09:00", "end": "17:00", "count": 1}
+        ], HOURS, "manager1")
+
+        assert autoschedule_handler.get_job(job_id, "BIZ123")["result"]["open"] == 0
+        first_monday = db_handler.database["Shifts"].find_one({"job_id": job_id,
+                                                                "start": "2025-10-06T09:00:00.000Z"})
+        assert first_monday["employee_id"] == employee_ids[2]
+
+    def test_second_draft_rejected(self, autoschedule_handler, schedule_id, employee_ids):
+        """Test that a schedule cannot get two drafts"""
+        staffing = [{"day": "Monday", "start": "09:00", "end": "17:00", "count": 1}]
+        autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+
+        with pytest.raises(ValueError):
+            autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+
+    def test_active_job_blocks_another(self, autoschedule_handler, schedule_id, db_handler):
+        """Test that the unique index rejects a job while another is queued, as a racing request would find"""
+        db_handler.database["ScheduleJobs"].insert_one({"schedule_id": schedule_id, "status": "queued",
+                                                        "active": True, "created_at": datetime.now()})
+        staffing = [{"day": "Monday", "start": "09:00", "end": "17:00", "count": 1}]
+
+        with pytest.raises(ValueError):
+            autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+
+    def test_orphaned_job_expires(self, autoschedule_handler, schedule_id, employee_ids, db_handler):
+        """Test that a job left running past its lease, e.g. by a restart, is failed and no longer blocks"""
+        started_at = datetime.now() - autoschedule_handler.lease - timedelta(seconds=1)
+        orphan = db_handler.database["ScheduleJobs"].insert_one({"schedule_id": schedule_id, "status": "running",
+                                                                 "active": True, "created_at": started_at,
+                                                                 "started_at": started_at}).inserted_id
+        staffing = [{"day": "Monday", "start": "09:00", "end": "17:00", "count": 1}]
+
+        job_id = autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+
+        assert autoschedule_handler.get_job(job_id, "BIZ123")["status"] == AutoScheduleHandler.DONE
+        orphan = db_handler.database["ScheduleJobs"].find_one({"_id": orphan})
+        assert orphan["status"] == AutoScheduleHandler.FAILED and "active" not in orphan
+
+    def test_other_business(self, autoschedule_handler, schedule_id):
+        """Test that schedules and jobs of another business are not found"""
+        staffing = [{"day": "Monday", "start": "09:00", "end": "17:00", "count": 1}]
+        assert autoschedule_handler.start_job(schedule_id, "OTHER", staffing, HOURS, "manager1") is None
+
+        job_id = autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+        assert autoschedule_handler.get_job(job_id, "OTHER") is None
+
+    @pytest.mark.parametrize("staffing", [
+        [],
+        [{"day": "Monday", "start": "09:00", "end": "17:00"}],
+        [{"day": "Monday", "start": "09:00", "end": "17:00", "count": 0}],
+        [{"day": "Someday", "start": "09:00", "end": "17:00", "count": 1}]
+    ])
+    def test_invalid_staffing(self, autoschedule_handler, schedule_id, staffing):
+        """Test that malformed staffing is rejected before a job is queued"""
+        with pytest.raises(ValueError):
+            autoschedule_handler.start_job(schedule_id, "BIZ123", staffing, HOURS, "manager1")
+
+    def test_availability(self, autoschedule_handler, employee_ids):
+        """Test storing and validating availability"""
+        assert autoschedule_handler.get_availability(employee_ids[0]) is None
+
+        window = {"day": "Tuesday", "start": "10:00", "end": "18:00"}
+        assert autoschedule_handler.set_availability(employee_ids[0], [window]) is True
+        assert autoschedule_handler.get_availability(employee_ids[0]) == [window]
+
+        with pytest.raises(ValueError):
+            autoschedule_handler.set_availability(employee_ids[0], [{"day": "Tuesday", "start": "18:00",
+                                                                     "end": "10:00"}])
@@ -0,0 +1,84 @@
+"""Unit tests for CacheHandler"""
+import pytest
+
+from handlers.cache_handler import CacheHandler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCacheHandler:
+    """Unit tests for the CacheHandler class"""
+
+    def test_get_and_set(self):
+        """Test that stored values are returned and counted as hits"""
+        cache = CacheHandler(max_size=2)
+        cache.set("a", 1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = CacheHandler(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        """Test that entries are dropped once their TTL passes"""
+        clock = FakeClock()
+        cache = CacheHandler(max_size=2, ttl=10, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 9
+        assert cache.get("a") == 1
+
+        clock.now = 11
+        assert cache.get("a") is None
+        assert cache.get_stats()["size"] == 0
+
+    def test_get_or_load(self):
+        """Test that the loader only runs on a miss and None is not cached"""
+        cache = CacheHandler(max_size=2)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return "value"
+
+        assert cache.get_or_load("a", loader) == "value"
+        assert cache.get_or_load("a", loader) == "value"
+        assert len(calls) == 1
+
+        assert cache.get_or_load("missing", lambda: None) is None
+        assert cache.get_stats()["size"] == 1
+
+    def test_invalidate(self):
+        """Test that invalidated entries are reloaded"""
+        cache = CacheHandler(max_size=2)
+        cache.set("a", 1)
+        cache.invalidate("a")
+
+        assert cache.get("a") is None
+
+    def test_invalid_size(self):
+        """Test that a cache must hold at least one entry"""
+        with pytest.raises(ValueError):
+            CacheHandler(max_size=0)
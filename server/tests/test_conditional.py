@@ -0,0 +1,96 @@
+"""Tests for ETag / If-None-Match handling on schedule reads"""
+import pytest
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from unittest.mock import Mock
+
+from handlers.account_handler import AccountHandler
+from handlers.activity_handler import ActivityHandler
+from handlers.business_handler import BusinessHandler
+from handlers.schedule_handler import ScheduleHandler
+from routes.routes import setup_routes
+
+SCHEDULE_ID = ObjectId()
+
+
+@pytest.fixture
+def handlers():
+    """Create mock handlers for a business with one schedule"""
+    business_handler = Mock(spec=BusinessHandler)
+    business_handler.get_business_from_code.return_value = {"business_name": "Cafe", "code": "BIZ123"}
+
+    schedule_handler = Mock(spec=ScheduleHandler)
+    schedule_handler.get_schedule_revision.return_value = {"_id": SCHEDULE_ID, "revision": 3}
+    schedule_handler.get_schedule_for_month.return_value = {"_id": SCHEDULE_ID, "revision": 3, "shifts": []}
+    schedule_handler.get_schedule_revisions.return_value = [{"_id": SCHEDULE_ID, "revision": 3}]
+    schedule_handler.get_schedules.return_value = [{"_id": SCHEDULE_ID, "year": 2099, "month": 1, "revision": 3}]
+
+    return Mock(spec=AccountHandler), business_handler, schedule_handler, Mock(spec=ActivityHandler)
+
+
+@pytest.fixture
+def client(handlers):
+    """Create a test client with the routes bound to mock handlers"""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+    JWTManager(app)
+    setup_routes(app, *handlers)
+    return app.test_client()
+
+
+@pytest.fixture
+def manager_headers(client):
+    """Authorization header for a manager"""
+    with client.application.app_context():
+        token = create_access_token(identity="manager1",
+                                    additional_claims={"role": "MANAGER", "code": "BIZ123", "user_id": "m1"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_home_not_modified(client, handlers, manager_headers):
+    """Test that revalidating an unchanged home payload returns 304 without loading shifts"""
+    first = client.get('/api/home', headers=manager_headers)
+    assert first.status_code == 200
+    assert first.headers["ETag"]
+
+    handlers[2].get_schedule_for_month.reset_mock()
+    second = client.get('/api/home', headers={**manager_headers, "If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+    assert second.get_data() == b""
+    handlers[2].get_schedule_for_month.assert_not_called()
+
+
+def test_home_modified_after_revision_bump(client, handlers, manager_headers):
+    """Test that a bumped revision invalidates the ETag"""
+    etag = client.get('/api/home', headers=manager_headers).headers["ETag"]
+
+    handlers[2].get_schedule_revision.return_value = {"_id": SCHEDULE_ID, "revision": 4}
+    handlers[2].get_schedule_for_month.return_value = {"_id": SCHEDULE_ID, "revision": 4, "shifts": []}
+    response = client.get('/api/home', headers={**manager_headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_home_etag_depends_on_window(client, manager_headers):
+    """Test that different shift windows do not share an ETag"""
+    month = client.get('/api/home', headers=manager_headers).headers["ETag"]
+    week = client.get('/api/home?from=2099-01-01T00:00:00Z&to=2099-01-08T00:00:00Z',
+                      headers=manager_headers).headers["ETag"]
+
+    assert month != week
+
+
+def test_schedules_not_modified(client, handlers, manager_headers):
+    """Test that revalidating an unchanged schedule list returns 304 without loading schedules"""
+    first = client.get('/api/manager/schedules', headers=manager_headers)
+    assert first.status_code == 200
+
+    handlers[2].get_schedules.reset_mock()
+    second = client.get('/api/manager/schedules', headers={**manager_headers, "If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+    handlers[2].get_schedules.assert_not_called()
@@ -151,6 +151,50 @@ def test_validate_login_success():
     )
 
 
+def test_validate_login_rehashes_outdated_hash():
+    db, collection = make_db_and_collection(has_business_collection=True)
+    db_handler = MagicMock(database=db)
+    pw_handler = MagicMock()
+
+    collection.find_one.return_value = {
+        "username": "testuser",
+        "password": "old_hash"
+    }
+
+    pw_handler.verify_password_match.return_value = True
+    pw_handler.needs_rehash.return_value = True
+    pw_handler.hash_password.return_value = "new_hash"
+
+    handler = AccountHandler(db_handler, pw_handler)
+    result = handler.validate_login("testuser", "ValidPass1")
+
+    assert result is True
+    collection.update_one.assert_called_once_with(
+        {"username": "testuser", "password": "old_hash"},
+        {"$set": {"password": "new_hash"}}
+    )
+
+
+def test_validate_login_skips_current_hash():
+    db, collection = make_db_and_collection(has_business_collection=True)
+    db_handler = MagicMock(database=db)
+    pw_handler = MagicMock()
+
+    collection.find_one.return_value = {
+        "username": "testuser",
+        "password": "current_hash"
+    }
+
+    pw_handler.verify_password_match.return_value = True
+    pw_handler.needs_rehash.return_value = False
+
+    handler = AccountHandler(db_handler, pw_handler)
+    assert handler.validate_login("testuser", "ValidPass1") is True
+
+    pw_handler.hash_password.assert_not_called()
+    collection.update_one.assert_not_called()
+
+
 def test_validate_login_user_not_found():
     db, collection = make_db_and_collection(has_business_collection=True)
     db_handler = MagicMock(database=db)
@@ -177,15 +221,17 @@ def make_db_and_collection(has_business_collection=True):
     return db, collection
 
 
-def test_init_creates_collection_if_missing():
+def test_init_issues_no_ddl():
     db, collection = make_db_and_collection(has_business_collection=False)
     db_handler = MagicMock(database=db)
 
     handler = BusinessHandler(db_handler)
 
-    db.create_collection.assert_called_once_with("Businesses")
+    # Collections and indexes are left to SchemaHandler.bootstrap
+    db.create_collection.assert_not_called()
+    db.list_collection_names.assert_not_called()
     assert handler.business_collection is collection
-    assert collection.create_index.call_count >= 1
+    collection.create_index.assert_not_called()
 
 
 def test_create_business_success(monkeypatch):
@@ -238,6 +284,35 @@ def test_create_business_validation_fails(monkeypatch):
     collection.insert_one.assert_not_called()
 
 
+def test_get_business_from_code_is_cached():
+    db, collection = make_db_and_collection(has_business_collection=True)
+    db_handler = MagicMock(database=db)
+    collection.find_one.return_value = {"_id": ObjectId(), "code": "BIZ123", "business_name": "My Biz"}
+
+    handler = BusinessHandler(db_handler)
+
+    assert handler.get_business_from_code("BIZ123")["business_name"] == "My Biz"
+    assert handler.get_business_from_code("BIZ123")["business_name"] == "My Biz"
+
+    collection.find_one.assert_called_once_with({"code": "BIZ123"})
+    assert handler.cache.get_stats()["hits"] == 1
+
+
+def test_insert_user_invalidates_cached_business():
+    db, collection = make_db_and_collection(has_business_collection=True)
+    db_handler = MagicMock(database=db)
+    business = {"_id": ObjectId(), "code": "BIZ123", "business_name": "My Biz"}
+    collection.find_one.return_value = business
+
+    handler = BusinessHandler(db_handler)
+    handler.get_business_from_code("BIZ123")
+    handler.insert_user(code="BIZ123", user_id=str(ObjectId()))
+    handler.get_business_from_code("BIZ123")
+
+    # The link reads through the cache, and its write forces the next lookup back to the database
+    assert collection.find_one.call_count == 2
+
+
 # pasword_handler.py
 def test_validate_password():
     pw_handler = PasswordHandler()
@@ -0,0 +1,175 @@
+"""Unit Tests for HealthHandler, PoolMonitor and the health endpoints"""
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from flask import Flask
+from mongomock import MongoClient
+from pymongo import errors
+
+from handlers.db_handler import PoolMonitor
+from handlers.health_handler import HealthHandler
+from routes.routes import setup_routes
+
+ADDRESS = ("localhost", 27017)
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.database = self.client['test_db']
+        self.pool_monitor = PoolMonitor()
+        self.pool_monitor.max_pool_size = 2
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db_handler():
+    return MockDatabaseHandler()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def health_handler(db_handler, clock):
+    return HealthHandler(db_handler, interval=5, clock=clock)
+
+
+def event():
+    return SimpleNamespace(address=ADDRESS)
+
+
+class TestPoolMonitor:
+    """Tests for the connection counts of PoolMonitor"""
+
+    def test_counts_connections(self):
+        """Test that checked out and waiting connections follow the pool events"""
+        monitor = PoolMonitor()
+        monitor.max_pool_size = 4
+
+        monitor.connection_created(event())
+        monitor.connection_check_out_started(event())
+        monitor.connection_checked_out(event())
+        monitor.connection_check_out_started(event())
+
+        assert monitor.get_stats() == {"max_size": 4, "open": 1, "in_use": 1, "waiting": 1, "saturation": 0.25}
+
+        monitor.connection_check_out_failed(event())
+        monitor.connection_checked_in(event())
+        monitor.connection_closed(event())
+
+        assert monitor.get_stats() == {"max_size": 4, "open": 0, "in_use": 0, "waiting": 0, "saturation": 0.0}
+
+    def test_pool_closed(self):
+        """Test that the counts of a closed pool are forgotten"""
+        monitor = PoolMonitor()
+        monitor.connection_created(event())
+        monitor.connection_check_out_started(event())
+        monitor.connection_checked_out(event())
+
+        monitor.pool_closed(event())
+
+        assert monitor.get_stats()["open"] == 0
+        assert monitor.get_stats()["saturation"] is None
+
+
+class TestHealthHandler:
+    """Tests for the readiness reported from the cached probe"""
+
+    def test_not_ready_before_probe(self, health_handler):
+        """Test that an instance is not ready until its database has been reached once"""
+        ready, health = health_handler.get_readiness()
+
+        assert not ready
+        assert health["problem"] == "database unreachable"
+
+    def test_ready_after_probe(self, health_handler):
+        """Test that a successful ping makes the instance ready"""
+        health_handler.probe()
+        ready, health = health_handler.get_readiness()
+
+        assert ready
+        assert health["database"]["reachable"]
+        assert health["pool"]["max_size"] == 2
+
+    def test_readiness_is_cached(self, health_handler, db_handler):
+        """Test that readiness checks never reach the database"""
+        health_handler.probe()
+        db_handler.client = health_handler.client = Mock()
+
+        for _ in range(100):
+            health_handler.get_readiness()
+
+        health_handler.client.admin.command.assert_not_called()
+
+    def test_unreachable(self, health_handler):
+        """Test that a failing ping is reported without the error message"""
+        health_handler.client = Mock()
+        health_handler.client.admin.command.side_effect = errors.ServerSelectionTimeoutError("db.internal:27017")
+
+        health_handler.probe()
+        ready, health = health_handler.get_readiness()
+
+        assert not ready
+        assert health["database"]["error"] == "ServerSelectionTimeoutError"
+
+    def test_stale(self, health_handler, clock):
+        """Test that a probe result stops counting once the probe thread falls behind"""
+        health_handler.probe()
+        clock.now += 5 * HealthHandler.STALE_INTERVALS + 1
+
+        ready, health = health_handler.get_readiness()
+
+        assert not ready
+        assert health["problem"] == "health probe is stale"
+
+    def test_saturated(self, health_handler, db_handler):
+        """Test that a pool with every connection in use and requests waiting is not ready"""
+        monitor = db_handler.pool_monitor
+        for _ in range(3):
+            monitor.connection_check_out_started(event())
+        monitor.connection_checked_out(event())
+        monitor.connection_checked_out(event())
+
+        health_handler.probe()
+        ready, health = health_handler.get_readiness()
+
+        assert not ready
+        assert health["problem"] == "connection pool saturated"
+        assert health["pool"]["saturation"] == 1.0
+
+
+class TestHealthEndpoints:
+    """Tests for /api/health/live and /api/health/ready"""
+
+    @pytest.fixture
+    def client(self, health_handler):
+        app = Flask(__name__)
+        app.config['TESTING'] = True
+        setup_routes(app, Mock(), Mock(), Mock(), Mock(), health_handler=health_handler)
+        return app.test_client()
+
+    def test_live(self, client):
+        response = client.get('/api/health/live')
+
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-store'
+
+    def test_ready(self, client, health_handler):
+        assert client.get('/api/health/ready').status_code == 503
+
+        health_handler.probe()
+        response = client.get('/api/health/ready')
+
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ready"
@@ -0,0 +1,88 @@
+"""Tests for the index registry reconcile step"""
+import pytest
+from mongomock import MongoClient
+
+from handlers.index_registry import INDEX_REGISTRY, reconcile_indexes
+
+
+@pytest.fixture
+def db():
+    """Create an empty mock database"""
+    client = MongoClient()
+    client.drop_database('test_index_db')
+    return client['test_index_db']
+
+
+class TestIndexRegistry:
+    """Tests for reconcile_indexes"""
+
+    def test_creates_collections_and_indexes(self, db):
+        """Test that missing collections and indexes are created"""
+        changes = reconcile_indexes(db)
+
+        assert set(INDEX_REGISTRY) <= set(db.list_collection_names())
+        for name, specs in INDEX_REGISTRY.items():
+            assert sorted(changes[name]["created"]) == sorted(spec["name"] for spec in specs)
+            assert set(db[name].index_information()) == {"_id_"} | {spec["name"] for spec in specs}
+
+    def test_second_run_is_noop(self, db):
+        """Test that reconciling an up to date database changes nothing"""
+        reconcile_indexes(db)
+        changes = reconcile_indexes(db)
+
+        assert all(change == {"created": [], "dropped": []} for change in changes.values())
+
+    def test_drops_obsolete_indexes(self, db):
+        """Test that unregistered indexes are dropped"""
+        db.create_collection("Users")
+        db["Users"].create_index([("password", 1)], name="password_1")
+
+        changes = reconcile_indexes(db, ["Users"])
+
+        assert changes["Users"]["dropped"] == ["password_1"]
+        assert "password_1" not in db["Users"].index_information()
+
+    def test_recreates_changed_indexes(self, db):
+        """Test that an index whose definition changed is rebuilt"""
+        db.create_collection("Schedules")
+        db["Schedules"].create_index([("business_code", 1)], name="business_year_month_unique")
+
+        changes = reconcile_indexes(db, ["Schedules"])
+
+        assert changes["Schedules"] == {"created": ["business_year_month_unique"],
+                                        "dropped": ["business_year_month_unique"]}
+        index = db["Schedules"].index_information()["business_year_month_unique"]
+        assert index["key"] == [("business_code", 1), ("year", 1), ("month", 1)]
+        assert index["unique"] is True
+
+    def test_keeps_equivalent_legacy_index(self, db):
+        """Test that an index matching an entry under its old default name is kept rather than rebuilt"""
+        db.create_collection("Users")
+        db["Users"].create_index([("username", 1)], name="username_1", unique=True)
+
+        changes = reconcile_indexes(db, ["Users"])
+
+        assert changes["Users"] == {"created": ["business_role_username"], "dropped": []}
+        assert "username_unique" not in db["Users"].index_information()
+        assert reconcile_indexes(db, ["Users"])["Users"] == {"created": [], "dropped": []}
+
+    def test_creates_before_dropping(self, db, monkeypatch):
+        """Test that obsolete indexes are only dropped once the registered ones exist"""
+        db.create_collection("Businesses")
+        db["Businesses"].create_index([("code", 1)], name="code_1")
+        db["Businesses"].create_index([("created_dt", 1)], name="created_dt_1")
+        collection_type = type(db["Businesses"])
+        drop_index = collection_type.drop_index
+        present_at_drop = {}
+
+        def spy(collection, index_name):
+            present_at_drop[index_name] = set(collection.index_information())
+            return drop_index(collection, index_name)
+
+        monkeypatch.setattr(collection_type, "drop_index", spy)
+        changes = reconcile_indexes(db, ["Businesses"])
+
+        # code_1 has the keys of code_unique, so it has to go first; created_dt_1 goes after the build
+        assert changes["Businesses"] == {"created": ["code_unique"], "dropped": ["code_1", "created_dt_1"]}
+        assert "code_unique" not in present_at_drop["code_1"]
+        assert "code_unique" in present_at_drop["created_dt_1"]
@@ -1,5 +1,6 @@
 import pytest
 from handlers.password_handler import PasswordHandler
+from handlers.exceptions.exceptions import PasswordHandlerBusyError
 
 class TestPasswordHandler:
     """Unit tests for the PasswordHandler class"""
@@ -50,7 +51,7 @@ class TestPasswordHandler:
         password = "Password123"
         hash1 = password_handler.hash_password(password)
         hash2 = password_handler.hash_password(password)
-        assert hash1 == hash2
+        assert hash1 != hash2
 
     def test_hash_different_outputs(self, password_handler):
         """Test that different passwords hashed outputs different outputs"""
@@ -79,3 +80,65 @@ class TestPasswordHandler:
         assert password_handler.verify_password_match("password123", hashed) is False
         assert password_handler.verify_password_match("PASSWORD123", hashed) is False
 
+    # Work factor tests
+    def test_hash_uses_configured_rounds(self):
+        """Test that new hashes are made at the configured cost"""
+        handler = PasswordHandler(rounds=5)
+        hashed = handler.hash_password("Password123")
+        assert PasswordHandler.get_hash_rounds(hashed) == 5
+
+    def test_invalid_rounds_rejected(self):
+        """Test that an out of range cost is rejected"""
+        with pytest.raises(ValueError):
+            PasswordHandler(rounds=3)
+
+    def test_needs_rehash(self):
+        """Test that hashes at a different cost are flagged for rehashing"""
+        old_handler = PasswordHandler(rounds=4)
+        new_handler = PasswordHandler(rounds=5)
+        hashed = old_handler.hash_password("Password123")
+
+        assert new_handler.needs_rehash(hashed) is True
+        assert old_handler.needs_rehash(hashed) is False
+
+    def test_calibrate_rounds(self):
+        """Test that calibration stays within the requested cost range"""
+        result = PasswordHandler.calibrate_rounds(target_ms=1000, min_rounds=4, max_rounds=5, samples=1)
+        assert 4 <= result["rounds"] <= 5
+        assert 4 in result["timings_ms"]
+
+
+class TestPasswordHandlerPool:
+    """Unit tests for the PasswordHandler worker pool"""
+    @pytest.fixture
+    def pooled_handler(self):
+        handler = PasswordHandler(rounds=4, max_workers=2, max_queue=1)
+        yield handler
+        handler.shutdown()
+
+    def test_pool_hash_and_verify(self, pooled_handler):
+        """Test that hashing and verification work through the worker pool"""
+        hashed = pooled_handler.hash_password("Password123")
+        assert pooled_handler.verify_password_match("Password123", hashed) is True
+        assert pooled_handler.verify_password_match("WrongPass456", hashed) is False
+
+    def test_pool_rejects_when_full(self, pooled_handler):
+        """Test that calls are rejected once every worker and queue slot is taken"""
+        for _ in range(3):
+            pooled_handler._slots.acquire()
+
+        with pytest.raises(PasswordHandlerBusyError):
+            pooled_handler.hash_password("Password123")
+
+        assert pooled_handler.get_metrics()["rejected"] == 1
+
+    def test_pool_records_latency(self, pooled_handler):
+        """Test that each call is counted in the latency metrics"""
+        hashed = pooled_handler.hash_password("Password123")
+        pooled_handler.verify_password_match("Password123", hashed)
+
+        metrics = pooled_handler.get_metrics()
+        assert metrics["hash"]["count"] == 1
+        assert metrics["verify"]["count"] == 1
+        assert metrics["verify"]["max_ms"] > 0
+        assert metrics["in_flight"] == 0
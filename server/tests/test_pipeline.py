@@ -0,0 +1,147 @@
+"""Tests for the declarative endpoint pipeline"""
+import time
+from datetime import timedelta
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from unittest.mock import Mock, patch
+
+from handlers.enums.roles import Role
+from handlers.schedule_handler import ScheduleHandler
+from routes.pipeline import compile_schema, endpoint
+from routes.routes import setup_routes
+
+SCHEMA = {
+    "type": "object",
+    "required": ["schedule_id", "shift_ids"],
+    "properties": {
+        "schedule_id": {"type": "string", "minLength": 1},
+        "shift_ids": {"type": "array", "maxItems": 2, "items": {"type": "string"}},
+        "count": {"type": "integer", "minimum": 1, "maximum": 5},
+        "direction": {"enum": ["in", "out"]},
+        "shift": {"type": "object", "required": ["start"], "properties": {"start": {"type": "string"}}}
+    }
+}
+
+
+class TestCompileSchema:
+    """Tests for the compiled validators"""
+
+    @pytest.mark.parametrize("value, problem", [
+        ({"schedule_id": "s1", "shift_ids": ["a"]}, None),
+        ([], "body must be an object"),
+        ({"shift_ids": []}, "schedule_id is required"),
+        ({"schedule_id": "", "shift_ids": []}, "schedule_id must have at least 1 characters"),
+        ({"schedule_id": "s1", "shift_ids": ["a", 2]}, "shift_ids[1] must be a string"),
+        ({"schedule_id": "s1", "shift_ids": ["a", "b", "c"]}, "shift_ids must have at most 2 items"),
+        ({"schedule_id": "s1", "shift_ids": [], "count": True}, "count must be an integer"),
+        ({"schedule_id": "s1", "shift_ids": [], "count": 9}, "count must be between 1 and 5"),
+        ({"schedule_id": "s1", "shift_ids": [], "direction": "up"}, "direction must be one of in, out"),
+        ({"schedule_id": "s1", "shift_ids": [], "shift": {}}, "shift.start is required"),
+        ({"schedule_id": "s1", "shift_ids": [], "shift": {"start": 1}}, "shift.start must be a string"),
+    ])
+    def test_first_problem(self, value, problem):
+        assert compile_schema(SCHEMA)(value) == problem
+
+    def test_type_lists(self):
+        validate = compile_schema({"type": ["string", "null"]})
+
+        assert validate(None) is None
+        assert validate("x") is None
+        assert validate(1) == "body must be a string or null"
+
+    def test_unsupported_keyword(self):
+        """Test that a misspelled keyword fails when the schema is compiled, not on a request"""
+        with pytest.raises(ValueError):
+            compile_schema({"type": "object", "propertys": {}})
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+    JWTManager(app)
+    return app
+
+
+def headers(app, role, expires_delta=None):
+    with app.app_context():
+        token = create_access_token(identity="user1", expires_delta=expires_delta,
+                                    additional_claims={"role": role, "code": "BIZ123", "user_id": "u1"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestEndpoint:
+    """Tests for the checks @endpoint runs before a view"""
+
+    @pytest.fixture
+    def view(self, app):
+        view = Mock(return_value=({"message": "success"}, 200))
+        app.add_url_rule('/test', view_func=endpoint(roles=[Role.MANAGER], schema=SCHEMA)(
+            lambda **kwargs: view(**kwargs)), endpoint='test', methods=['POST'])
+        return view
+
+    def test_valid_request(self, app, view):
+        body = {"schedule_id": "s1", "shift_ids": ["a"]}
+        response = app.test_client().post('/test', json=body, headers=headers(app, "MANAGER"))
+
+        assert response.status_code == 200
+        assert view.call_args.kwargs["data"] == body
+        assert view.call_args.kwargs["claims"]["code"] == "BIZ123"
+
+    def test_missing_token(self, app, view):
+        assert app.test_client().post('/test', json={}).status_code == 401
+        view.assert_not_called()
+
+    def test_wrong_role(self, app, view):
+        response = app.test_client().post('/test', json={}, headers=headers(app, "EMPLOYEE"))
+
+        assert response.status_code == 403
+        view.assert_not_called()
+
+    @pytest.mark.parametrize("kwargs", [{"json": {"schedule_id": "s1"}}, {"data": "not json"}])
+    def test_malformed_body(self, app, view, kwargs):
+        response = app.test_client().post('/test', headers=headers(app, "MANAGER"), **kwargs)
+
+        assert response.status_code == 400
+        view.assert_not_called()
+
+    def test_token_verified_once(self, app, view):
+        """Test that a token is only decoded by its first request"""
+        manager = headers(app, "MANAGER")
+        client = app.test_client()
+        client.post('/test', json={"schedule_id": "s1", "shift_ids": []}, headers=manager)
+
+        with patch('routes.pipeline.verify_jwt_in_request') as verify:
+            response = client.post('/test', json={"schedule_id": "s1", "shift_ids": []}, headers=manager)
+
+        assert response.status_code == 200
+        verify.assert_not_called()
+
+    def test_expired_token_not_reused(self, app, view):
+        """Test that a cached token is verified again once it expires"""
+        expired = headers(app, "MANAGER", expires_delta=timedelta(seconds=-1))
+
+        app.test_client().post('/test', json={}, headers=headers(app, "MANAGER"))
+        app.extensions["endpoint_token_cache"].set(expired["Authorization"], {"role": "MANAGER",
+                                                                              "exp": time.time() - 1})
+
+        response = app.test_client().post('/test', json={"schedule_id": "s1", "shift_ids": []}, headers=expired)
+
+        assert response.status_code == 401
+        view.assert_not_called()
+
+
+def test_malformed_shift_never_reaches_handler(app):
+    """Test that a registered route rejects a malformed body before its handler is called"""
+    schedule_handler = Mock(spec=ScheduleHandler)
+    setup_routes(app, Mock(), Mock(), schedule_handler, Mock())
+
+    response = app.test_client().post('/api/manager/schedules/add_shift', json={"schedule_id": "s1", "shift": "x"},
+                                      headers=headers(app, "MANAGER"))
+
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "shift must be an object"
+    schedule_handler.add_shift.assert_not_called()
@@ -0,0 +1,192 @@
+"""Tests for RevocationHandler, its Bloom filter, and the refresh and logout endpoints"""
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, decode_token
+from mongomock import MongoClient
+
+from handlers.account_handler import AccountHandler
+from handlers.revocation_handler import BloomFilter, RevocationHandler
+from routes.routes import setup_routes
+
+LIFETIME = 30 * 24 * 3600
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.database = self.client['test_db']
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_900_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db_handler():
+    db_handler = MockDatabaseHandler()
+    db_handler.database["RevokedTokens"].delete_many({})
+    return db_handler
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def revocation_handler(db_handler, clock):
+    return RevocationHandler(db_handler, max_token_lifetime=LIFETIME, capacity=100, sync_interval=0, clock=clock)
+
+
+def token(clock, jti="t1", sub="jane", issued=-60, expires=900):
+    return {"jti": jti, "sub": sub, "iat": int(clock.now + issued), "exp": int(clock.now + expires)}
+
+
+class TestBloomFilter:
+    """Tests for BloomFilter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"key{i}")
+
+        assert all(f"key{i}" in bloom for i in range(1000))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"key{i}")
+
+        false_positives = sum(f"other{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+class TestRevocationHandler:
+    """Tests for revoking tokens and identities"""
+
+    def test_revoke_token(self, revocation_handler, clock):
+        revocation_handler.revoke_token(token(clock))
+
+        assert revocation_handler.is_revoked(token(clock))
+        assert not revocation_handler.is_revoked(token(clock, jti="t2"))
+
+    def test_revocation_ends_with_token(self, revocation_handler, clock):
+        """Test that a revoked token is forgotten once it has expired anyway"""
+        revocation_handler.revoke_token(token(clock, expires=60))
+        clock.now += 61 + RevocationHandler.PURGE_INTERVAL
+
+        revocation_handler.sync()
+
+        assert revocation_handler.get_stats()["tokens"] == 0
+
+    def test_revoke_identity(self, revocation_handler, clock):
+        """Test that earlier tokens of an identity are revoked and replacements issued right away are not"""
+        earlier = token(clock, issued=-1)
+        revocation_handler.revoke_identity("jane")
+
+        assert revocation_handler.is_revoked(earlier)
+        assert not revocation_handler.is_revoked(token(clock, jti="t2", issued=0))
+        assert not revocation_handler.is_revoked(token(clock, jti="t3", sub="john"))
+
+    def test_other_workers_sync(self, revocation_handler, db_handler, clock):
+        """Test that revocations recorded by another worker are picked up"""
+        other = RevocationHandler(db_handler, max_token_lifetime=LIFETIME, sync_interval=0, clock=clock)
+        other.start()
+
+        revocation_handler.revoke_token(token(clock, expires=3600))
+        revocation_handler.revoke_identity("john")
+        other.sync()
+
+        assert other.is_revoked(token(clock, expires=3600))
+        assert other.is_revoked(token(clock, jti="t2", sub="john", issued=-5))
+
+    def test_grows_past_capacity(self, revocation_handler, clock):
+        for i in range(250):
+            revocation_handler.revoke_token(token(clock, jti=f"t{i}"))
+
+        assert revocation_handler.get_stats()["tokens"] == 250
+        assert all(revocation_handler.is_revoked(token(clock, jti=f"t{i}")) for i in range(250))
+
+
+class TestAuthEndpoints:
+    """Tests for /refresh and /api/auth/logout"""
+
+    @pytest.fixture
+    def account_handler(self):
+        account_handler = Mock(spec=AccountHandler)
+        account_handler.find_user_by_name.return_value = {"_id": ObjectId(), "username": "jane", "role": "MANAGER",
+                                                          "business_code": "BIZ123"}
+        return account_handler
+
+    @pytest.fixture
+    def app(self, account_handler, db_handler):
+        app = Flask(__name__)
+        app.config['TESTING'] = True
+        app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+        JWTManager(app)
+        revocation_handler = RevocationHandler(db_handler, max_token_lifetime=LIFETIME, sync_interval=0)
+        setup_routes(app, account_handler, Mock(), Mock(), Mock(), revocation_handler=revocation_handler)
+        return app
+
+    @staticmethod
+    def tokens(app, **claims):
+        with app.app_context():
+            return (create_access_token("jane", additional_claims=claims),
+                    create_refresh_token("jane", additional_claims=claims))
+
+    def test_refresh_keeps_claims(self, app, account_handler):
+        """Test that a refreshed access token has the claims of the refresh token, without a user lookup"""
+        _, refresh = self.tokens(app, role="MANAGER", code="BIZ123", user_id="u1")
+
+        response = app.test_client().post('/refresh', headers={"Authorization": f"Bearer {refresh}"})
+        access = response.get_json()["JWT"]
+
+        assert response.status_code == 200
+        account_handler.find_user_by_name.assert_not_called()
+
+        with app.app_context():
+            claims = decode_token(access)
+        assert (claims["role"], claims["code"], claims["user_id"]) == ("MANAGER", "BIZ123", "u1")
+
+    def test_refresh_legacy_token(self, app, account_handler):
+        """Test that refresh tokens without claims get them from the user"""
+        with app.app_context():
+            refresh = create_refresh_token("jane")
+
+        response = app.test_client().post('/refresh', headers={"Authorization": f"Bearer {refresh}"})
+
+        assert response.status_code == 200
+        account_handler.find_user_by_name.assert_called_once_with("jane")
+
+    def test_logout(self, app):
+        """Test that logging out revokes the access token and the refresh token sent with it"""
+        access, refresh = self.tokens(app, role="MANAGER", code="BIZ123", user_id="u1")
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {access}"}
+
+        # Cache the verified access token first, revocation has to apply to cached tokens too
+        assert client.get('/api/manager/schedules/conflicts', headers=headers).status_code != 401
+
+        response = client.post('/api/auth/logout', json={"refresh_JWT": refresh}, headers=headers)
+        assert response.status_code == 200
+
+        assert client.get('/api/manager/schedules/conflicts', headers=headers).status_code == 401
+        assert client.post('/refresh', headers={"Authorization": f"Bearer {refresh}"}).status_code == 401
+
+    def test_logout_rejects_foreign_refresh_token(self, app):
+        access, _ = self.tokens(app, role="MANAGER", code="BIZ123", user_id="u1")
+        with app.app_context():
+            refresh = create_refresh_token("john", expires_delta=timedelta(days=1))
+
+        response = app.test_client().post('/api/auth/logout', json={"refresh_JWT": refresh},
+                                          headers={"Authorization": f"Bearer {access}"})
+
+        assert response.status_code == 400
@@ -1,6 +1,6 @@
 import pytest
 from flask import Flask
-from flask_jwt_extended import JWTManager
+from flask_jwt_extended import JWTManager, create_access_token
 from unittest.mock import Mock
 from datetime import timedelta
 
@@ -58,4 +58,22 @@ def test_routes_use_post_method(app, mock_handlers):
 
     for rule in app.url_map.iter_rules():
         if rule.rule in api_routes:
-            assert 'POST' in rule.methods
\ No newline at end of file
+            assert 'POST' in rule.methods
+
+def test_metrics_require_manager(app):
+    """Test that process metrics are only served to managers"""
+    account_handler = Mock(**{"pw_handler.get_metrics.return_value": {}})
+    business_handler = Mock(**{"cache.get_stats.return_value": {}})
+    schedule_handler = Mock(**{"user_cache.get_stats.return_value": {}})
+    activity_handler = Mock(**{"stream.get_stats.return_value": {}})
+    setup_routes(app, account_handler, business_handler, schedule_handler, activity_handler)
+    client = app.test_client()
+
+    def headers(role):
+        with app.app_context():
+            token = create_access_token(identity="user1", additional_claims={"role": role, "code": "BIZ123"})
+        return {"Authorization": f"Bearer {token}"}
+
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers=headers("EMPLOYEE")).status_code == 403
+    assert client.get('/api/metrics', headers=headers("MANAGER")).status_code == 200
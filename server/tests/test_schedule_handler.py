@@ -0,0 +1,609 @@
+"""Integration Tests for ScheduleHandler. Test schedules and the shift store"""
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+from handlers.business_handler import BusinessHandler
+from handlers.exceptions.exceptions import ShiftConflictError
+from handlers.index_registry import reconcile_indexes
+from handlers.schedule_handler import ScheduleHandler
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.database = self.client['test_db']
+
+
+@pytest.fixture
+def schedule_handler():
+    """Create a mock schedule handler"""
+    db_handler = MockDatabaseHandler()
+    handler = ScheduleHandler(db_handler)
+
+    handler.schedules_collection.delete_many({})
+    handler.shifts_collection.delete_many({})
+    handler.users_collection.delete_many({})
+    handler.templates_collection.delete_many({})
+    return handler
+
+
+@pytest.fixture
+def employee_id(schedule_handler):
+    """Insert an employee and return their id"""
+    result = schedule_handler.users_collection.insert_one({"name": "Jane Doe", "username": "jane",
+                                                           "business_code": "BIZ123"})
+    return str(result.inserted_id)
+
+
+@pytest.fixture
+def schedule_id(schedule_handler):
+    """Create a schedule and return its id"""
+    schedule_handler.new_schedule(2025, 10, "BIZ123", "manager1")
+    return str(schedule_handler.schedules_collection.find_one({"business_code": "BIZ123"})["_id"])
+
+
+def make_shift(employee_id, day=1, year=2099):
+    return {
+        "employee_id": employee_id,
+        "start": f"{year}-10-{day:02d}T14:00:00.000Z",
+        "end": f"{year}-10-{day:02d}T22:00:00.000Z"
+    }
+
+
+class TestScheduleHandler:
+    """Tests for ScheduleHandler"""
+
+    def test_add_shift_creates_shift_document(self, schedule_handler, schedule_id, employee_id):
+        """Test that a shift is stored as its own document"""
+        assert schedule_handler.add_shift(schedule_id, make_shift(employee_id)) is True
+
+        shift = schedule_handler.shifts_collection.find_one({})
+        assert shift["schedule_id"] == schedule_id
+        assert shift["business_code"] == "BIZ123"
+        assert shift["employee_name"] == "Jane Doe"
+        assert shift["posted"] is False
+
+        schedule = schedule_handler.schedules_collection.find_one({"_id": ObjectId(schedule_id)})
+        assert "shifts" not in schedule
+
+    def test_add_shift_missing_schedule(self, schedule_handler, employee_id):
+        """Test that adding a shift to an unknown schedule fails"""
+        assert schedule_handler.add_shift(str(ObjectId()), make_shift(employee_id)) is False
+        assert schedule_handler.shifts_collection.count_documents({}) == 0
+
+    def test_add_shift_missing_fields(self, schedule_handler, schedule_id):
+        """Test that shifts without required fields are rejected"""
+        assert schedule_handler.add_shift(schedule_id, {"start": "2025-10-01T14:00:00.000Z"}) is False
+
+    def test_get_schedule_for_month_includes_shifts(self, schedule_handler, schedule_id, employee_id):
+        """Test that the month schedule carries its shifts in start order"""
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id, day=5))
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id, day=2))
+
+        schedule = schedule_handler.get_schedule_for_month("BIZ123", 2025, 10)
+        assert [s["start"][:10] for s in schedule["shifts"]] == ["2099-10-02", "2099-10-05"]
+
+    def test_get_schedule_for_month_is_year_aware(self, schedule_handler, schedule_id):
+        """Test that the same month of another year is a different schedule"""
+        assert schedule_handler.get_schedule_for_month("BIZ123", 2026, 10) is None
+
+        schedule_handler.new_schedule(2026, 10, "BIZ123", "manager1")
+        schedule = schedule_handler.get_schedule_for_month("BIZ123", 2026, 10)
+        assert schedule["year"] == 2026
+        assert str(schedule["_id"]) != schedule_id
+
+    def test_get_schedule_for_month_window(self, schedule_handler, schedule_id, employee_id):
+        """Test that only shifts starting inside the window are returned"""
+        for day in (1, 8, 9, 15):
+            schedule_handler.add_shift(schedule_id, make_shift(employee_id, day=day))
+
+        schedule = schedule_handler.get_schedule_for_month("BIZ123", 2025, 10, window_start="2099-10-08T00:00:00.000Z",
+                                                           window_end="2099-10-15T00:00:00.000Z")
+        assert [s["start"][8:10] for s in schedule["shifts"]] == ["08", "09"]
+
+    def test_new_schedule_rejects_duplicate_month(self, schedule_handler, schedule_id):
+        """Test that the unique index stops a second schedule for the same month, even with string input"""
+        reconcile_indexes(schedule_handler.schedules_collection.database, ["Schedules"])
+
+        assert schedule_handler.new_schedule("2025", "10", "BIZ123", "manager1") is False
+        assert schedule_handler.new_schedule(2025, 10, "OTHER", "manager1") is True
+        assert schedule_handler.schedules_collection.count_documents({"business_code": "BIZ123"}) == 1
+
+    def test_edit_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test editing a shift without touching store-owned fields"""
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id))
+        shift = schedule_handler.shifts_collection.find_one({})
+
+        edited = {**make_shift(employee_id, day=3), "_id": shift["_id"], "business_code": "OTHER"}
+        assert schedule_handler.edit_shift(schedule_id, edited) is True
+
+        shift = schedule_handler.shifts_collection.find_one({"_id": shift["_id"]})
+        assert shift["start"].startswith("2099-10-03")
+        assert shift["business_code"] == "BIZ123"
+
+    def test_edit_unknown_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test editing a shift that does not exist"""
+        edited = {**make_shift(employee_id), "_id": str(ObjectId())}
+        assert schedule_handler.edit_shift(schedule_id, edited) is False
+
+    def test_delete_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test deleting a shift"""
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id))
+        shift = schedule_handler.shifts_collection.find_one({})
+
+        assert schedule_handler.delete_shift(schedule_id, shift["_id"]) is True
+        assert schedule_handler.shifts_collection.count_documents({}) == 0
+
+    def test_post_and_take_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test posting a shift and another employee taking it"""
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id))
+        shift_id = schedule_handler.shifts_collection.find_one({})["_id"]
+
+        assert schedule_handler.post_shift(shift_id) is True
+        assert [s["_id"] for s in schedule_handler.get_posted_shifts("BIZ123")] == [shift_id]
+
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe", "username": "john"}).inserted_id)
+        assert schedule_handler.take_shift(shift_id, other) is True
+
+        shift = schedule_handler.shifts_collection.find_one({"_id": shift_id})
+        assert shift["employee_id"] == other
+        assert shift["employee_name"] == "John Roe"
+        assert schedule_handler.get_posted_shifts("BIZ123") == []
+
+    def test_posted_shifts_only_open_and_future(self, schedule_handler, schedule_id, employee_id):
+        """Test that past and completed posted shifts are left out"""
+        for shift in (make_shift(employee_id, day=1, year=2020), make_shift(employee_id, day=2),
+                      make_shift(employee_id, day=3)):
+            schedule_handler.add_shift(schedule_id, shift)
+
+        schedule_handler.shifts_collection.update_many({}, {"$set": {"posted": True}})
+        schedule_handler.shifts_collection.update_one({"start": {"$regex": "^2099-10-03"}},
+                                                      {"$set": {"completed": True}})
+
+        posted = schedule_handler.get_posted_shifts("BIZ123")
+        assert [s["start"][:10] for s in posted] == ["2099-10-02"]
+
+    def test_posted_shifts_pagination(self, schedule_handler, schedule_id, employee_id):
+        """Test paging through posted shifts in start order"""
+        for day in (4, 1, 3, 2):
+            schedule_handler.add_shift(schedule_id, make_shift(employee_id, day=day))
+        schedule_handler.shifts_collection.update_many({}, {"$set": {"posted": True}})
+
+        first = schedule_handler.get_posted_shifts("BIZ123", limit=2)
+        second = schedule_handler.get_posted_shifts("BIZ123", limit=2, offset=2)
+
+        assert [s["start"][8:10] for s in first] == ["01", "02"]
+        assert [s["start"][8:10] for s in second] == ["03", "04"]
+
+    def test_migrate_embedded_shifts(self, schedule_handler, employee_id):
+        """Test that embedded shift arrays are moved into the shift store"""
+        embedded = [{**make_shift(employee_id, day=d), "_id": str(ObjectId()), "posted": False} for d in (1, 2)]
+        schedule_handler.schedules_collection.insert_one(
+            {"year": 2025, "month": 10, "business_code": "BIZ123", "shifts": embedded})
+
+        assert schedule_handler.migrate_embedded_shifts() == 2
+        assert schedule_handler.shifts_collection.count_documents({"business_code": "BIZ123"}) == 2
+        assert schedule_handler.schedules_collection.count_documents({"shifts": {"$exists": True}}) == 0
+
+        # Running again is a no-op
+        assert schedule_handler.migrate_embedded_shifts() == 0
+
+    def test_merge_duplicate_schedules(self, schedule_handler, schedule_id, employee_id):
+        """Test that duplicate month schedules are merged into the oldest one"""
+        duplicate_id = schedule_handler.schedules_collection.insert_one(
+            {"year": "2025", "month": "10", "business_code": "BIZ123"}).inserted_id
+        schedule_handler.add_shift(str(duplicate_id), make_shift(employee_id))
+
+        assert schedule_handler.merge_duplicate_schedules() == 1
+        assert schedule_handler.schedules_collection.count_documents({}) == 1
+        assert schedule_handler.shifts_collection.find_one({})["schedule_id"] == schedule_id
+
+        # Running again is a no-op
+        assert schedule_handler.merge_duplicate_schedules() == 0
+
+    def test_shift_changes_bump_revision(self, schedule_handler, schedule_id, employee_id):
+        """Test that every shift change bumps the schedule revision and no-ops do not"""
+        def revision():
+            return schedule_handler.get_schedule_revision("BIZ123", 2025, 10)["revision"]
+
+        assert revision() == 0
+
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id))
+        shift_id = schedule_handler.shifts_collection.find_one({})["_id"]
+        assert revision() == 1
+
+        schedule_handler.edit_shift(schedule_id, {**make_shift(employee_id, day=2), "_id": shift_id})
+        schedule_handler.edit_shift(schedule_id, {**make_shift(employee_id, day=2), "_id": shift_id})
+        assert revision() == 2
+
+        schedule_handler.post_shift(shift_id)
+        schedule_handler.post_shift(shift_id)
+        assert revision() == 3
+
+        schedule_handler.take_shift(shift_id, employee_id)
+        assert revision() == 4
+
+        schedule_handler.delete_shift(schedule_id, shift_id)
+        assert revision() == 5
+        assert [s["revision"] for s in schedule_handler.get_schedule_revisions("BIZ123")] == [5]
+
+    def test_take_unposted_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test that a shift has to be posted before it can be taken"""
+        schedule_handler.add_shift(schedule_id, make_shift(employee_id))
+        shift_id = schedule_handler.shifts_collection.find_one({})["_id"]
+
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe", "username": "john"}).inserted_id)
+        assert schedule_handler.take_shift(shift_id, other) is False
+        assert schedule_handler.shifts_collection.find_one({"_id": shift_id})["employee_id"] == employee_id
+
+    def test_add_shifts_bulk(self, schedule_handler, schedule_id, employee_id):
+        """Test that valid shifts are added in one go and invalid ones are reported by index"""
+        outsider = str(schedule_handler.users_collection.insert_one(
+            {"name": "Other", "username": "other", "business_code": "OTHER"}).inserted_id)
+
+        shifts = [
+            make_shift(employee_id, day=1),
+            {"employee_id": employee_id, "start": "2099-10-02T14:00:00.000Z"},
+            make_shift(outsider, day=3),
+            {**make_shift(employee_id, day=4), "end": "2099-10-04T10:00:00.000Z"},
+            make_shift(employee_id, day=5),
+            "not a shift"
+        ]
+        results = schedule_handler.add_shifts(schedule_id, shifts, "BIZ123")
+
+        assert [r["success"] for r in results] == [True, False, False, False, True, False]
+        assert results[1]["message"] == "Missing fields: end"
+        assert results[2]["message"] == "Unknown employee"
+
+        stored = list(schedule_handler.shifts_collection.find({}).sort("start", 1))
+        assert [s["_id"] for s in stored] == [results[0]["shift_id"], results[4]["shift_id"]]
+        assert all(s["employee_name"] == "Jane Doe" and s["business_code"] == "BIZ123" for s in stored)
+        assert schedule_handler.get_schedule_revision("BIZ123", 2025, 10)["revision"] == 1
+
+    def test_add_shifts_other_business_schedule(self, schedule_handler, schedule_id, employee_id):
+        """Test that a schedule of another business is treated as missing"""
+        assert schedule_handler.add_shifts(schedule_id, [make_shift(employee_id)], "OTHER") is None
+        assert schedule_handler.add_shifts("not-an-id", [make_shift(employee_id)], "BIZ123") is None
+        assert schedule_handler.shifts_collection.count_documents({}) == 0
+
+
+class TestBulkPostAndTake:
+    """Tests for ScheduleHandler.post_shifts and take_shifts"""
+
+    @pytest.fixture(autouse=True)
+    def bulk_write(self, schedule_handler):
+        """mongomock's bulk_write does not accept current pymongo UpdateOne objects, so apply them one by one"""
+        collection = schedule_handler.shifts_collection
+
+        def apply(operations, ordered=True):
+            modified = sum(collection.update_one(op._filter, op._doc).modified_count for op in operations)
+            return SimpleNamespace(modified_count=modified)
+
+        collection.bulk_write = apply
+
+    @pytest.fixture
+    def shift_ids(self, schedule_handler, schedule_id, employee_id):
+        """Add three shifts for the employee and return their ids"""
+        results = schedule_handler.add_shifts(schedule_id, [make_shift(employee_id, day=d) for d in (1, 2, 3)],
+                                              "BIZ123")
+        return [r["shift_id"] for r in results]
+
+    def test_post_shifts(self, schedule_handler, shift_ids, employee_id):
+        """Test posting several shifts at once with per-shift outcomes"""
+        schedule_handler.post_shift(shift_ids[1])
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe"}).inserted_id)
+
+        results = schedule_handler.post_shifts([shift_ids[0], shift_ids[1], "missing", shift_ids[0]], employee_id,
+                                               "BIZ123")
+
+        assert results == [
+            {"shift_id": shift_ids[0], "success": True},
+            {"shift_id": shift_ids[1], "success": False, "message": "Shift is already posted"},
+            {"shift_id": "missing", "success": False, "message": "Shift not found"}
+        ]
+        assert schedule_handler.post_shifts([shift_ids[2]], other, "BIZ123")[0]["message"] == "Not your shift"
+        assert schedule_handler.post_shifts([shift_ids[2]], employee_id, "OTHER")[0]["message"] == "Shift not found"
+
+    def test_take_shifts(self, schedule_handler, shift_ids, employee_id):
+        """Test taking several posted shifts at once"""
+        schedule_handler.post_shifts(shift_ids[:2], employee_id, "BIZ123")
+        revision = schedule_handler.get_schedule_revision("BIZ123", 2025, 10)["revision"]
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe"}).inserted_id)
+
+        results = schedule_handler.take_shifts(shift_ids, other, "BIZ123")
+
+        assert [r["success"] for r in results] == [True, True, False]
+        assert results[2]["message"] == "Shift is not posted"
+        assert schedule_handler.shifts_collection.count_documents({"employee_id": other, "employee_name": "John Roe",
+                                                                   "posted": False}) == 2
+        assert schedule_handler.get_schedule_revision("BIZ123", 2025, 10)["revision"] == revision + 1
+
+    def test_take_shifts_lost_race(self, schedule_handler, shift_ids, employee_id):
+        """Test that a shift taken by someone else between the read and the write is reported as changed"""
+        schedule_handler.post_shifts(shift_ids[:1], employee_id, "BIZ123")
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe"}).inserted_id)
+        rival = str(schedule_handler.users_collection.insert_one({"name": "Rival"}).inserted_id)
+
+        # The rival takes the shift right before the bulk write runs
+        apply = schedule_handler.shifts_collection.bulk_write
+
+        def race(operations, ordered=True):
+            schedule_handler.take_shift(shift_ids[0], rival)
+            return apply(operations, ordered)
+
+        schedule_handler.shifts_collection.bulk_write = race
+
+        results = schedule_handler.take_shifts(shift_ids[:1], other, "BIZ123")
+        assert results == [{"shift_id": shift_ids[0], "success": False, "message": "Shift was changed"}]
+
+    def test_take_shifts_unknown_user(self, schedule_handler, shift_ids):
+        """Test taking shifts as a user that does not exist"""
+        assert schedule_handler.take_shifts(shift_ids, str(ObjectId()), "BIZ123") is None
+
+
+class TestOverlaps:
+    """Tests for per-employee shift overlap detection"""
+
+    @pytest.fixture(autouse=True)
+    def bulk_write(self, schedule_handler):
+        """mongomock's bulk_write does not accept current pymongo UpdateOne objects, so apply them one by one"""
+        collection = schedule_handler.shifts_collection
+
+        def apply(operations, ordered=True):
+            modified = sum(collection.update_one(op._filter, op._doc).modified_count for op in operations)
+            return SimpleNamespace(modified_count=modified)
+
+        collection.bulk_write = apply
+
+    @staticmethod
+    def shift(employee_id, start, end, day=1):
+        return {"employee_id": employee_id, "start": f"2099-10-{day:02d}T{start}:00.000Z",
+                "end": f"2099-10-{day:02d}T{end}:00.000Z"}
+
+    def test_add_shift_rejects_overlap(self, schedule_handler, schedule_id, employee_id):
+        """Test that a shift overlapping an existing one is rejected, and back to back shifts are not"""
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "09:00", "13:00"))
+
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.add_shift(schedule_id, self.shift(employee_id, "12:00", "16:00"))
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.add_shift(schedule_id, self.shift(employee_id, "10:00", "11:00"))
+
+        assert schedule_handler.add_shift(schedule_id, self.shift(employee_id, "13:00", "17:00")) is True
+        assert schedule_handler.add_shift(schedule_id, self.shift(employee_id, "07:00", "09:00")) is True
+        assert schedule_handler.shifts_collection.count_documents({}) == 3
+
+    def test_overlap_behind_nested_shift(self, schedule_handler, schedule_id, employee_id):
+        """Test that a shift overlapping a long stored shift is found when a shorter one starts inside it"""
+        schedule_handler.shifts_collection.insert_many([
+            {"schedule_id": schedule_id, **self.shift(employee_id, "09:00", "17:00")},
+            {"schedule_id": schedule_id, **self.shift(employee_id, "10:00", "11:00")}
+        ])
+
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.add_shift(schedule_id, self.shift(employee_id, "11:30", "18:00"))
+
+    def test_open_shifts_never_clash(self, schedule_handler, schedule_id):
+        """Test that open shifts at the same time can be added and edited, as templates and drafts create them"""
+        for _ in range(2):
+            schedule_handler.shifts_collection.insert_one({"_id": str(ObjectId()), "schedule_id": schedule_id,
+                                                           **self.shift(None, "09:00", "17:00")})
+        first = schedule_handler.shifts_collection.find_one({})["_id"]
+
+        assert schedule_handler.edit_shift(schedule_id, {**self.shift(None, "09:00", "16:00"), "_id": first})
+        assert schedule_handler.add_shift(schedule_id, self.shift(None, "09:00", "17:00")) is True
+
+    def test_shift_length_limited(self, schedule_handler, schedule_id, employee_id):
+        """Test that shifts longer than the overlap checks look back for are rejected"""
+        too_long = {"employee_id": employee_id, "start": "2099-10-01T09:00:00.000Z", "end": "2099-10-02T09:30:00.000Z"}
+
+        with pytest.raises(ValueError):
+            schedule_handler.add_shift(schedule_id, dict(too_long))
+
+        results = schedule_handler.add_shifts(schedule_id, [too_long], "BIZ123")
+        assert results[0]["message"] == "Shift can be at most 24 hours long"
+
+    def test_add_shift_normalizes_offsets(self, schedule_handler, schedule_id, employee_id):
+        """Test that times with an offset are compared as UTC"""
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "09:00", "13:00"))
+
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.add_shift(schedule_id, {"employee_id": employee_id, "start": "2099-10-01T14:00:00+02:00",
+                                                     "end": "2099-10-01T16:00:00+02:00"})
+
+    def test_edit_shift_ignores_itself(self, schedule_handler, schedule_id, employee_id):
+        """Test that a shift can be moved over its own old time but not onto another shift"""
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "09:00", "13:00"))
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "14:00", "18:00"))
+        first = schedule_handler.shifts_collection.find_one({"start": "2099-10-01T09:00:00.000Z"})["_id"]
+
+        assert schedule_handler.edit_shift(schedule_id, {**self.shift(employee_id, "10:00", "14:00"), "_id": first})
+
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.edit_shift(schedule_id, {**self.shift(employee_id, "10:00", "15:00"), "_id": first})
+
+    def test_add_shifts_flags_overlaps(self, schedule_handler, schedule_id, employee_id):
+        """Test that a batch flags shifts clashing with stored shifts and with each other"""
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "09:00", "13:00"))
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe",
+                                                                  "business_code": "BIZ123"}).inserted_id)
+
+        results = schedule_handler.add_shifts(schedule_id, [
+            self.shift(employee_id, "12:00", "16:00"),
+            self.shift(employee_id, "13:00", "17:00"),
+            self.shift(employee_id, "16:00", "18:00"),
+            self.shift(other, "12:00", "16:00")
+        ], "BIZ123")
+
+        assert [r["success"] for r in results] == [False, True, False, True]
+        assert results[0]["message"] == "Overlaps another shift of this employee"
+        assert schedule_handler.shifts_collection.count_documents({"employee_id": employee_id}) == 2
+
+    def test_add_shifts_nested_stored_shifts(self, schedule_handler, schedule_id, employee_id):
+        """Test that a batch shift overlapping a long stored shift is flagged when a shorter one starts inside it"""
+        schedule_handler.shifts_collection.insert_many([
+            {"schedule_id": schedule_id, **self.shift(employee_id, "09:00", "17:00")},
+            {"schedule_id": schedule_id, **self.shift(employee_id, "10:00", "11:00")}
+        ])
+
+        results = schedule_handler.add_shifts(schedule_id, [
+            self.shift(employee_id, "07:00", "08:00"),
+            self.shift(employee_id, "11:30", "18:00")
+        ], "BIZ123")
+
+        assert [r["success"] for r in results] == [True, False]
+
+    def test_take_shift_rejects_overlap(self, schedule_handler, schedule_id, employee_id):
+        """Test that an employee cannot take a posted shift clashing with their own"""
+        other = str(schedule_handler.users_collection.insert_one({"name": "John Roe",
+                                                                  "business_code": "BIZ123"}).inserted_id)
+        schedule_handler.add_shift(schedule_id, self.shift(employee_id, "09:00", "13:00"))
+        schedule_handler.add_shift(schedule_id, self.shift(other, "12:00", "16:00"))
+        schedule_handler.add_shift(schedule_id, self.shift(other, "18:00", "20:00"))
+        clash = schedule_handler.shifts_collection.find_one({"employee_id": other, "end": {"$lt": "2099-10-01T17"}})
+        free = schedule_handler.shifts_collection.find_one({"employee_id": other, "start": {"$gt": "2099-10-01T17"}})
+        schedule_handler.post_shifts([clash["_id"], free["_id"]], other, "BIZ123")
+
+        with pytest.raises(ShiftConflictError):
+            schedule_handler.take_shift(clash["_id"], employee_id)
+
+        results = schedule_handler.take_shifts([clash["_id"], free["_id"]], employee_id, "BIZ123")
+        assert results == [
+            {"shift_id": clash["_id"], "success": False, "message": "Overlaps another shift of this employee"},
+            {"shift_id": free["_id"], "success": True}
+        ]
+
+    def test_apply_template_skips_overlaps(self, schedule_handler, schedule_id, employee_id):
+        """Test that template shifts clashing with existing shifts are skipped"""
+        template_id = schedule_handler.create_template("BIZ123", "Mondays", [
+            {"day": "Monday", "start": "09:00", "end": "17:00", "employee_id": employee_id}
+        ], "manager1")
+        schedule_handler.add_shift(schedule_id, {"employee_id": employee_id, "start": "2025-10-06T16:00:00.000Z",
+                                                 "end": "2025-10-06T20:00:00.000Z"})
+
+        result = schedule_handler.apply_template(template_id, schedule_id, "BIZ123", TestTemplates.HOURS)
+
+        assert result["added"] == 3
+        assert [s["message"] for s in result["skipped"]] == ["Overlaps another shift of this employee"]
+
+    def test_schedule_conflicts(self, schedule_handler, schedule_id, employee_id):
+        """Test reporting overlaps that were stored before the check existed"""
+        schedule_handler.shifts_collection.insert_many([
+            {"_id": "a", "schedule_id": schedule_id, "employee_id": employee_id, "employee_name": "Jane Doe",
+             **{k: v for k, v in self.shift(employee_id, "09:00", "17:00").items() if k != "employee_id"}},
+            {"_id": "b", "schedule_id": schedule_id, "employee_id": employee_id, "employee_name": "Jane Doe",
+             **{k: v for k, v in self.shift(employee_id, "10:00", "12:00").items() if k != "employee_id"}},
+            {"_id": "c", "schedule_id": schedule_id, "employee_id": employee_id, "employee_name": "Jane Doe",
+             **{k: v for k, v in self.shift(employee_id, "13:00", "18:00").items() if k != "employee_id"}},
+            {"_id": "d", "schedule_id": schedule_id, "employee_id": None,
+             **{k: v for k, v in self.shift(None, "09:00", "17:00").items() if k != "employee_id"}}
+        ])
+
+        conflicts = schedule_handler.get_schedule_conflicts(schedule_id, "BIZ123")
+
+        assert [(c["shift_id"], c["conflicts_with"]) for c in conflicts] == [("b", "a"), ("c", "a")]
+        assert schedule_handler.get_schedule_conflicts(schedule_id, "OTHER") is None
+
+
+class TestUserCache:
+    """Tests for the employee name cache shared by the shift write paths"""
+
+    def test_repeated_lookups_hit_cache(self, schedule_handler, schedule_id, employee_id):
+        """Test that adding many shifts for one employee loads the employee once"""
+        for day in range(1, 6):
+            schedule_handler.add_shift(schedule_id, make_shift(employee_id, day=day))
+
+        stats = schedule_handler.user_cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 4
+
+    def test_bulk_lookup_reads_through_cache(self, schedule_handler, schedule_id, employee_id):
+        """Test that bulk adds use cached names and cache the ones they load"""
+        schedule_handler.add_shifts(schedule_id, [make_shift(employee_id, day=1)], "BIZ123")
+        assert schedule_handler.user_cache.get(employee_id)["name"] == "Jane Doe"
+
+        schedule_handler.users_collection.update_one({"_id": ObjectId(employee_id)}, {"$set": {"name": "Changed"}})
+        schedule_handler.add_shifts(schedule_id, [make_shift(employee_id, day=2)], "BIZ123")
+
+        assert schedule_handler.shifts_collection.find_one({"start": {"$regex": "^2099-10-02"}})["employee_name"] == \
+            "Jane Doe"
+
+    def test_joining_business_invalidates(self, schedule_handler, schedule_id):
+        """Test that a user linked to a business through BusinessHandler is reloaded"""
+        db_handler = SimpleNamespace(database=schedule_handler.users_collection.database)
+        business_handler = BusinessHandler(db_handler, user_cache=schedule_handler.user_cache)
+        business_handler.business_collection.delete_many({})
+        business_handler.business_collection.insert_one({"code": "BIZ123", "business_name": "Cafe"})
+        user_id = str(schedule_handler.users_collection.insert_one({"name": "New Hire"}).inserted_id)
+
+        # Not in the business yet
+        assert schedule_handler.add_shifts(schedule_id, [make_shift(user_id)], "BIZ123")[0]["success"] is False
+
+        business_handler.insert_user(code="BIZ123", user_id=user_id)
+
+        assert schedule_handler.add_shifts(schedule_id, [make_shift(user_id)], "BIZ123")[0]["success"] is True
+
+
+class TestTemplates:
+    """Tests for weekly shift templates"""
+
+    HOURS = [{"day": day, "open": "08:00", "close": "22:00"}
+             for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")]
+
+    @pytest.fixture
+    def template_id(self, schedule_handler, employee_id):
+        """Create a template with an assigned, an open, a too late and a closed day slot"""
+        return schedule_handler.create_template("BIZ123", "Standard week", [
+            {"day": "Monday", "start": "09:00", "end": "17:00", "employee_id": employee_id},
+            {"day": "Wednesday", "start": "10:00", "end": "14:00"},
+            {"day": "Tuesday", "start": "18:00", "end": "23:00", "employee_id": employee_id},
+            {"day": "Sunday", "start": "10:00", "end": "14:00", "employee_id": employee_id}
+        ], "manager1", timezone="America/New_York")
+
+    def test_apply_template_expands_month(self, schedule_handler, schedule_id, template_id, employee_id):
+        """Test that a template fills October 2025 in one go, respecting business hours"""
+        result = schedule_handler.apply_template(template_id, schedule_id, "BIZ123", self.HOURS)
+
+        # Four Mondays and five Wednesdays in October 2025
+        assert result["added"] == 9
+        assert {s["message"] for s in result["skipped"]} == {"Outside business hours", "Business is closed"}
+        assert len(result["skipped"]) == 4 + 4
+
+        mondays = list(schedule_handler.shifts_collection.find({"employee_id": employee_id}).sort("start", 1))
+        assert [s["start"] for s in mondays][:2] == ["2025-10-06T13:00:00.000Z", "2025-10-13T13:00:00.000Z"]
+        assert mondays[0]["employee_name"] == "Jane Doe"
+
+        open_shifts = list(schedule_handler.shifts_collection.find({"employee_id": None}))
+        assert len(open_shifts) == 5
+        assert all(s["posted"] and s["employee_name"] == "Open shift" for s in open_shifts)
+
+    def test_apply_template_twice(self, schedule_handler, schedule_id, template_id):
+        """Test that a template cannot be applied to the same schedule twice"""
+        schedule_handler.apply_template(template_id, schedule_id, "BIZ123", self.HOURS)
+
+        with pytest.raises(ValueError):
+            schedule_handler.apply_template(template_id, schedule_id, "BIZ123", self.HOURS)
+
+    def test_apply_template_other_business(self, schedule_handler, schedule_id, template_id):
+        """Test that templates and schedules of another business are not found"""
+        assert schedule_handler.apply_template(template_id, schedule_id, "OTHER", self.HOURS) is None
+
+    @pytest.mark.parametrize("slot", [
+        {"day": "Someday", "start": "09:00", "end": "17:00"},
+        {"day": "Monday", "start": "17:00", "end": "09:00"},
+        {"day": "Monday", "start": "9am", "end": "5pm"}
+    ])
+    def test_invalid_slots_rejected(self, schedule_handler, slot):
+        """Test that malformed slots are rejected when the template is saved"""
+        with pytest.raises(ValueError):
+            schedule_handler.create_template("BIZ123", "Bad", [slot], "manager1")
+
+    def test_templates_listed_and_deleted(self, schedule_handler, template_id):
+        """Test listing and deleting templates of a business"""
+        assert [str(t["_id"]) for t in schedule_handler.get_templates("BIZ123")] == [template_id]
+        assert schedule_handler.delete_template("OTHER", template_id) is False
+        assert schedule_handler.delete_template("BIZ123", template_id) is True
+        assert schedule_handler.get_templates("BIZ123") == []
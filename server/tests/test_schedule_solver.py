@@ -0,0 +1,117 @@
+"""Unit Tests for ScheduleSolver"""
+import random
+from datetime import date, datetime, timezone
+
+from handlers.schedule_solver import ScheduleSolver
+
+
+def demand(slot, day, start, end, count=1):
+    current = date(2099, 10, day)
+    return {
+        "slot": slot,
+        "start": datetime(2099, 10, day, start, tzinfo=timezone.utc).isoformat(),
+        "end": datetime(2099, 10, day, end, tzinfo=timezone.utc).isoformat(),
+        "minutes": (end - start) * 60,
+        "week": current.isocalendar()[:2],
+        "count": count
+    }
+
+
+def assert_no_double_booking(demands, assigned):
+    intervals = {}
+    for item, employees in zip(demands, assigned):
+        assert len(employees) == len(set(employees))
+        for employee_id in employees:
+            intervals.setdefault(employee_id, []).append((item["start"], item["end"]))
+
+    for busy in intervals.values():
+        busy.sort()
+        assert all(earlier[1] <= later[0] for earlier, later in zip(busy, busy[1:]))
+
+
+class TestScheduleSolver:
+    """Tests for ScheduleSolver.solve"""
+
+    def test_fills_demands_without_double_booking(self):
+        """Test that overlapping demands get different employees"""
+        demands = [demand(0, 1, 9, 17, count=2), demand(1, 1, 12, 20, count=1)]
+        solution = ScheduleSolver(demands, {0: ["a", "b", "c"], 1: ["a", "b", "c"]}).solve()
+
+        assert solution["open"] == [0, 0]
+        assert len(set(solution["assigned"][0]) | set(solution["assigned"][1])) == 3
+
+    def test_only_candidates_are_assigned(self):
+        """Test that positions without enough available employees stay open"""
+        solution = ScheduleSolver([demand(0, 1, 9, 17, count=3)], {0: ["a", "b"]}).solve()
+
+        assert sorted(solution["assigned"][0]) == ["a", "b"]
+        assert solution["open"] == [1]
+
+    def test_weekly_cap(self):
+        """Test that nobody is scheduled over the weekly cap"""
+        # Mon 2099-10-05 to Fri 2099-10-09, 8 hours a day, capped at 24 hours a week
+        demands = [demand(0, day, 9, 17) for day in range(5, 10)]
+        solution = ScheduleSolver(demands, {0: ["a", "b"]}, max_week_minutes=24 * 60).solve()
+
+        shifts = [employee for employees in solution["assigned"] for employee in employees]
+        assert max(shifts.count("a"), shifts.count("b")) == 3
+        assert solution["open"] == [0] * 5
+
+    def test_existing_shifts_block(self):
+        """Test that shifts stored before the solver ran are respected"""
+        solver = ScheduleSolver([demand(0, 1, 9, 17)], {0: ["a", "b"]})
+        solver.add_existing("a", demand(0, 1, 16, 18)["start"], demand(0, 1, 16, 18)["end"], (2099, 40), 120)
+
+        assert solver.solve()["assigned"] == [["b"]]
+
+    def test_overlapping_existing_shifts(self):
+        """Test that a long stored shift still blocks when a shorter stored shift starts inside it"""
+        solver = ScheduleSolver([demand(0, 1, 11, 18)], {0: ["a"]})
+        for start, end in ((9, 17), (10, 11)):
+            solver.add_existing("a", demand(0, 1, start, end)["start"], demand(0, 1, start, end)["end"],
+                                (2099, 40), (end - start) * 60)
+
+        assert solver.solve()["assigned"] == [[]]
+
+    def test_repair_moves_blocking_shift(self):
+        """Test that local search fills a position greedy left open by handing a shift to another candidate"""
+        # Greedy gives the morning to the least loaded candidate 'a' first. The evening only has 'a' as a
+        # candidate, so the morning has to be handed to 'b' for both to be filled
+        demands = [demand(0, 1, 8, 16), demand(1, 1, 12, 20)]
+        solver = ScheduleSolver(demands, {0: ["a", "b"], 1: ["a"]})
+        solver._assign("a", 0)
+
+        solution = solver.solve()
+
+        assert solution["assigned"] == [["b"], ["a"]]
+        assert solution["stats"]["repaired"] == 1
+
+    def test_balances_load(self):
+        """Test that local search evens out the hours of the candidates"""
+        demands = [demand(0, day, 9, 17) for day in range(1, 11)]
+        solver = ScheduleSolver(demands, {0: ["a", "b"]})
+        for index in range(10):
+            solver._assign("a", index)
+
+        solution = solver.solve()
+
+        assert solution["stats"]["min_hours"] == solution["stats"]["max_hours"] == 40
+
+    def test_large_business(self):
+        """Test a month for a thousand employees with demand above supply"""
+        random.seed(7)
+        employees = [f"e{i}" for i in range(1000)]
+        day_slots = [(8, 16, 260), (12, 20, 240), (16, 23, 230)]
+
+        demands, candidates = [], {}
+        for day in range(1, 32):
+            for number, (start, end, count) in enumerate(day_slots):
+                slot = date(2099, 10, day).weekday() * len(day_slots) + number
+                candidates.setdefault(slot, [e for e in employees if random.random() < 0.6])
+                demands.append(demand(slot, day, start, end, count))
+
+        solution = ScheduleSolver(demands, candidates, max_week_minutes=40 * 60).solve()
+
+        assert_no_double_booking(demands, solution["assigned"])
+        assert sum(solution["open"]) < 0.02 * solution["stats"]["positions"]
+        assert solution["stats"]["max_hours"] - solution["stats"]["min_hours"] <= 40
@@ -0,0 +1,84 @@
+"""Tests for the versioned schema bootstrap"""
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock import MongoClient
+
+from handlers import schema_handler as schema_module
+from handlers.index_registry import INDEX_REGISTRY
+from handlers.schema_handler import SchemaHandler, SCHEMA_VERSION
+
+
+class MockDatabaseHandler:
+    def __init__(self):
+        self.client = MongoClient()
+        self.client.drop_database('test_schema_db')
+        self.database = self.client['test_schema_db']
+
+
+@pytest.fixture
+def db_handler():
+    return MockDatabaseHandler()
+
+
+class TestSchemaHandler:
+    """Tests for SchemaHandler"""
+
+    def test_first_bootstrap_runs_ddl_and_stores_marker(self, db_handler):
+        """Test that a fresh database gets its collections, indexes and version marker"""
+        handler = SchemaHandler(db_handler)
+
+        assert handler.bootstrap() is True
+        assert set(INDEX_REGISTRY) <= set(db_handler.database.list_collection_names())
+
+        marker = handler.get_marker()
+        assert marker["version"] == SCHEMA_VERSION
+        assert marker["index_fingerprint"] == SchemaHandler.index_fingerprint()
+
+    def test_current_schema_skips_ddl(self, db_handler, monkeypatch):
+        """Test that a second boot performs no DDL"""
+        SchemaHandler(db_handler).bootstrap()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("DDL issued on an up to date schema")
+
+        monkeypatch.setattr(schema_module, "reconcile_indexes", fail)
+        assert SchemaHandler(db_handler).bootstrap() is False
+
+    def test_migrations_run_once(self, db_handler):
+        """Test that migrations only run when upgrading past their version"""
+        calls = []
+
+        handler = SchemaHandler(db_handler)
+        handler.register_migration(SCHEMA_VERSION, lambda: calls.append("run"))
+        handler.bootstrap()
+
+        handler = SchemaHandler(db_handler)
+        handler.register_migration(SCHEMA_VERSION, lambda: calls.append("run"))
+        handler.bootstrap()
+
+        assert calls == ["run"]
+
+    def test_registry_change_triggers_bootstrap(self, db_handler, monkeypatch):
+        """Test that editing the index registry re-runs the reconcile"""
+        SchemaHandler(db_handler).bootstrap()
+
+        monkeypatch.setattr(SchemaHandler, "index_fingerprint", staticmethod(lambda: "changed"))
+        assert SchemaHandler(db_handler).bootstrap() is True
+
+    def test_waits_for_other_worker(self, db_handler):
+        """Test that a worker gives up if another holds the lock and never finishes"""
+        handler = SchemaHandler(db_handler)
+        handler.meta_collection.insert_one({"_id": SchemaHandler.LOCK_ID,
+                                            "expires_at": datetime.now() + timedelta(minutes=5)})
+
+        with pytest.raises(TimeoutError):
+            handler.bootstrap(wait_seconds=0.05, poll_interval=0.01)
+
+    def test_expired_lock_is_ignored(self, db_handler):
+        """Test that a lock left by a crashed worker does not block bootstrap"""
+        handler = SchemaHandler(db_handler)
+        handler.meta_collection.insert_one({"_id": SchemaHandler.LOCK_ID,
+                                            "expires_at": datetime.now() - timedelta(minutes=1)})
+
+        assert handler.bootstrap(wait_seconds=0) is True
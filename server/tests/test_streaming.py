@@ -0,0 +1,122 @@
+"""Tests for streamed NDJSON and Server-Sent Events responses"""
+import json
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from unittest.mock import Mock
+
+from handlers.account_handler import AccountHandler
+from handlers.activity_handler import ActivityHandler
+from handlers.business_handler import BusinessHandler
+from handlers.schedule_handler import ScheduleHandler
+from routes.routes import setup_routes
+
+
+@pytest.fixture
+def handlers():
+    """Create mock handlers"""
+    return (Mock(spec=AccountHandler), Mock(spec=BusinessHandler), Mock(spec=ScheduleHandler),
+            Mock(spec=ActivityHandler))
+
+
+@pytest.fixture
+def client(handlers):
+    """Create a test client with the routes bound to mock handlers"""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret-key-that-is-long-enough'
+    JWTManager(app)
+    setup_routes(app, *handlers)
+    return app.test_client()
+
+
+@pytest.fixture
+def manager_headers(client):
+    """Authorization header for a manager"""
+    with client.application.app_context():
+        token = create_access_token(identity="manager1",
+                                    additional_claims={"role": "MANAGER", "code": "BIZ123", "user_id": "m1"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_schedules_stream_with_accept_header(client, handlers, manager_headers):
+    """Test that the Accept header switches the schedules endpoint to NDJSON"""
+    schedule_ids = [ObjectId() for _ in range(3)]
+    handlers[2].iter_schedules.return_value = iter(
+        [{"_id": schedule_id, "year": 2099, "month": i + 1} for i, schedule_id in enumerate(schedule_ids)])
+
+    response = client.get('/api/manager/schedules', headers={**manager_headers, "Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["_id"] for line in lines] == [str(schedule_id) for schedule_id in schedule_ids]
+    handlers[2].get_schedules.assert_not_called()
+
+
+def test_employees_stream_with_query_param(client, handlers, manager_headers):
+    """Test that ?stream=ndjson switches the employees endpoint to NDJSON"""
+    handlers[1].iter_all_employees.return_value = iter(
+        [{"employee_id": str(i), "username": f"user{i}", "name": ""} for i in range(250)])
+
+    response = client.get('/api/manager/business/employees?stream=ndjson', headers=manager_headers)
+
+    assert response.mimetype == "application/x-ndjson"
+    assert len(response.get_data(as_text=True).splitlines()) == 250
+
+
+def test_json_is_still_the_default(client, handlers, manager_headers):
+    """Test that clients that do not opt in still get a single JSON body"""
+    handlers[2].get_schedules.return_value = [{"_id": ObjectId(), "year": 2099, "month": 1}]
+    handlers[2].get_schedule_revisions.return_value = []
+
+    response = client.get('/api/manager/schedules', headers=manager_headers)
+
+    assert response.mimetype == "application/json"
+    assert response.get_json()["message"] == "success"
+
+
+@pytest.mark.parametrize("accept", ["*/*", "application/*", "application/json, */*;q=0.8",
+                                    "application/x-ndjson;q=0, application/json"])
+def test_wildcards_get_json(client, handlers, manager_headers, accept):
+    """Test that fetch's default Accept header, and NDJSON at q=0, do not switch to NDJSON"""
+    handlers[2].get_schedules.return_value = [{"_id": ObjectId(), "year": 2099, "month": 1}]
+    handlers[2].get_schedule_revisions.return_value = []
+
+    response = client.get('/api/manager/schedules', headers={**manager_headers, "Accept": accept})
+
+    assert response.mimetype == "application/json"
+    handlers[2].iter_schedules.assert_not_called()
+
+
+def test_activity_event_stream(client, handlers, manager_headers):
+    """Test that activities are sent as SSE events with ids, heartbeats as comments"""
+    activity_id = ObjectId()
+    handlers[3].stream_activities.return_value = iter([
+        ("cursor1", {"_id": activity_id, "shift_id": "shift1", "clock_in": True}),
+        None
+    ])
+
+    response = client.get('/api/manager/activity/stream', headers={**manager_headers, "Last-Event-ID": "cursor0"})
+
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    handlers[3].stream_activities.assert_called_once_with(business_code="BIZ123", last_event_id="cursor0")
+
+    blocks = response.get_data(as_text=True).split("\n\n")
+    assert blocks[0].startswith("retry: ")
+    assert blocks[1].splitlines()[:2] == ["id: cursor1", "event: activity"]
+    assert json.loads(blocks[1].splitlines()[2].removeprefix("data: "))["_id"] == str(activity_id)
+    assert blocks[2] == ": heartbeat"
+
+
+def test_activity_event_stream_bad_event_id(client, handlers, manager_headers):
+    """Test that a malformed Last-Event-ID is rejected before streaming"""
+    handlers[3].stream_activities.side_effect = ValueError("Invalid cursor.")
+
+    response = client.get('/api/manager/activity/stream', headers={**manager_headers, "Last-Event-ID": "bad"})
+
+    assert response.status_code == 400
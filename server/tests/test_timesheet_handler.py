@@ -0,0 +1,134 @@
+"""
+Tests for TimesheetHandler. The unit tests mock the aggregation's output. mongomock cannot run the pipeline
+($toDate, $$NOW), so TestTimesheetPipeline runs it against the MongoDB at MONGO_URI and is skipped without one.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from pymongo import MongoClient, errors
+
+from handlers.timesheet_handler import TimesheetHandler
+
+START = datetime(2099, 1, 1, tzinfo=timezone.utc)
+END = datetime(2099, 2, 1, tzinfo=timezone.utc)
+HOUR_MS = 60 * 60 * 1000
+
+
+@pytest.fixture
+def timesheet_handler():
+    """Create a timesheet handler over a mock shift collection"""
+    db_handler = MagicMock()
+    handler = TimesheetHandler(db_handler)
+    handler.shifts = MagicMock()
+    return handler
+
+
+def row(employee_id, name, shifts, scheduled_hours, worked_hours, late=0, early=0, missed=0):
+    return {"_id": employee_id, "employee_name": name, "shifts": shifts, "scheduled_ms": scheduled_hours * HOUR_MS,
+            "worked_ms": worked_hours * HOUR_MS, "late_clock_ins": late, "early_clock_outs": early,
+            "missed_shifts": missed}
+
+
+class TestTimesheetHandler:
+    """Tests for TimesheetHandler.get_timesheet"""
+
+    def test_employee_rows_and_totals(self, timesheet_handler):
+        """Test that the grouped rows are converted to hours and summed into business totals"""
+        timesheet_handler.shifts.aggregate.return_value = iter([
+            row("emp1", "Jane Doe", 3, 24, 23.5, late=1),
+            row("emp2", "John Roe", 2, 16, 8, early=1, missed=1)
+        ])
+
+        timesheet = timesheet_handler.get_timesheet("BIZ123", START, END)
+
+        assert timesheet["employees"][0] == {
+            "employee_id": "emp1", "employee_name": "Jane Doe", "shifts": 3, "scheduled_hours": 24.0,
+            "worked_hours": 23.5, "late_clock_ins": 1, "early_clock_outs": 0, "missed_shifts": 0
+        }
+        assert timesheet["totals"] == {
+            "employees": 2, "shifts": 5, "scheduled_hours": 40.0, "worked_hours": 31.5, "late_clock_ins": 1,
+            "early_clock_outs": 1, "missed_shifts": 1
+        }
+
+    def test_pipeline_matches_range_first(self, timesheet_handler):
+        """Test that the pipeline starts with an indexable match on the business, range and employee"""
+        timesheet_handler.shifts.aggregate.return_value = iter([])
+
+        timesheet_handler.get_timesheet("BIZ123", START, END, employee_id="emp1")
+
+        pipeline = timesheet_handler.shifts.aggregate.call_args[0][0]
+        assert pipeline[0] == {"$match": {
+            "business_code": "BIZ123",
+            "employee_id": "emp1",
+            "start": {"$gte": "2099-01-01T00:00:00.000Z", "$lt": "2099-02-01T00:00:00.000Z"}
+        }}
+
+    def test_empty_range(self, timesheet_handler):
+        """Test a range without shifts"""
+        timesheet_handler.shifts.aggregate.return_value = iter([])
+
+        timesheet = timesheet_handler.get_timesheet("BIZ123", START, END)
+
+        assert timesheet["employees"] == []
+        assert timesheet["totals"]["worked_hours"] == 0
+
+    @pytest.mark.parametrize("start, end", [(END, START), (START, START + timedelta(days=120))])
+    def test_invalid_range(self, timesheet_handler, start, end):
+        """Test that backwards and overly long ranges are rejected"""
+        with pytest.raises(ValueError):
+            timesheet_handler.get_timesheet("BIZ123", start, end)
+
+
+class TestTimesheetPipeline:
+    """Tests for the aggregation itself, on a scratch database of a real MongoDB"""
+
+    @pytest.fixture
+    def timesheet_handler(self):
+        client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=1000)
+        try:
+            client.admin.command("ping")
+        except errors.PyMongoError:
+            pytest.skip("No MongoDB at MONGO_URI")
+
+        class ScratchDatabaseHandler:
+            database = client["Capstone-T3-test-timesheet"]
+
+        yield TimesheetHandler(ScratchDatabaseHandler())
+        client.drop_database("Capstone-T3-test-timesheet")
+        client.close()
+
+    @staticmethod
+    def shift(employee_id, name, day, start, end, clocked_in_at=None, clocked_out_at=None, business_code="BIZ123"):
+        shift = {"business_code": business_code, "employee_id": employee_id, "employee_name": name,
+                 "start": f"2024-01-{day:02d}T{start}:00.000Z", "end": f"2024-01-{day:02d}T{end}:00.000Z"}
+
+        if clocked_in_at:
+            shift["clocked_in_at"] = datetime(2024, 1, day, *clocked_in_at)
+        if clocked_out_at:
+            shift["clocked_out_at"] = datetime(2024, 1, day, *clocked_out_at)
+
+        return shift
+
+    def test_totals_from_stored_shifts(self, timesheet_handler):
+        """Test hours, punch flags and missed shifts, and that the latest shift's name is used"""
+        timesheet_handler.shifts.insert_many([
+            # Stored out of start order, the employee was renamed between the two shifts
+            self.shift("emp1", "Jane Doe", 3, "09:00", "17:00", clocked_in_at=(9, 0), clocked_out_at=(16, 0)),
+            self.shift("emp1", "Jane Roe", 2, "09:00", "17:00", clocked_in_at=(9, 10), clocked_out_at=(17, 0)),
+            self.shift("emp2", "John Roe", 2, "09:00", "13:00"),
+            self.shift(None, "Open shift", 4, "09:00", "17:00"),
+            self.shift("emp3", "Max Other", 2, "09:00", "17:00", business_code="OTHER")
+        ])
+
+        timesheet = timesheet_handler.get_timesheet("BIZ123", datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                                    datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        assert timesheet["employees"] == [
+            {"employee_id": "emp1", "employee_name": "Jane Doe", "shifts": 2, "scheduled_hours": 16.0,
+             "worked_hours": 14.83, "late_clock_ins": 1, "early_clock_outs": 1, "missed_shifts": 0},
+            {"employee_id": "emp2", "employee_name": "John Roe", "shifts": 1, "scheduled_hours": 4.0,
+             "worked_hours": 0.0, "late_clock_ins": 0, "early_clock_outs": 0, "missed_shifts": 1}
+        ]
+        assert timesheet["totals"]["employees"] == 2
@@ -1,6 +1,10 @@
+import base64
+import binascii
 import string
 import random
-from datetime import datetime
+from datetime import datetime, timezone
+
+from bson import json_util
 
 
 def id_generator(size=6, chars=string.ascii_uppercase + string.digits):
@@ -22,4 +26,32 @@ def jsonify_keys(original: dict | list[dict], keys_to_convert: list[str]) -> dic
         raise TypeError("Input must be a dict or a list of dicts.")
 
 def parse_utc(dt_str: str) -> datetime:
-    return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
\ No newline at end of file
+    # Timestamps without an offset are read as UTC
+    parsed = datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def to_utc_iso(dt: datetime) -> str:
+    # Format an aware datetime the way the frontend stores shift times (JS toISOString)
+    return dt.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def utc_now_iso() -> str:
+    return to_utc_iso(datetime.now(timezone.utc))
+
+
+def encode_cursor(values: list) -> str:
+    # Opaque, URL safe page cursor. Extended JSON keeps ObjectIds and datetimes intact
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+
+    return values